@@ -0,0 +1,52 @@
+"""
+Stateless JWT authentication.
+
+Access tokens carry the caller's profile id. ProfileJWTAuthentication turns a
+valid token into a TokenUser (models.py) without the per-request User query
+simplejwt's JWTAuthentication does; the user row and the profile are only
+loaded by views that actually need them.
+
+Trade-off: a deactivated or deleted account keeps working until its access
+token expires, so SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'] is kept short. Minting
+an access token (login and token refresh) checks that the account is still
+active, and a request whose profile has been deleted gets a 401.
+"""
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import TokenUser
+
+
+class ProfileRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the profile id, for active accounts only."""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        account = (
+            User.objects.filter(pk=self[api_settings.USER_ID_CLAIM], is_active=True)
+            .values_list("id", "profile__id")
+            .first()
+        )
+        if account is None:
+            raise InvalidToken("User is inactive or no longer exists")
+        if account[1] is not None:
+            access["profile_id"] = account[1]
+        return access
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ProfileRefreshToken
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        return TokenUser.from_claims(user_id, validated_token.payload)
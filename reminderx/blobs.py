@@ -0,0 +1,192 @@
+"""
+Reference counting for content-addressed files (see storage.ContentAddressedStorage).
+
+Every model field that points at a blob holds one reference. The signals in
+signals.py retain/release references as fields change or rows are deleted,
+including through user deletion cascades. A blob is removed from storage once
+its last reference goes away.
+
+The signals only see model instances. bulk_create(), QuerySet.update() and
+raw SQL write blob fields without taking or dropping references, so such
+code must call retain_blobs()/release_blobs() itself (generate_thumbnails
+does). As a backstop, collect_uploads recounts the references from the
+tables (unreferenced()) before it deletes a blob.
+
+Presigned uploads land under uploads/ and never at a content address
+directly: promote_upload() hashes them server-side first, so nobody can put
+bytes under someone else's digest.
+"""
+import hashlib
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Organization, Particular, Profile, StoredBlob
+from .storage import blob_extension, blob_name
+from .uploads import max_upload_size
+
+BLOB_MODELS = (Particular, Profile, Organization)
+
+BLOB_PREFIX = "blobs/"
+STAGING_PREFIX = "uploads/"
+# Rows written or referenced this recently are never collected, so a blob being
+# saved for a field that hasn't taken its reference yet stays put
+WRITE_GRACE = timedelta(hours=1)
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def is_staging(name):
+    return bool(name) and name.startswith(STAGING_PREFIX) and ".." not in name
+
+
+def staging_name(user_id, ext=""):
+    name = f"{STAGING_PREFIX}{user_id}/{uuid.uuid4().hex}"
+    return f"{name}.{ext}" if ext else name
+
+
+def promote_upload(upload):
+    """
+    Hash a BlobUpload's staged bytes and, if they match the digest claimed at
+    presign time, store them at their content address. Returns the blob name;
+    raises ValueError (after discarding the upload) when they don't match.
+
+    Call it in the transaction that saves the field the blob goes into: the
+    staged file is only deleted once that commits, so after a rollback the
+    upload can be promoted again.
+    """
+    if upload.blob_name:
+        return upload.blob_name
+    if not default_storage.exists(upload.staging_name):
+        raise ValueError("Document has not been uploaded yet.")
+
+    hasher, size = hashlib.sha256(), 0
+    with default_storage.open(upload.staging_name, "rb") as staged:
+        for chunk in staged.chunks():
+            hasher.update(chunk)
+            size += len(chunk)
+    if hasher.hexdigest() != upload.sha256 or size > max_upload_size():
+        default_storage.delete(upload.staging_name)
+        upload.delete()
+        raise ValueError("Uploaded file does not match its SHA-256.")
+
+    ext = upload.staging_name.rsplit("/", 1)[-1].partition(".")[2]
+    with default_storage.open(upload.staging_name, "rb") as staged:
+        staged.sha256 = upload.sha256
+        name = default_storage.save(f"upload.{ext}" if ext else "upload", staged)
+    transaction.on_commit(lambda: default_storage.delete(upload.staging_name))
+    upload.blob_name = name
+    upload.save(update_fields=["blob_name"])
+    return name
+
+
+def promoted_name(upload):
+    """The blob name promote_upload() gives an upload's bytes."""
+    return blob_name(upload.sha256, blob_extension(upload.staging_name))
+
+
+def _digest(name):
+    return name.rsplit("/", 1)[-1].split(".", 1)[0]
+
+
+def tracked_blob_names(instance):
+    """Blob names referenced by a Particular, Profile or Organization."""
+    names = []
+    for field, thumbs_field in getattr(instance, "BLOB_FIELDS", ()):
+        deferred = instance.get_deferred_fields()
+        if field in deferred or (thumbs_field and thumbs_field in deferred):
+            return None  # not loaded, caller has to fetch it
+        names.append(getattr(instance, field).name)
+        if thumbs_field:
+            names.extend(getattr(instance, thumbs_field).values())
+    return {name for name in names if is_blob(name)}
+
+
+def retain_blobs(names):
+    for name in names:
+        if not is_blob(name):
+            continue
+        StoredBlob.objects.get_or_create(
+            name=name,
+            defaults={"sha256": _digest(name), "size": default_storage.size(name) if default_storage.exists(name) else 0},
+        )
+        StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1, updated_at=timezone.now())
+
+
+def release_blobs(names):
+    names = [name for name in names if is_blob(name)]
+    if not names:
+        return
+    StoredBlob.objects.filter(name__in=names).update(ref_count=F("ref_count") - 1)
+    transaction.on_commit(lambda: collect_blobs(names))
+
+
+def collect_blobs(names):
+    """
+    Delete unreferenced blobs among `names` from storage and the table. The
+    file goes while the row is locked; ContentAddressedStorage._save takes the
+    same lock, so it either sees the file gone or keeps it alive.
+    """
+    for name in names:
+        with transaction.atomic():
+            blob = (
+                StoredBlob.objects.select_for_update(skip_locked=True)
+                .filter(name=name, ref_count__lte=0, updated_at__lt=timezone.now() - WRITE_GRACE)
+                .first()
+            )
+            if blob is None:
+                continue
+            default_storage.delete(name)
+            blob.delete()
+
+
+def track_blobs(names):
+    """
+    Give blob files that have no StoredBlob row a row without references, so
+    collection picks them up after WRITE_GRACE. A promotion whose transaction
+    rolled back leaves such a file: its row went with the rollback.
+    """
+    for name in names:
+        if default_storage.exists(name):
+            StoredBlob.objects.get_or_create(
+                name=name, defaults={"sha256": _digest(name), "size": default_storage.size(name)}
+            )
+
+
+def count_references(names):
+    """How many blob fields point at each of `names`, counted from the tables."""
+    counts = Counter()
+    quote = connection.ops.quote_name
+    for model in BLOB_MODELS:
+        for field, thumbs_field in model.BLOB_FIELDS:
+            counts.update(dict(
+                model.objects.filter(**{f"{field}__in": names}).values_list(field).annotate(n=Count("pk"))
+            ))
+            if thumbs_field:
+                table, column = quote(model._meta.db_table), quote(model._meta.get_field(thumbs_field).column)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT t.value, COUNT(*) FROM {table}, jsonb_each_text({table}.{column}) AS t "
+                        "WHERE t.value = ANY(%s) GROUP BY t.value",
+                        [list(names)],
+                    )
+                    counts.update(dict(cursor.fetchall()))
+    return counts
+
+
+def unreferenced(names):
+    """
+    The names among `names` that no field points at. Blobs that are referenced
+    after all (written past the signals) get their ref_count raised to match.
+    """
+    counts = count_references(names)
+    for name, count in counts.items():
+        StoredBlob.objects.filter(name=name, ref_count__lt=count).update(ref_count=count, updated_at=timezone.now())
+    return [name for name in names if not counts[name]]
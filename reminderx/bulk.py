@@ -0,0 +1,111 @@
+"""
+Bulk import of particulars (with their reminders) for BulkParticularCreateView.
+
+Rows are inserted in batches: one bulk_create for particulars, one for
+reminders and one for the organization admin's ownership rows per batch, all
+inside a single transaction. Plan limits are checked up front instead of
+per row. bulk_create does not send post_save, so the `add_admin_as_owner`
+work and the particular/reminder counters are maintained here set-wise.
+"""
+from django.db import transaction
+from django.db.models import F
+from rest_framework import serializers
+
+from .models import Particular, Profile, Reminder
+from .permissions import check_particular_limit
+from .caching import particulars_changed
+
+BATCH_SIZE = 1000
+
+
+class BulkImporter:
+    def __init__(self, user, batch_size=BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.profile = None
+        self.titles = set()
+        self.created = []
+        self._reserved = 0
+
+    def check_limit(self, incoming):
+        check_particular_limit(self.profile, self._reserved + incoming)
+        self._reserved += incoming
+
+    def owner_profile_id(self):
+        """Organization admin that becomes an owner of every new particular (multiusers only)."""
+        org = self.profile.organization
+        plan = self.profile.subscription_plan
+        if org and plan and plan.name == "multiusers":
+            return org.admin_id
+        return None
+
+    def run(self, documents, total=None):
+        """
+        Import an iterable of validated document dicts. Pass `total` when the
+        size is known so the plan limit is checked once before any insert.
+        """
+        with transaction.atomic():
+            # Row lock keeps concurrent imports/creates from overshooting the plan limit
+            self.profile = (
+                Profile.objects.select_for_update(of=('self',))
+                .select_related('subscription_plan', 'organization')
+                .get(user=self.user)
+            )
+            if total is not None:
+                self.check_limit(total)
+            batch = []
+            for doc in documents:
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    self._insert(batch, check_limit=total is None)
+                    batch = []
+            if batch:
+                self._insert(batch, check_limit=total is None)
+
+            # ...and the cache invalidation signals
+            admin_id = self.owner_profile_id()
+            particulars_changed(
+                [self.user.id, *Profile.objects.filter(pk=admin_id).values_list('user_id', flat=True)]
+            )
+        return self.created
+
+    def _insert(self, batch, check_limit):
+        if check_limit:
+            self.check_limit(len(batch))
+
+        # unique_together (user, title): check the batch and the DB in one query
+        titles = [doc["title"] for doc in batch]
+        seen = set(self.titles)
+        duplicates = set()
+        for title in titles:
+            if title in seen:
+                duplicates.add(title)
+            seen.add(title)
+        duplicates.update(
+            Particular.objects.filter(user=self.user, title__in=titles).values_list("title", flat=True)
+        )
+        if duplicates:
+            raise serializers.ValidationError({"duplicate_titles": sorted(duplicates)})
+        self.titles = seen
+
+        reminders_data = [doc.pop("reminders", []) for doc in batch]
+        particulars = Particular.objects.bulk_create([
+            Particular(user=self.user, reminder_count=len(reminders), **doc)
+            for doc, reminders in zip(batch, reminders_data)
+        ])
+        Reminder.objects.bulk_create([
+            Reminder(particular=particular, **r)
+            for particular, reminders in zip(particulars, reminders_data)
+            for r in reminders
+        ])
+
+        admin_id = self.owner_profile_id()
+        if admin_id:
+            Owner = Particular.owners.through
+            Owner.objects.bulk_create([
+                Owner(particular_id=particular.id, profile_id=admin_id) for particular in particulars
+            ])
+
+        # bulk_create skips the counter signals
+        Profile.objects.filter(pk=self.profile.pk).update(particular_count=F('particular_count') + len(particulars))
+        self.created.extend(particulars)
@@ -0,0 +1,50 @@
+"""
+Cache keys and invalidation for the aggregate endpoints: the per-user
+particular summary and the organization admin overview.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Organization, Profile
+
+# Both keys carry a version from the database, so a write anywhere makes every
+# worker stop reading the old entry even when CACHES is a per-process LocMem;
+# the TTL only bounds how long dead entries take up memory
+SUMMARY_TTL = 60 * 60 * 24
+OVERVIEW_TTL = 60 * 10
+
+
+def particular_summary_key(user_id, version):
+    # The date is part of the key because the expiry buckets move every day
+    return f"particular-summary:{user_id}:{version}:{timezone.localdate().isoformat()}"
+
+
+def particulars_version(user_id):
+    return Profile.objects.filter(user_id=user_id).values_list("particulars_version", flat=True).first() or 0
+
+
+def organization_overview_key(org, cursor=None):
+    # data_version moves on every write, so stale entries are simply never read again
+    return f"org-overview:{org.id}:{org.data_version}:{timezone.localdate().isoformat()}:{cursor or ''}"
+
+
+def particulars_changed(user_ids):
+    """Call after particulars visible to `user_ids` were written or deleted."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    # After commit, so a concurrent request can't cache the pre-write numbers under
+    # the new version, and so the version rows aren't locked for the whole write
+    def bump():
+        Profile.objects.filter(user_id__in=user_ids).update(particulars_version=F("particulars_version") + 1)
+        Organization.objects.filter(members__user_id__in=user_ids).update(data_version=F("data_version") + 1)
+    transaction.on_commit(bump)
+
+
+def organization_changed(organization_id):
+    """Membership or roles changed."""
+    if organization_id:
+        transaction.on_commit(lambda: Organization.objects.filter(pk=organization_id).update(
+            data_version=F("data_version") + 1
+        ))
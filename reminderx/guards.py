@@ -0,0 +1,280 @@
+"""
+Per-provider protection for outbound calls (Mailgun, Twilio, FCM).
+
+One ProviderGuard per provider and process, shared by every caller
+(providers.send_email/send_sms/send_push):
+
+- a token bucket whose rate follows the provider's X-RateLimit-* headers and
+  which pauses for Retry-After on a 429;
+- an AIMD concurrency limit: +1 slot per window of successes, halved on a
+  429, 5xx, timeout or connection error;
+- a circuit breaker: after `failure_threshold` consecutive failures the
+  provider is parked for `cool_off` seconds (doubling up to `max_cool_off`
+  while probes keep failing). Calls to a parked provider raise
+  ProviderUnavailable immediately, so a degraded provider costs nothing
+  and the other channels keep flowing.
+
+Client errors other than 429 (bad phone number, invalid token) are the
+caller's problem and don't count against the provider's health, nor do
+exceptions raised before anything reached the network.
+
+Headers come from the response object (Mailgun, FCM over HTTP) or, for SDKs
+whose results don't carry them (Twilio), from a `response_headers` callable
+passed to call(). The Firebase Admin SDK exposes headers only on errors, so
+with it the bucket is tuned by 429s and Retry-After alone.
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+from .metrics import Counter
+from .ratelimit import TokenBucket
+
+DEFAULTS = {
+    'rate': 10,               # calls per second until the provider's headers say otherwise
+    'max_concurrency': 8,
+    'min_concurrency': 1,
+    'failure_threshold': 5,   # consecutive failures that open the circuit
+    'cool_off': 30,           # seconds a tripped provider stays parked
+    'max_cool_off': 300,
+    'max_wait': 10,           # longest a caller waits for a token or a slot
+}
+MIN_RATE = 0.1
+
+PROVIDER_REJECTED = Counter('reminderx_provider_rejected_total', 'Calls refused by the provider guard',
+                            ['provider', 'reason'])
+
+
+class ProviderUnavailable(Exception):
+    """The provider was not called: its circuit is open or it is saturated."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} unavailable ({reason})")
+        self.provider, self.reason = provider, reason
+
+
+def _response(error):
+    # requests.HTTPError.response / firebase_admin FirebaseError.http_response
+    # requests.Response is falsy for any 4xx/5xx, so test for None explicitly
+    response = getattr(error, 'response', None)
+    if response is None:
+        response = getattr(error, 'http_response', None)
+    return response
+
+
+def _status(error):
+    status = getattr(_response(error), 'status_code', None)
+    if status is None:
+        status = getattr(error, 'status', None)  # TwilioRestException
+    return status if isinstance(status, int) else None
+
+
+TRANSPORT_ERRORS = ('ConnectionError', 'DeadlineExceededError', 'UnavailableError')
+
+
+def _is_transport_error(error):
+    """Timeouts and connection failures, including SDK wrappers that aren't OSErrors."""
+    if isinstance(error, OSError):  # requests' exceptions, socket.timeout, TimeoutError
+        return True
+    return any('Timeout' in cls.__name__ or cls.__name__ in TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+def _seconds_until(value, now):
+    """Retry-After / X-RateLimit-Reset as seconds from now (delta, epoch s/ms or HTTP date)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        try:
+            return parsedate_to_datetime(value).timestamp() - now
+        except (TypeError, ValueError):
+            return None
+    if number > 1e11:  # epoch milliseconds
+        return number / 1000 - now
+    if number > 1e9:  # epoch seconds
+        return number - now
+    return number
+
+
+class ProviderGuard:
+    def __init__(self, name, rate, max_concurrency, min_concurrency, failure_threshold, cool_off,
+                 max_cool_off, max_wait):
+        self.name = name
+        self.base_rate = float(rate)
+        self.bucket = TokenBucket(rate)
+        self.min_concurrency, self.max_concurrency = min_concurrency, max_concurrency
+        self.limit = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self.failure_threshold = failure_threshold
+        self.initial_cool_off = self.cool_off = cool_off
+        self.max_cool_off = max_cool_off
+        self.max_wait = max_wait
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def state(self):
+        with self.condition:
+            if self.probing:
+                circuit = 'half_open'
+            elif time.monotonic() < self.open_until:
+                circuit = 'open'
+            else:
+                circuit = 'closed'
+            return {'circuit': circuit, 'concurrency_limit': int(self.limit), 'in_flight': self.in_flight,
+                    'rate': round(self.bucket.rate, 2), 'consecutive_failures': self.failures}
+
+    def is_open(self):
+        return self.state()['circuit'] != 'closed'
+
+    def call(self, send, *args, response_headers=None, **kwargs):
+        """
+        Run send(*args, **kwargs) under the rate, concurrency and circuit limits.
+        `response_headers`, if given, returns the headers of the response `send`
+        just received (for clients whose results don't expose them).
+        """
+        probe = self._admit()
+        try:
+            self._acquire_slot()
+        except ProviderUnavailable:
+            self._end_probe(probe)
+            raise
+        try:
+            self._wait_for_token()
+            try:
+                result = send(*args, **kwargs)
+            except Exception as error:
+                status = _status(error)
+                headers = response_headers() if response_headers else getattr(_response(error), 'headers', None)
+                if status == 429 or (status or 0) >= 500 or (status is None and _is_transport_error(error)):
+                    self._failed(probe, status, headers)
+                elif status is not None:
+                    self._succeeded(probe, headers)  # the provider is fine, the request wasn't
+                else:
+                    self._end_probe(probe)  # failed before reaching the provider
+                raise
+            self._succeeded(probe, response_headers() if response_headers else getattr(result, 'headers', None))
+            return result
+        except ProviderUnavailable:
+            self._end_probe(probe)
+            raise
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify()
+
+    def _reject(self, reason):
+        PROVIDER_REJECTED.inc(provider=self.name, reason=reason)
+        raise ProviderUnavailable(self.name, reason)
+
+    def _admit(self):
+        """Check the circuit; returns True if this call is the half-open probe."""
+        with self.condition:
+            if self.probing or time.monotonic() < self.open_until:
+                self._reject('circuit_open')
+            if self.open_until:
+                # cool-off over: let one call through to see if the provider recovered
+                self.probing = True
+                return True
+            return False
+
+    def _end_probe(self, probe):
+        if probe:
+            with self.condition:
+                self.probing = False
+
+    def _acquire_slot(self):
+        deadline = time.monotonic() + self.max_wait
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject('concurrency')
+                self.condition.wait(remaining)
+            self.in_flight += 1
+
+    def _wait_for_token(self):
+        pause = self.paused_until - time.monotonic()
+        if pause > self.max_wait:
+            self._reject('retry_after')
+        if pause > 0:
+            time.sleep(pause)
+        if not self.bucket.acquire(timeout=self.max_wait - max(pause, 0)):
+            self._reject('rate')
+
+    def _succeeded(self, probe, headers):
+        with self.condition:
+            self.failures = 0
+            if probe:
+                self.probing = False
+                self.open_until = 0.0
+                self.cool_off = self.initial_cool_off
+            # additive increase: about one more slot per `limit` successful calls
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._tune(headers)
+
+    def _failed(self, probe, status, headers):
+        with self.condition:
+            # multiplicative decrease
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self.failures += 1
+            self._tune(headers)
+            if status == 429 and self.paused_until <= time.monotonic():
+                self.paused_until = time.monotonic() + 1  # 429 without Retry-After
+            if probe or self.failures >= self.failure_threshold:
+                if probe:
+                    self.cool_off = min(self.max_cool_off, self.cool_off * 2)
+                self.probing = False
+                self.open_until = time.monotonic() + self.cool_off
+            self.condition.notify_all()
+
+    def _tune(self, headers):
+        """Follow the provider's own rate-limit headers."""
+        if not headers:
+            return
+        now = time.time()
+        retry_after = _seconds_until(headers.get('Retry-After'), now)
+        if retry_after and retry_after > 0:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_in = _seconds_until(headers.get('X-RateLimit-Reset'), now)
+        if remaining is not None and reset_in is not None:
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                return
+            # spread what is left of the provider's window over the time until it resets
+            rate = remaining / max(reset_in, 1.0)
+            self.bucket.set_rate(max(MIN_RATE, min(self.base_rate, rate)))
+        elif self.bucket.rate < self.base_rate:
+            self.bucket.set_rate(min(self.base_rate, self.bucket.rate * 2))
+
+
+_guards = {}
+_lock = threading.Lock()
+
+
+def guard(provider):
+    """The shared guard for `provider` (mailgun, twilio, fcm), configured by PROVIDER_GUARDS."""
+    try:
+        return _guards[provider]
+    except KeyError:
+        pass
+    with _lock:
+        if provider not in _guards:
+            config = {**DEFAULTS, **getattr(settings, 'PROVIDER_GUARDS', {}).get(provider, {})}
+            _guards[provider] = ProviderGuard(provider, **config)
+        return _guards[provider]
+
+
+def states():
+    return {name: g.state() for name, g in list(_guards.items())}
+
+
+def reset():
+    with _lock:
+        _guards.clear()
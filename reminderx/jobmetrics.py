@@ -0,0 +1,146 @@
+"""
+Per-run metrics for the cron pipeline commands (generate_notifications,
+send_notifications): counters, gauges, per-stage wall/DB time and provider
+latency per channel. A run ends with JSON lines on stdout (one per stage,
+one summary) and, optionally, a push in Prometheus text format to a
+pushgateway (`<url>/metrics/job/<job>`).
+"""
+import json
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from .guards import ProviderUnavailable
+
+MAX_ERROR_SAMPLES = 5
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+
+class JobMetrics:
+    def __init__(self, job):
+        self.job = job
+        self.started = time.time()
+        self.counters = Counter()
+        self.gauges = {}
+        self.stages = {}
+        self.latencies = defaultdict(list)  # channel -> ms
+        self.errors = defaultdict(list)  # channel -> first few error messages
+        self.lock = threading.Lock()  # call() and count() may run on worker threads
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage: wall time plus the time and number of queries it ran."""
+        stats = self.stages.setdefault(name, {'seconds': 0.0, 'db_seconds': 0.0, 'queries': 0})
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['db_seconds'] += time.perf_counter() - start
+                stats['queries'] += 1
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                yield
+        finally:
+            stats['seconds'] += time.perf_counter() - start
+
+    def call(self, channel, send):
+        """Run one provider call, recording latency and outcome. Returns True on success."""
+        start = time.perf_counter()
+        try:
+            send()
+        except ProviderUnavailable as e:
+            # refused by the provider's guard without a call: no latency to record
+            self.count(f'{channel}.{e.reason}')
+            return False
+        except Exception as e:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.latencies[channel].append(elapsed)
+                if len(self.errors[channel]) < MAX_ERROR_SAMPLES:
+                    self.errors[channel].append(str(e)[:200])
+            self.count(f'{channel}.failed')
+            return False
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies[channel].append(elapsed)
+        self.count(f'{channel}.sent')
+        return True
+
+    def latency_summary(self):
+        return {
+            channel: {
+                'count': len(values),
+                'p50_ms': _percentile(values, 0.5),
+                'p99_ms': _percentile(values, 0.99),
+                'max_ms': round(max(values), 2),
+                'mean_ms': round(statistics.mean(values), 2),
+            }
+            for channel, values in self.latencies.items() if values
+        }
+
+    def lines(self):
+        lines = [
+            {'job': self.job, 'stage': name, 'seconds': round(s['seconds'], 4),
+             'db_seconds': round(s['db_seconds'], 4), 'queries': s['queries']}
+            for name, s in self.stages.items()
+        ]
+        lines.append({
+            'job': self.job,
+            'event': 'run',
+            'started_at': self.started,
+            'seconds': round(time.time() - self.started, 4),
+            'counters': dict(self.counters),
+            'gauges': self.gauges,
+            'provider_latency': self.latency_summary(),
+            'errors': dict(self.errors),
+        })
+        return lines
+
+    def emit(self, stdout):
+        for line in self.lines():
+            stdout.write(json.dumps(line, default=str))
+
+    def prometheus(self):
+        job = self.job
+        out = [f'reminderx_job_last_run_timestamp_seconds{{job="{job}"}} {self.started}',
+               f'reminderx_job_duration_seconds{{job="{job}"}} {time.time() - self.started}']
+        for name, value in sorted(self.counters.items()):
+            out.append(f'reminderx_job_events{{job="{job}",event="{name}"}} {value}')
+        for name, value in sorted(self.gauges.items()):
+            if value is not None:
+                out.append(f'reminderx_job_{name}{{job="{job}"}} {value}')
+        for name, s in self.stages.items():
+            out.append(f'reminderx_job_stage_seconds{{job="{job}",stage="{name}"}} {s["seconds"]}')
+            out.append(f'reminderx_job_stage_db_seconds{{job="{job}",stage="{name}"}} {s["db_seconds"]}')
+            out.append(f'reminderx_job_stage_queries{{job="{job}",stage="{name}"}} {s["queries"]}')
+        for channel, values in self.latencies.items():
+            for q in (0.5, 0.99):
+                out.append(f'reminderx_job_provider_ms{{job="{job}",channel="{channel}",quantile="{q}"}} '
+                           f'{_percentile(values, q)}')
+        return "\n".join(out) + "\n"
+
+    def push(self, url):
+        import requests
+        response = requests.put(f"{url.rstrip('/')}/metrics/job/{self.job}", data=self.prometheus(), timeout=5)
+        response.raise_for_status()
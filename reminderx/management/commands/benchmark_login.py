@@ -0,0 +1,69 @@
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import authenticate, hashers
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reminderx.serializers import CustomTokenObtainPairSerializer
+
+
+def legacy_login(login, password):
+    """The previous validate(): two lookups, check_password, then authenticate() hashes again."""
+    user = User.objects.filter(username=login).first()
+    if user is None:
+        user = User.objects.filter(email=login).first()
+    if user is None or not user.check_password(password):
+        return False
+    return authenticate(username=user.username, password=password) is not None
+
+
+def current_login(login, password):
+    serializer = CustomTokenObtainPairSerializer(data={'username': login, 'password': password})
+    return serializer.is_valid()
+
+
+class Command(BaseCommand):
+    help = 'Compare login cost (queries, password hashes, latency) of the old and current login paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--login', required=True, help='Username or email of an existing account')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        report = {}
+        for name, attempt in (('legacy', legacy_login), ('current', current_login)):
+            report[name] = self.measure(attempt, options)
+        report['cpu_ratio'] = round(report['current']['cpu_ms'] / report['legacy']['cpu_ms'], 3)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, attempt, options):
+        real_pbkdf2 = hashers.pbkdf2
+        hashes = []
+
+        def counting_pbkdf2(*args, **kwargs):
+            hashes.append(1)
+            return real_pbkdf2(*args, **kwargs)
+
+        wall, cpu, queries, ok = [], [], [], True
+        with mock.patch.object(hashers, 'pbkdf2', counting_pbkdf2):
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as captured:
+                    start_wall, start_cpu = time.perf_counter(), time.process_time()
+                    ok = attempt(options['login'], options['password']) and ok
+                    cpu.append((time.process_time() - start_cpu) * 1000)
+                    wall.append((time.perf_counter() - start_wall) * 1000)
+                queries.append(len(captured.captured_queries))
+
+        return {
+            'succeeded': ok,
+            'password_hashes_per_login': len(hashes) / options['repeat'],
+            'queries_per_login': statistics.mean(queries),
+            'p50_ms': round(statistics.median(wall), 3),
+            'cpu_ms': round(statistics.mean(cpu), 3),
+        }
@@ -0,0 +1,67 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from reminderx.models import Particular
+from reminderx.views import ParticularSearchView
+
+
+def legacy_queryset(user, q):
+    """ParticularSearchView as it was: OR'd owners join + DISTINCT + unindexed icontains."""
+    return Particular.objects.filter(
+        Q(user=user) | Q(owners=user.profile)
+    ).distinct().filter(title__icontains=q)
+
+
+def current_queryset(user, q, mode):
+    request = Request(RequestFactory().get('/api/particulars/search/', {'q': q, 'mode': mode}))
+    request.user = user
+    view = ParticularSearchView()
+    view.request = request
+    return view.get_queryset()
+
+
+def timed(build, repeat):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(list(build().values_list('id', flat=True)))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'rows': rows,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare particular search latency: legacy icontains vs trigram / full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to search as')
+        parser.add_argument('--q', default='licen', help='Search term')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.select_related('profile').get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        q, repeat = options['q'], options['repeat']
+        report = {
+            'q': q,
+            'legacy': timed(lambda: legacy_queryset(user, q), repeat),
+        }
+        for mode in ('contains', 'prefix', 'fulltext'):
+            report[mode] = timed(lambda: current_queryset(user, q, mode), repeat)
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,50 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reminderx.blobs import WRITE_GRACE, collect_blobs, promoted_name, track_blobs, unreferenced
+from reminderx.models import BlobUpload, StoredBlob
+
+
+class Command(BaseCommand):
+    help = 'Delete presigned uploads that were never attached and blobs nothing references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        staging_ttl = timedelta(hours=getattr(settings, 'UPLOAD_STAGING_HOURS', 24))
+        batch_size = options['batch_size']
+
+        # PUT (or never PUT) to a staging key and never sent as document_key
+        uploads = 0
+        stale = BlobUpload.objects.filter(blob_name='', created_at__lt=now - staging_ttl)
+        while True:
+            batch = list(stale.order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for upload in batch:
+                default_storage.delete(upload.staging_name)
+            BlobUpload.objects.filter(pk__in=[upload.pk for upload in batch]).delete()
+            # Promoted in a save that rolled back: the blob file is there, its row isn't
+            track_blobs([promoted_name(upload) for upload in batch])
+            uploads += len(batch)
+
+        # Promoted (or saved) but never attached, or released while still fresh
+        orphans = StoredBlob.objects.filter(ref_count__lte=0, updated_at__lt=now - WRITE_GRACE)
+        names = list(orphans.values_list('name', flat=True))
+        for start in range(0, len(names), batch_size):
+            # Recount first: bulk_create / QuerySet.update() don't take references
+            collect_blobs(unreferenced(names[start:start + batch_size]))
+        # The uploads that pointed at them can no longer be reused by key
+        BlobUpload.objects.filter(blob_name__in=names).exclude(
+            blob_name__in=StoredBlob.objects.values('name')
+        ).delete()
+
+        self.stdout.write(json.dumps({'staged_uploads_deleted': uploads, 'orphan_blobs_checked': len(names)}))
+        self.stdout.write(self.style.SUCCESS(f"{uploads} stale uploads and {len(names)} unreferenced blobs collected."))
@@ -0,0 +1,237 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reminderx.ratelimit import TokenBucket
+
+PROVIDERS = ('mailgun', 'twilio', 'fcm', 'paystack')
+DEFAULTS = {
+    'latency_ms': 50.0,       # median latency
+    'jitter_ms': 20.0,        # spread; meaning depends on `dist`
+    'dist': 'lognormal',      # fixed, uniform, normal, lognormal, exponential
+    'error_rate': 0.0,        # share of requests answered 500
+    'throttle_rate': 0.0,     # share of requests answered 429 regardless of the bucket
+    'rate': 0.0,              # requests per second before 429s (0: unlimited)
+    'burst': 0.0,             # bucket capacity (default: rate)
+    'hang_rate': 0.0,         # share of requests that stall for hang_seconds (client timeouts)
+    'hang_seconds': 30.0,
+}
+
+
+class Behaviour:
+    """Latency/error/rate-limit profile of one fake provider."""
+
+    def __init__(self, name, **config):
+        self.name = name
+        self.config = config
+        self.bucket = TokenBucket(config['rate'], config['burst'] or None) if config['rate'] else None
+        self.rng = random.Random()
+
+    def latency(self):
+        c, rng = self.config, self.rng
+        median, jitter = c['latency_ms'], c['jitter_ms']
+        if c['dist'] == 'fixed':
+            ms = median
+        elif c['dist'] == 'uniform':
+            ms = rng.uniform(median - jitter, median + jitter)
+        elif c['dist'] == 'normal':
+            ms = rng.gauss(median, jitter)
+        elif c['dist'] == 'exponential':
+            ms = rng.expovariate(1 / median) if median else 0
+        else:
+            # lognormal with the given median; jitter sets the spread (long right tail)
+            sigma = jitter / median if median else 0
+            ms = median * rng.lognormvariate(0, sigma)
+        return max(0.0, ms) / 1000
+
+    def outcome(self):
+        """(status, extra headers) to answer with, before the latency is applied."""
+        c = self.config
+        headers = {}
+        if self.bucket is not None:
+            allowed = self.bucket.try_acquire()
+            headers = {
+                'X-RateLimit-Limit': str(int(c['rate'])),
+                'X-RateLimit-Remaining': str(int(self.bucket.tokens)),
+            }
+            if not allowed:
+                retry_after = max(1, round(1 / c['rate']))
+                headers.update({'Retry-After': str(retry_after), 'X-RateLimit-Remaining': '0',
+                                'X-RateLimit-Reset': str(int(time.time()) + retry_after)})
+                return 429, headers
+        if self.rng.random() < c['throttle_rate']:
+            return 429, {**headers, 'Retry-After': '1'}
+        if self.rng.random() < c['hang_rate']:
+            time.sleep(c['hang_seconds'])
+        if self.rng.random() < c['error_rate']:
+            return 500, headers
+        return 200, headers
+
+
+class FakeProviders:
+    """Routes, canned responses and counters shared by the request handler threads."""
+
+    ROUTES = [
+        ('POST', re.compile(r'^/v3/[^/]+/messages$'), 'mailgun', 'mailgun_send'),
+        ('POST', re.compile(r'^/2010-04-01/Accounts/[^/]+/Messages\.json$'), 'twilio', 'twilio_send'),
+        ('POST', re.compile(r'^/v1/projects/[^/]+/messages:send$'), 'fcm', 'fcm_send'),
+        ('POST', re.compile(r'^/transaction/initialize$'), 'paystack', 'paystack_initialize'),
+        ('GET', re.compile(r'^/transaction/verify/(?P<reference>[^/]+)$'), 'paystack', 'paystack_verify'),
+    ]
+
+    def __init__(self, behaviours):
+        self.behaviours = behaviours
+        self.stats = Counter()
+        self.transactions = {}
+        self.pushed = {}  # pushgateway stand-in: job -> last pushed metrics text
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def mailgun_send(self, body, **kwargs):
+        return 200, {'id': f"<{uuid.uuid4().hex}@fake.mailgun>", 'message': 'Queued. Thank you.'}
+
+    def twilio_send(self, body, **kwargs):
+        return 201, {'sid': f"SM{uuid.uuid4().hex}", 'status': 'queued', 'to': body.get('To'), 'body': body.get('Body')}
+
+    def fcm_send(self, body, **kwargs):
+        return 200, {'name': f"projects/fake/messages/{uuid.uuid4().int >> 64}"}
+
+    def paystack_initialize(self, body, **kwargs):
+        reference = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.transactions[reference] = body
+        return 200, {'status': True, 'message': 'Authorization URL created', 'data': {
+            'authorization_url': f"https://checkout.fake/{reference}", 'access_code': reference, 'reference': reference,
+        }}
+
+    def paystack_verify(self, body, reference, **kwargs):
+        with self.lock:
+            initialized = self.transactions.get(reference)
+        if initialized is None:
+            return 400, {'status': False, 'message': 'Transaction reference not found'}
+        return 200, {'status': True, 'message': 'Verification successful', 'data': {
+            'status': 'success', 'reference': reference, 'amount': initialized.get('amount'),
+            'metadata': initialized.get('metadata', {}), 'customer': {'email': initialized.get('email')},
+        }}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+    fakes = None
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate the run; see /stats instead
+
+    def read_body(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(raw or b'{}')
+        return {key: values[-1] for key, values in parse_qs(raw.decode()).items()}
+
+    def reply(self, status, payload, headers=None, content_type='application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.fakes.lock:
+                return self.reply(200, dict(self.fakes.stats))
+        if self.path == '/metrics':
+            with self.fakes.lock:
+                text = ''.join(self.fakes.pushed.values()).encode()
+            return self.reply(200, text, content_type='text/plain; version=0.0.4')
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        match = re.match(r'^/metrics/job/(?P<job>[^/]+)', self.path)
+        if not match:
+            return self.reply(404, {'error': 'not found'})
+        text = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        with self.fakes.lock:
+            self.fakes.pushed[match['job']] = text
+            self.fakes.stats['pushgateway.200'] += 1
+        self.reply(200, b'', content_type='text/plain')
+
+    def dispatch(self, method):
+        path = self.path.split('?', 1)[0]
+        for route_method, pattern, provider, handler in self.fakes.ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                break
+        else:
+            return self.reply(404, {'error': f'no fake for {method} {path}'})
+
+        body = self.read_body() if method == 'POST' else {}
+        behaviour = self.fakes.behaviours[provider]
+        status, headers = behaviour.outcome()
+        time.sleep(behaviour.latency())
+        self.fakes.count(f"{provider}.{status}")
+        if status == 429:
+            return self.reply(429, {'message': 'Too Many Requests'}, headers)
+        if status != 200:
+            return self.reply(status, {'message': 'Injected failure'}, headers)
+        status, payload = getattr(self.fakes, handler)(body, **match.groupdict())
+        self.reply(status, payload, headers)
+
+
+class Command(BaseCommand):
+    help = ('Local fake Mailgun, Twilio, FCM and Paystack APIs (plus a pushgateway stand-in) with injected '
+            'latency, errors and rate limits. Point MAILGUN_BASE_URL, TWILIO_BASE_URL, FCM_BASE_URL and '
+            'PAYSTACK_BASE_URL at it. Development and load testing only.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        for key, default in DEFAULTS.items():
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default)
+        parser.add_argument('--set', action='append', default=[], metavar='PROVIDER.KEY=VALUE',
+                            help='Per-provider override, e.g. --set twilio.rate=5 --set mailgun.error_rate=0.1')
+
+    def handle(self, *args, **options):
+        configs = {name: {key: options[key] for key in DEFAULTS} for name in PROVIDERS}
+        for override in options['set']:
+            match = re.match(r'^(\w+)\.(\w+)=(.+)$', override)
+            if not match or match[1] not in PROVIDERS or match[2] not in DEFAULTS:
+                raise CommandError(f"Bad --set '{override}'; providers: {', '.join(PROVIDERS)}, "
+                                   f"keys: {', '.join(DEFAULTS)}")
+            configs[match[1]][match[2]] = type(DEFAULTS[match[2]])(match[3])
+
+        Handler.fakes = FakeProviders({name: Behaviour(name, **config) for name, config in configs.items()})
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        server.daemon_threads = True
+
+        base = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(f"Fake providers on {base}")
+        for name, config in configs.items():
+            self.stdout.write(f"  {name}: {json.dumps(config)}")
+        self.stdout.write(
+            f"Use MAILGUN_BASE_URL={base} TWILIO_BASE_URL={base} FCM_BASE_URL={base} PAYSTACK_BASE_URL={base}; "
+            f"GET {base}/stats for counts, --pushgateway {base} for job metrics."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(json.dumps(dict(Handler.fakes.stats)))
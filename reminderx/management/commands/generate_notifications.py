@@ -2,30 +2,58 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from reminderx.models import Reminder, Notification, get_allowed_methods
 from datetime import timedelta
+from django.db import transaction
 from django.db.models import Q
+from reminderx.jobmetrics import JobMetrics
+from reminderx.routers import read_from_replica
 
 class Command(BaseCommand):
     help = 'Generate notifications for due reminders'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--pushgateway', default='',
+                            help='Pushgateway base URL to push the run metrics to')
+
+    def handle(self, *args, **options):
+        run = JobMetrics('generate_notifications')
         now = timezone.now()
         today = now.date()
+        today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # The candidate scans are the big reads, so they run on a replica.
+        # The per-reminder "already notified today" checks below stay on the
+        # primary since they must see the notifications created in this run.
+        with run.stage('scan'), read_from_replica():
+            # Get scheduled reminders that are due today and not sent yet
+            scheduled_reminders = list(Reminder.objects.filter(
+                scheduled_date__lte=now,
+                sent=False
+            ).select_related('particular__user__profile'))
+
+            # Get recurring reminders that should trigger today
+            recurring_reminders = list(Reminder.objects.filter(
+                recurrence__in=['daily', 'every_2_days'],
+                particular__expiry_date__gt=today  # Not expired
+            ).select_related('particular__user__profile'))
+        run.count('candidates.scheduled', len(scheduled_reminders))
+        run.count('candidates.recurring', len(recurring_reminders))
+
+        with run.stage('scheduled'):
+            self.process_scheduled(run, scheduled_reminders, now)
+        with run.stage('recurring'):
+            self.process_recurring(run, recurring_reminders, today, today_start)
+
+        run.emit(self.stdout)
+        if options['pushgateway']:
+            try:
+                run.push(options['pushgateway'])
+            except Exception as e:
+                self.stderr.write(f"Pushgateway push failed: {e}")
+
+        count = run.counters['created.scheduled'] + run.counters['created.recurring']
+        self.stdout.write(self.style.SUCCESS(f"{count} notifications generated."))
 
-        # Get scheduled reminders that are due today and not sent yet
-        scheduled_reminders = Reminder.objects.filter(
-            scheduled_date__lte=now,
-            sent=False
-        )
-
-        # Get recurring reminders that should trigger today
-        recurring_reminders = Reminder.objects.filter(
-            recurrence__in=['daily', 'every_2_days'],
-            particular__expiry_date__gt=today  # Not expired
-        )
-
-        count = 0
-
-        # Process scheduled reminders
+    def process_scheduled(self, run, scheduled_reminders, now):
         for reminder in scheduled_reminders:
             user = reminder.particular.user
             profile = user.profile
@@ -35,49 +63,56 @@ class Command(BaseCommand):
             used_methods = [m for m in reminder.reminder_methods if m in allowed_methods]
 
             if not used_methods:
+                run.count('skipped.no_methods')
                 continue  # Skip if no usable methods
 
             # Use custom message if provided, otherwise use default
             message = reminder.reminder_message or f"Reminder: {reminder.particular.title} is due on {reminder.particular.expiry_date}. Please renew it."
 
-            Notification.objects.create(
-                user=user,
-                particular_title=reminder.particular.title,
-                message=message,
-                send_email='email' in used_methods,
-                send_sms='sms' in used_methods,
-                send_push='push' in used_methods,
-                send_whatsapp='whatsapp' in used_methods,
-            )
+            with transaction.atomic():
+                # The scan may lag the primary; only the run that flips `sent` notifies
+                if not Reminder.objects.filter(pk=reminder.pk, sent=False).update(sent=True, sent_at=now):
+                    run.count('skipped.already_claimed')
+                    continue
 
-            reminder.sent = True
-            reminder.sent_at = now
-            reminder.save()
+                Notification.objects.create(
+                    user=user,
+                    particular_title=reminder.particular.title,
+                    message=message,
+                    send_email='email' in used_methods,
+                    send_sms='sms' in used_methods,
+                    send_push='push' in used_methods,
+                    send_whatsapp='whatsapp' in used_methods,
+                )
 
-            count += 1
+            run.count('created.scheduled')
 
-        # Process recurring reminders
+    def process_recurring(self, run, recurring_reminders, today, today_start):
         for reminder in recurring_reminders:
             days_until_expiry = (reminder.particular.expiry_date - today).days
             
             # Skip if not within start_days_before window
             if days_until_expiry > reminder.start_days_before:
+                run.count('skipped.outside_window')
                 continue
 
             # Skip if not a recurrence day
             if reminder.recurrence == 'daily':
                 if days_until_expiry < 0:  # Skip if expired
+                    run.count('skipped.not_recurrence_day')
                     continue
             elif reminder.recurrence == 'every_2_days':
                 if days_until_expiry < 0 or days_until_expiry % 2 != 0:  # Skip if expired or not an even day
+                    run.count('skipped.not_recurrence_day')
                     continue
 
             # Check if a notification was already created for this reminder today
             if Notification.objects.filter(
                 user=reminder.particular.user,
                 particular_title=reminder.particular.title,
-                created_at__date=today
+                created_at__gte=today_start  # a range, not __date, so only this month's partition is read
             ).exists():
+                run.count('skipped.already_notified_today')
                 continue
 
             user = reminder.particular.user
@@ -88,6 +123,7 @@ class Command(BaseCommand):
             used_methods = [m for m in reminder.reminder_methods if m in allowed_methods]
 
             if not used_methods:
+                run.count('skipped.no_methods')
                 continue  # Skip if no usable methods
 
             # Use custom message if provided, otherwise use default
@@ -103,6 +139,4 @@ class Command(BaseCommand):
                 send_whatsapp='whatsapp' in used_methods,
             )
 
-            count += 1
-
-        self.stdout.write(self.style.SUCCESS(f"{count} notifications generated."))
+            run.count('created.recurring')
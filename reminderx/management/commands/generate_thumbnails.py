@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from reminderx.models import Profile, Organization
+from reminderx.images import render_thumbnails
+from reminderx.blobs import retain_blobs, release_blobs
+
+# (model, image field, thumbnail map field)
+TARGETS = [
+    (Profile, 'profile_picture', 'profile_picture_thumbnails'),
+    (Organization, 'icon', 'icon_thumbnails'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails for new profile pictures and organization icons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200, help='Max images per model per run')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        generated = failed = 0
+
+        for model, field, thumbs_field in TARGETS:
+            pending = (
+                model.objects
+                .exclude(**{f'{field}__isnull': True})
+                .exclude(**{field: ''})
+                .filter(**{thumbs_field: {}})
+                .only('pk', field)[:limit]
+            )
+
+            for obj in pending:
+                image = getattr(obj, field)
+                try:
+                    thumbnails = render_thumbnails(image)
+                    generated += 1
+                except Exception as e:
+                    # Keep the error so the row isn't retried on every run
+                    thumbnails = {'error': str(e)[:200]}
+                    failed += 1
+
+                # Only apply if the image wasn't replaced while we were rendering.
+                # update() skips the model signals, so take the blob references here.
+                names = set(thumbnails.values())
+                retain_blobs(names)
+                updated = model.objects.filter(pk=obj.pk, **{field: image.name}).update(**{thumbs_field: thumbnails})
+                if not updated:
+                    release_blobs(names)
+
+        self.stdout.write(self.style.SUCCESS(f"{generated} images processed, {failed} failed."))
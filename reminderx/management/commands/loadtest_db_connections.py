@@ -0,0 +1,98 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reminderx.models import Particular
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 3)
+
+
+class Command(BaseCommand):
+    help = 'Replay a request-shaped DB workload at a fixed RPS with fresh vs reused connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rps', type=int, default=200)
+        parser.add_argument('--seconds', type=int, default=10)
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent "workers"')
+
+    def handle(self, *args, **options):
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        report = {'rps': options['rps'], 'seconds': options['seconds']}
+
+        # `fresh` is the old behaviour: a new connection for every request.
+        # With DB_POOL_MODE=psycopg both runs borrow from the pool.
+        try:
+            report['fresh'] = self.run(0, options)
+            report['configured'] = self.run(configured, options)
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = configured
+        report['configured']['conn_max_age'] = configured
+        report['saved_per_request_ms'] = round(
+            report['fresh']['request_p50_ms'] - report['configured']['request_p50_ms'], 3
+        )
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, conn_max_age, options):
+        connect_ms, request_ms = [], []
+        lock = threading.Lock()
+        total = options['rps'] * options['seconds']
+        interval = 1 / options['rps']
+
+        def request():
+            # Same lifecycle as a real request: close_old_connections() runs
+            # on request_started/request_finished and honours CONN_MAX_AGE
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+            signals.request_started.send(sender=self.__class__)
+            try:
+                start = time.perf_counter()
+                fresh = connection.connection is None
+                connection.ensure_connection()
+                connected = time.perf_counter()
+                Particular.objects.order_by('-id').values_list('id', flat=True)[:20].count()
+                finished = time.perf_counter()
+            finally:
+                signals.request_finished.send(sender=self.__class__)
+            with lock:
+                if fresh:
+                    connect_ms.append((connected - start) * 1000)
+                request_ms.append((finished - start) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for i in range(total):
+                # Open-loop arrivals: keep the schedule even if requests are slow
+                delay = started + i * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(request)
+
+            # Each worker thread has its own connection; close every one of them
+            # (a barrier makes each thread take exactly one close) so runs don't
+            # leak connections into the next run or onto the server
+            barrier = threading.Barrier(options['threads'])
+
+            def close():
+                barrier.wait(timeout=60)
+                connection.close()
+
+            for _ in range(options['threads']):
+                pool.submit(close)
+
+        return {
+            'requests': len(request_ms),
+            'new_connections': len(connect_ms),
+            'connect_p50_ms': percentile(connect_ms, 0.5) if connect_ms else 0,
+            'request_p50_ms': percentile(request_ms, 0.5),
+            'request_p99_ms': percentile(request_ms, 0.99),
+            'mean_ms': round(statistics.mean(request_ms), 3),
+        }
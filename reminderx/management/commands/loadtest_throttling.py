@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from reminderx import throttling
+from reminderx.views import CustomTokenObtainPairView
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 3) if values else None
+
+
+class Command(BaseCommand):
+    help = 'Credential-stuffing burst against the login view, with and without throttling, while probing responsiveness'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Bad login attempts in the burst')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--username', default='loadtest-nobody')
+
+    def handle(self, *args, **options):
+        report = {}
+        original = CustomTokenObtainPairView.throttle_classes
+        try:
+            CustomTokenObtainPairView.throttle_classes = []
+            report['unthrottled'] = self.run(options)
+            CustomTokenObtainPairView.throttle_classes = original
+            throttling._memory.clear()
+            report['throttled'] = self.run(options)
+        finally:
+            CustomTokenObtainPairView.throttle_classes = original
+            throttling._memory.clear()
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, options):
+        factory = RequestFactory()
+        login = CustomTokenObtainPairView.as_view()
+        refresh = TokenRefreshView.as_view()
+        statuses, burst_ms, probe_ms = Counter(), [], []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def attempt(i):
+            request = factory.post(
+                '/api/token/',
+                {'username': options['username'], 'password': f'wrong-{i}'},
+                content_type='application/json',
+                REMOTE_ADDR='203.0.113.7',
+            )
+            start = time.perf_counter()
+            response = login(request)
+            with lock:
+                statuses[response.status_code] += 1
+                burst_ms.append((time.perf_counter() - start) * 1000)
+
+        def probe():
+            # A cheap, unthrottled request from another client: how long does it wait for a worker?
+            while not done.is_set():
+                request = factory.post('/api/token/refresh/', {'refresh': 'x'}, content_type='application/json',
+                                       REMOTE_ADDR='198.51.100.1')
+                start = time.perf_counter()
+                refresh(request)
+                probe_ms.append((time.perf_counter() - start) * 1000)
+                time.sleep(0.05)
+
+        cpu, wall = time.process_time(), time.perf_counter()
+        prober = threading.Thread(target=probe)
+        prober.start()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(attempt, range(options['requests'])))
+        done.set()
+        prober.join()
+
+        return {
+            'statuses': dict(statuses),
+            'wall_seconds': round(time.perf_counter() - wall, 3),
+            'cpu_seconds': round(time.process_time() - cpu, 3),
+            'burst_p50_ms': percentile(burst_ms, 0.5),
+            'burst_p99_ms': percentile(burst_ms, 0.99),
+            'probe_p50_ms': percentile(probe_ms, 0.5),
+            'probe_p99_ms': percentile(probe_ms, 0.99),
+        }
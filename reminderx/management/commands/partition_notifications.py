@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reminderx.partitions import TABLE, is_partitioned, ensure_partitions, month_start, add_months
+
+LEGACY = f"{TABLE}_legacy"
+
+
+class Command(BaseCommand):
+    help = 'Convert the Notification table to monthly partitions / create upcoming partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='One-off: rebuild the table as a partitioned table')
+        parser.add_argument('--ahead', type=int, default=3, help='Months of partitions to keep created ahead')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Notification partitioning needs PostgreSQL.')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            partitioned = is_partitioned(cursor)
+            if options['convert']:
+                if partitioned:
+                    raise CommandError(f'{TABLE} is already partitioned.')
+                self.convert(cursor, options['ahead'])
+                return
+            if not partitioned:
+                raise CommandError(f'{TABLE} is not partitioned yet; run with --convert first.')
+
+            created = ensure_partitions(cursor, month_start(timezone.now()), options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created."))
+
+    def convert(self, cursor, ahead):
+        qn = connection.ops.quote_name
+        table, legacy = qn(TABLE), qn(LEGACY)
+        seq = qn(f"{TABLE}_id_seq")
+
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min(created_at), max(id), count(*) FROM {table}")
+        oldest, max_id, rows = cursor.fetchone()
+
+        # Index names are schema-wide: move the old ones aside, recreate them on the new parent
+        cursor.execute(
+            "SELECT c.relname, pg_get_indexdef(x.indexrelid), x.indisunique "
+            "FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid WHERE x.indrelid = %s::regclass",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        for name, _, _ in indexes:
+            cursor.execute(f"ALTER INDEX {qn(name)} RENAME TO {qn(name[:59] + '_old')}")
+
+        # Free the id sequence name (identity or serial, depending on when the table was made)
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE IF EXISTS {seq}")
+
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {seq} OWNED BY {table}.id")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+        cursor.execute(f"SELECT setval('{seq}', %s, false)", [(max_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY (id, created_at)")
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_user_id_fk')} "
+            f"FOREIGN KEY (user_id) REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+
+        first = month_start(oldest or timezone.now())
+        created = ensure_partitions(cursor, first, ahead)
+
+        # Definitions were read before the rename, so they already target the new parent.
+        # Non-unique ones (FK, Meta.indexes incl. the partial unsent index) cascade to partitions.
+        for name, definition, unique in indexes:
+            if not unique:
+                cursor.execute(definition)
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{TABLE} partitioned by month: {rows} rows moved into {len(created)} partitions "
+            f"({first:%Y-%m} to {add_months(month_start(timezone.now()), ahead):%Y-%m})."
+        ))
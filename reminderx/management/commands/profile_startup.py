@@ -0,0 +1,156 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules whose import cost we track; each is measured in its own fresh process
+TARGET_MODULES = [
+    'reminderx.views',
+    'reminderx.serializers',
+    'reminderx.management.commands.generate_notifications',
+    'reminderx.management.commands.send_notifications',
+]
+
+# Runs in a fresh interpreter under `-X importtime`; prints one JSON line
+PHASES_SCRIPT = r'''
+import json, resource, sys, time
+t0 = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+t1 = time.perf_counter()
+django.setup()
+t2 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+get_resolver()._populate()
+t3 = time.perf_counter()
+print(json.dumps({
+    "settings_ms": (t1 - t0) * 1000,
+    "apps_populate_ms": (t2 - t1) * 1000,
+    "url_resolver_ms": (t3 - t2) * 1000,
+    "total_ms": (t3 - t0) * 1000,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+MODULE_SCRIPT = r'''
+import importlib, json, resource, sys, time
+import django
+django.setup()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = (time.perf_counter() - t0) * 1000
+print(json.dumps({
+    "import_ms": elapsed,
+    "rss_delta_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before,
+}))
+'''
+
+
+def run_python(script, *args, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', script, *args]
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=os.environ.copy())
+    if proc.returncode != 0:
+        raise CommandError(f"Profiling subprocess failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr, top):
+    """Top `top` modules by cumulative import time from `-X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append({
+                'module': name.strip(),
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    modules.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    return modules[:top]
+
+
+def median_of(samples):
+    return {key: round(statistics.median(s[key] for s in samples), 3) for key in samples[0]}
+
+
+class Command(BaseCommand):
+    help = 'Profile worker/command startup (imports, apps.populate, URL resolver) and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement (median is kept)')
+        parser.add_argument('--top', type=int, default=25, help='Slowest imports to include in the report')
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'startup_baseline.json'))
+        parser.add_argument('--write-baseline', action='store_true', help='Save this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown vs baseline')
+        parser.add_argument('--slack-ms', type=float, default=20, help='Absolute slowdown always tolerated')
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+
+        phase_samples, importtime_stderr = [], ''
+        for _ in range(runs):
+            sample, importtime_stderr = run_python(PHASES_SCRIPT, importtime=True)
+            phase_samples.append(sample)
+
+        report = {
+            'python': sys.version.split()[0],
+            'settings': os.environ.get('DJANGO_SETTINGS_MODULE'),
+            'phases': median_of(phase_samples),
+            'modules': {
+                module: median_of([run_python(MODULE_SCRIPT, module)[0] for _ in range(runs)])
+                for module in TARGET_MODULES
+            },
+            'slowest_imports': parse_importtime(importtime_stderr, options['top']),
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output)
+        else:
+            self.stdout.write(output)
+
+        baseline_path = Path(options['baseline'])
+        if options['write_baseline']:
+            baseline_path.write_text(output)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}; run with --write-baseline"))
+            return
+
+        regressions = self.compare(json.loads(baseline_path.read_text()), report, options['tolerance'], options['slack_ms'])
+        if regressions:
+            raise CommandError("Startup regressions vs baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Startup within baseline tolerance."))
+
+    def compare(self, baseline, current, tolerance, slack_ms):
+        checks = [(f"phases.{key}", baseline['phases'].get(key), value)
+                  for key, value in current['phases'].items() if key.endswith('_ms')]
+        for module, values in current['modules'].items():
+            old = baseline.get('modules', {}).get(module, {})
+            checks.append((f"{module}.import_ms", old.get('import_ms'), values['import_ms']))
+
+        regressions = []
+        for name, old, new in checks:
+            if old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > slack_ms:
+                regressions.append(f"  {name}: {old:.1f} ms -> {new:.1f} ms")
+        return regressions
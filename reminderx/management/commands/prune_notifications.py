@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reminderx.partitions import TABLE, is_partitioned, existing_partitions, retention_horizon
+
+
+class Command(BaseCommand):
+    help = 'Drop (optionally archiving first) Notification partitions older than the retention horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, help='Months to keep (default NOTIFICATION_RETENTION_MONTHS)')
+        parser.add_argument('--archive-dir', help='Export each partition to <dir>/<partition>.ndjson.gz before dropping it')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Notification partitioning needs PostgreSQL.')
+        horizon = retention_horizon(options['months'])
+
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor):
+                raise CommandError(f'{TABLE} is not partitioned; run partition_notifications --convert first.')
+            expired = sorted((month, name) for month, name in existing_partitions(cursor).items() if month < horizon)
+
+        if options['archive_dir']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+
+        qn = connection.ops.quote_name
+        for month, name in expired:
+            if options['dry_run']:
+                self.stdout.write(f"Would drop {name}")
+                continue
+
+            rows = None
+            if options['archive_dir']:
+                rows = self.archive(name, os.path.join(options['archive_dir'], f"{name}.ndjson.gz"))
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            self.stdout.write(f"Dropped {name}" + (f" ({rows} rows archived)" if rows is not None else ""))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(expired)} partitions older than {horizon:%Y-%m} {'found' if options['dry_run'] else 'pruned'}."
+        ))
+
+    def archive(self, name, path):
+        """Stream the partition into gzipped NDJSON; written to a temp file and renamed when complete."""
+        rows = 0
+        with transaction.atomic(), connection.chunked_cursor() as cursor, gzip.open(path + '.tmp', 'wt') as out:
+            cursor.execute(f"SELECT * FROM {connection.ops.quote_name(name)} ORDER BY id")
+            columns = [col[0] for col in cursor.description]
+            while batch := cursor.fetchmany(2000):
+                for row in batch:
+                    out.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+                rows += len(batch)
+        os.replace(path + '.tmp', path)
+        return rows
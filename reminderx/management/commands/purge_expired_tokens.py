@@ -0,0 +1,71 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from django_rest_passwordreset.models import ResetPasswordToken
+
+from reminderx.models import EmailVerification, OTP_LIFETIME
+
+
+def estimated_rows(model):
+    """The planner's row estimate; an exact COUNT(*) would scan the table every run."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 until the table has been vacuumed or analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+class Command(BaseCommand):
+    help = 'Delete expired email OTPs and password reset tokens in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.05, help='Pause between batches (seconds)')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        reset_expiry = timedelta(hours=getattr(settings, 'DJANGO_REST_MULTITOKENAUTH_RESET_TOKEN_EXPIRY_TIME', 24))
+
+        metrics = {
+            'email_verification': self.purge(
+                EmailVerification.objects.filter(created_at__lt=now - OTP_LIFETIME), options
+            ),
+            'password_reset_token': self.purge(
+                ResetPasswordToken.objects.filter(created_at__lt=now - reset_expiry), options
+            ),
+        }
+        self.stdout.write(json.dumps(metrics))
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(m['deleted'] for m in metrics.values())} expired rows deleted."
+        ))
+
+    def purge(self, expired, options):
+        """
+        Delete `expired` a batch of primary keys at a time, each batch its own
+        short transaction, so row locks are held for milliseconds.
+        """
+        started = time.monotonic()
+        deleted = batches = 0
+        while True:
+            ids = list(expired.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            count, _ = expired.model.objects.filter(pk__in=ids).delete()
+            deleted += count
+            batches += 1
+            if len(ids) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+        return {
+            'deleted': deleted,
+            'batches': batches,
+            'seconds': round(time.monotonic() - started, 3),
+            'table_rows_estimate': estimated_rows(expired.model),
+        }
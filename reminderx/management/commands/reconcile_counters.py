@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from reminderx.models import Particular, Profile, Reminder
+
+
+def count_of(queryset, field):
+    """Correlated COUNT(*) subquery over `queryset` grouped by `field`."""
+    return Coalesce(
+        Subquery(queryset.values(field).annotate(c=Count('pk')).values('c')[:1]),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in Profile.particular_count and Particular.reminder_count (nightly cron; migrate runs it once when the columns are added)'
+
+    def handle(self, *args, **kwargs):
+        actual_particulars = count_of(Particular.objects.filter(user_id=OuterRef('user_id')), 'user_id')
+        drifted_profiles = Profile.objects.annotate(actual=actual_particulars).exclude(particular_count=F('actual'))
+        profiles_fixed = Profile.objects.filter(pk__in=drifted_profiles.values('pk')).update(
+            particular_count=actual_particulars
+        )
+
+        actual_reminders = count_of(Reminder.objects.filter(particular_id=OuterRef('pk')), 'particular_id')
+        drifted_particulars = Particular.objects.annotate(actual=actual_reminders).exclude(reminder_count=F('actual'))
+        particulars_fixed = Particular.objects.filter(pk__in=drifted_particulars.values('pk')).update(
+            reminder_count=actual_reminders
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{profiles_fixed} profile and {particulars_fixed} particular counters reconciled."
+        ))
@@ -0,0 +1,291 @@
+import json
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from reminderx import providers
+from reminderx.authentication import ProfileRefreshToken
+from reminderx.serializers import CustomTokenObtainPairSerializer
+from reminderx.views import (
+    BulkParticularCreateView, NotificationListView, ParticularListCreateView,
+    ParticularSearchView, ParticularSummaryView, ReminderListCreateView,
+)
+
+from .seed_load import SEED_PASSWORD
+
+
+class FakeMailgun:
+    """Stands in for the Mailgun requests.Session."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def post(self, url, data=None, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(status_code=200, ok=True, raise_for_status=lambda: None)
+
+
+class FakeTwilio:
+    def __init__(self, latency):
+        self.messages = self
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(sid='SMfake')
+
+
+class FakeMessaging:
+    """Stands in for firebase_admin.messaging."""
+    Message = Notification = SimpleNamespace
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send(self, message):
+        time.sleep(self.latency)
+        return 'projects/fake/messages/1'
+
+
+def job_items(output, *counters):
+    """Sum `counters` from the run line a notification job printed."""
+    for line in output.splitlines():
+        if line.startswith('{'):
+            record = json.loads(line)
+            if record.get('event') == 'run':
+                return sum(record['counters'].get(name, 0) for name in counters)
+    return 0
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the notification jobs, list/search endpoints, login and bulk create '
+            'against seeded data (see seed_load) and compare against a JSON baseline')
+
+    BENCHMARKS = (
+        'generate_notifications', 'send_notifications',
+        'particular_list', 'particular_search', 'particular_search_fulltext', 'particular_summary',
+        'reminder_list', 'notification_list', 'login', 'bulk_create',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to act as (default: the busiest seeded premium account)')
+        parser.add_argument('--password', default=SEED_PASSWORD)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--job-repeat', type=int, default=3, help='Repeats for the notification jobs')
+        parser.add_argument('--only', default='', help=f"Comma-separated subset of: {', '.join(self.BENCHMARKS)}")
+        parser.add_argument('--provider-latency-ms', type=float, default=0, help='Delay of each fake provider call')
+        parser.add_argument('--http-providers', action='store_true',
+                            help='Send through the configured provider endpoints (e.g. fake_providers) '
+                                 'instead of in-process fakes')
+        parser.add_argument('--bulk-size', type=int, default=100, help='Documents per bulk create request')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmark_baseline.json'))
+        parser.add_argument('--write-baseline', action='store_true', help='Save this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown vs baseline')
+
+    def handle(self, *args, **options):
+        self.user = self.benchmark_user(options['user'])
+        self.options = options
+        self.factory = APIRequestFactory()
+        self.auth = f"Bearer {ProfileRefreshToken.for_user(self.user).access_token}"
+
+        if not options['http_providers']:
+            latency = options['provider_latency_ms'] / 1000
+            providers.override('mailgun', FakeMailgun(latency))
+            providers.override('twilio', FakeTwilio(latency))
+            providers.override('firebase', FakeMessaging(latency))
+
+        selected = [name.strip() for name in options['only'].split(',') if name.strip()] or self.BENCHMARKS
+        unknown = set(selected) - set(self.BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+        report = {'user': self.user.username, 'repeat': options['repeat'], 'results': {}}
+        try:
+            for name in selected:
+                report['results'][name] = getattr(self, f"bench_{name}")()
+                self.stdout.write(f"{name}: {json.dumps(report['results'][name])}")
+        finally:
+            providers.reset()
+
+        output = json.dumps(report, indent=2)
+        baseline_path = Path(options['baseline'])
+        if options['write_baseline']:
+            baseline_path.write_text(output)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}; run with --write-baseline"))
+            return
+
+        regressions = self.compare(json.loads(baseline_path.read_text())['results'], report['results'])
+        if regressions:
+            raise CommandError("Benchmark regressions vs baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Benchmarks within baseline tolerance."))
+
+    def benchmark_user(self, username):
+        users = User.objects.select_related('profile__subscription_plan')
+        if username:
+            user = users.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User '{username}' does not exist")
+            return user
+        # Small seeds may have no premium account; any seeded one will do then
+        seeded = users.filter(username__startswith='load').order_by('-profile__particular_count')
+        user = seeded.filter(profile__subscription_plan__name='premium').first() or seeded.first()
+        if user is None:
+            raise CommandError("No seeded accounts; run seed_load first or pass --user")
+        return user
+
+    def measure(self, operation, repeat, setup=None):
+        """
+        Run `operation` `repeat` times, each inside a transaction that is rolled
+        back so every iteration sees the same data. `operation` returns the
+        number of items it processed (rows, notifications...).
+        """
+        timings, queries, items = [], [], 0
+        for _ in range(repeat):
+            counted = []
+
+            def count_query(execute, sql, params, many, context):
+                counted.append(1)
+                return execute(sql, params, many, context)
+
+            with transaction.atomic():
+                if setup:
+                    setup()
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(count_query))
+                    start = time.perf_counter()
+                    items += operation()
+                    timings.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+            queries.append(len(counted))
+
+        timings_ms = sorted(t * 1000 for t in timings)
+        return {
+            'p50_ms': round(statistics.median(timings_ms), 3),
+            'p99_ms': round(timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.99))], 3),
+            'ops_per_sec': round(len(timings) / sum(timings), 2),
+            'items_per_sec': round(items / sum(timings), 2),
+            'queries_per_op': statistics.mean(queries),
+        }
+
+    def compare(self, baseline, current):
+        tolerance = self.options['tolerance']
+        regressions = []
+        for name, result in current.items():
+            old = baseline.get(name)
+            if not old:
+                continue
+            if result['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p50 {old['p50_ms']}ms -> {result['p50_ms']}ms")
+            if result['queries_per_op'] > old['queries_per_op']:
+                regressions.append(f"{name}: queries {old['queries_per_op']} -> {result['queries_per_op']}")
+        return regressions
+
+    # --- benchmarks ---
+
+    def run_job(self, command):
+        out = StringIO()
+        call_command(command, stdout=out)
+        return out.getvalue()
+
+    def bench_generate_notifications(self):
+        return self.measure(
+            lambda: job_items(self.run_job('generate_notifications'), 'created.scheduled', 'created.recurring'),
+            self.options['job_repeat'],
+        )
+
+    def bench_send_notifications(self):
+        # Deliver what a generate run produces, with the fake providers installed
+        return self.measure(
+            lambda: job_items(self.run_job('send_notifications'), 'candidates'),
+            self.options['job_repeat'],
+            setup=lambda: self.run_job('generate_notifications'),
+        )
+
+    def api(self, view, path, params=None, method='get', data=None):
+        view = view.as_view(throttle_classes=[])  # measuring the view, not the rate limiter
+
+        def call():
+            if method == 'get':
+                request = self.factory.get(path, params or {}, HTTP_AUTHORIZATION=self.auth)
+            else:
+                request = self.factory.post(path, data, format='json', HTTP_AUTHORIZATION=self.auth)
+            response = view(request)
+            response.render()
+            if response.status_code >= 400:
+                raise CommandError(f"{path} returned {response.status_code}: {response.content[:200]}")
+            body = response.data
+            if isinstance(body, dict):
+                body = body.get('results', body.get('particulars', [body]))
+            return len(body)
+        return call
+
+    def bench_particular_list(self):
+        return self.measure(self.api(ParticularListCreateView, '/api/particulars/'), self.options['repeat'])
+
+    def bench_particular_search(self):
+        return self.measure(
+            self.api(ParticularSearchView, '/api/particulars/search/', {'q': 'licen'}), self.options['repeat']
+        )
+
+    def bench_particular_search_fulltext(self):
+        return self.measure(
+            self.api(ParticularSearchView, '/api/particulars/search/', {'q': 'insurance', 'mode': 'fulltext'}),
+            self.options['repeat'],
+        )
+
+    def bench_particular_summary(self):
+        return self.measure(self.api(ParticularSummaryView, '/api/particulars/summary/'), self.options['repeat'])
+
+    def bench_reminder_list(self):
+        return self.measure(self.api(ReminderListCreateView, '/api/reminders/'), self.options['repeat'])
+
+    def bench_notification_list(self):
+        return self.measure(self.api(NotificationListView, '/api/notifications/'), self.options['repeat'])
+
+    def bench_login(self):
+        def login():
+            serializer = CustomTokenObtainPairSerializer(
+                data={'username': self.user.username, 'password': self.options['password']}
+            )
+            if not serializer.is_valid():
+                raise CommandError(f"Login failed for {self.user.username}: {serializer.errors}")
+            return 1
+        return self.measure(login, self.options['repeat'])
+
+    def bench_bulk_create(self):
+        expiry = timezone.localdate() + timedelta(days=90)
+        documents = [
+            {
+                'title': f"Benchmark document {i}",
+                'category': 'other',
+                'expiry_date': expiry.isoformat(),
+                'notes': 'bulk create benchmark',
+                'reminders': [{
+                    'scheduled_date': (timezone.now() + timedelta(days=80)).isoformat(),
+                    'reminder_methods': ['push'],
+                    'recurrence': 'none',
+                    'start_days_before': 3,
+                }],
+            }
+            for i in range(self.options['bulk_size'])
+        ]
+        return self.measure(
+            self.api(BulkParticularCreateView, '/api/bulk-create/', method='post', data={'documents': documents}),
+            self.options['repeat'],
+        )
@@ -0,0 +1,190 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from reminderx.models import Organization, Particular, Profile, Reminder, SubscriptionPlan
+
+SEED_PASSWORD = 'loadtest-password'
+
+PLAN_MIX = [('free', 40), ('premium', 30), ('enterprise', 10), ('multiusers', 20)]
+RECURRENCE_MIX = [('none', 60), ('daily', 25), ('every_2_days', 15)]
+METHOD_SETS = [['push'], ['email'], ['email', 'push'], ['sms'], ['email', 'sms', 'push'], ['whatsapp', 'push']]
+CATEGORIES = [choice for choice, _ in Particular.CATEGORY_CHOICES]
+WORDS = ('licence renewal insurance passport visa permit inspection policy certificate '
+         'membership lease contract warranty registration subscription exam vaccine').split()
+FREE_PLAN_LIMIT = 5
+
+
+def pick(rng, mix):
+    return rng.choices([value for value, _ in mix], weights=[weight for _, weight in mix])[0]
+
+
+def around(rng, mean):
+    """A count that averages `mean` (uniform 0..2*mean)."""
+    return rng.randint(0, max(0, round(2 * mean)))
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, organizations, particulars and reminders for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--particulars', type=int, default=10000, help='Approximate total particulars')
+        parser.add_argument('--reminders', type=int, default=30000, help='Approximate total reminders')
+        parser.add_argument('--org-size', type=int, default=20, help='Members per organization (multiusers plan)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users generated per transaction')
+        parser.add_argument('--prefix', default='load', help='Username prefix of the seeded accounts')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true', help='Delete accounts with --prefix before seeding')
+
+    def handle(self, *args, **options):
+        plans = {plan.name: plan for plan in SubscriptionPlan.objects.all()}
+        missing = {name for name, _ in PLAN_MIX} - set(plans)
+        if missing:
+            raise CommandError(f"Subscription plans missing ({', '.join(sorted(missing))}); run migrate first")
+
+        prefix = options['prefix']
+        if options['clear']:
+            Organization.objects.filter(admin__user__username__startswith=prefix).delete()
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            self.stdout.write(f"Removed {deleted} rows from a previous seed.")
+        elif User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Accounts prefixed '{prefix}' already exist; pass --clear or another --prefix")
+
+        self.rng = random.Random(options['seed'])
+        self.plans = plans
+        self.password = make_password(SEED_PASSWORD)  # hashed once, shared by every seeded account
+        self.today = timezone.localdate()
+        self.org_ids = set(Organization.objects.values_list('organizational_id', flat=True))
+        self.per_user = options['particulars'] / max(1, options['users'])
+        self.per_particular = options['reminders'] / max(1, options['particulars'])
+        self.totals = {'users': 0, 'organizations': 0, 'particulars': 0, 'reminders': 0, 'owners': 0}
+
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        for start in range(0, options['users'], batch_size):
+            end = min(start + batch_size, options['users'])
+            with transaction.atomic():
+                self.seed_batch(prefix, range(start, end), options['org_size'])
+            self.stdout.write(
+                f"{end}/{options['users']} users, {self.totals['particulars']} particulars, "
+                f"{self.totals['reminders']} reminders"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {', '.join(f'{v} {k}' for k, v in self.totals.items())} "
+            f"in {time.monotonic() - started:.1f}s (password: {SEED_PASSWORD})"
+        ))
+
+    def seed_batch(self, prefix, numbers, org_size):
+        rng = self.rng
+        users = User.objects.bulk_create([
+            User(username=f"{prefix}{n:07d}", email=f"{prefix}{n}@example.test", password=self.password,
+                 first_name=rng.choice(WORDS).title())
+            for n in numbers
+        ])
+
+        # bulk_create skips the post_save signals, so profiles (and their counters) are built here
+        profiles = []
+        for user in users:
+            plan = self.plans[pick(rng, PLAN_MIX)]
+            free = plan.name == 'free'
+            particulars = around(rng, self.per_user)
+            profiles.append(Profile(
+                user=user,
+                subscription_plan=plan,
+                phone_number=f"+1555{rng.randint(0, 9999999):07d}" if rng.random() < 0.7 else None,
+                email_notifications=not free,
+                sms_notifications=not free and rng.random() < 0.4,
+                whatsapp_notifications=not free and rng.random() < 0.2,
+                push_notifications=True,
+                fcm_web_token=f"fake-web-{user.pk}" if rng.random() < 0.5 else None,
+                fcm_android_token=f"fake-android-{user.pk}" if rng.random() < 0.4 else None,
+                particular_count=min(particulars, FREE_PLAN_LIMIT) if free else particulars,
+            ))
+        profiles = Profile.objects.bulk_create(profiles)
+        self.totals['users'] += len(users)
+
+        admin_of = self.seed_organizations([p for p in profiles if p.subscription_plan.name == 'multiusers'], org_size)
+        self.seed_particulars(users, profiles, admin_of)
+
+    def seed_organizations(self, members, org_size):
+        """Group multiusers profiles into organizations; returns {profile id: admin profile id}."""
+        admin_of = {}
+        for i in range(0, len(members), org_size):
+            group = members[i:i + org_size]
+            admin = group[0]
+            organization = Organization.objects.create(
+                organizational_id=self.new_organizational_id(),
+                name=f"{admin.user.username}'s Organization",
+                admin=admin,
+            )
+            Profile.objects.filter(pk=admin.pk).update(organization=organization, role='admin')
+            Profile.objects.filter(pk__in=[p.pk for p in group[1:]]).update(organization=organization, role='staff')
+            for profile in group:
+                admin_of[profile.pk] = admin.pk
+            self.totals['organizations'] += 1
+        return admin_of
+
+    def new_organizational_id(self):
+        while True:
+            candidate = f"{self.rng.randint(0, 999999):06d}"
+            if candidate not in self.org_ids:
+                self.org_ids.add(candidate)
+                return candidate
+
+    def seed_particulars(self, users, profiles, admin_of):
+        rng, today = self.rng, self.today
+        particulars, reminder_counts = [], []
+        for user, profile in zip(users, profiles):
+            for n in range(profile.particular_count):
+                category = rng.choice(CATEGORIES)
+                count = around(rng, self.per_particular)
+                reminder_counts.append(count)
+                particulars.append(Particular(
+                    user=user,
+                    title=f"{rng.choice(WORDS).title()} {category} {n + 1}",
+                    category=category,
+                    expiry_date=today + timedelta(days=rng.randint(-60, 365)),
+                    notes=' '.join(rng.choices(WORDS, k=rng.randint(0, 12))),
+                    reminder_count=count,
+                ))
+        particulars = Particular.objects.bulk_create(particulars, batch_size=2000)
+        self.totals['particulars'] += len(particulars)
+
+        # What add_admin_as_owner does for organization members
+        Owner = Particular.owners.through
+        profile_of = {profile.user_id: profile.pk for profile in profiles}
+        owners = Owner.objects.bulk_create([
+            Owner(particular_id=p.id, profile_id=admin_of[profile_of[p.user_id]])
+            for p in particulars if profile_of[p.user_id] in admin_of
+        ], batch_size=2000)
+        self.totals['owners'] += len(owners)
+
+        now = timezone.now()
+        reminders = []
+        for particular, count in zip(particulars, reminder_counts):
+            for _ in range(count):
+                recurrence = pick(rng, RECURRENCE_MIX)
+                days_before = rng.choice((1, 3, 7, 14, 30))
+                scheduled = timezone.make_aware(
+                    datetime.combine(particular.expiry_date - timedelta(days=days_before), datetime.min.time())
+                ) + timedelta(hours=rng.randint(6, 20))
+                sent = recurrence == 'none' and scheduled < now and rng.random() < 0.9
+                reminders.append(Reminder(
+                    particular=particular,
+                    scheduled_date=scheduled,
+                    sent=sent,
+                    sent_at=scheduled if sent else None,
+                    reminder_methods=rng.choice(METHOD_SETS),
+                    recurrence=recurrence,
+                    start_days_before=days_before,
+                ))
+        Reminder.objects.bulk_create(reminders, batch_size=5000)
+        self.totals['reminders'] += len(reminders)
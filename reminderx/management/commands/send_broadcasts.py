@@ -0,0 +1,120 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from reminderx.guards import ProviderUnavailable, guard
+from reminderx.models import MessageBroadcast, OutboundMessage
+from reminderx.ratelimit import TokenBucket
+from reminderx import providers
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = timedelta(seconds=30)  # doubles with each failed attempt
+STALE_CLAIM = timedelta(minutes=10)
+LOCK_KEY = 'send-broadcasts:lock'
+LOCK_MARGIN = 120  # seconds past --max-seconds for the batch in flight to finish
+PARKED = object()  # the provider's guard refused the call; not an attempt
+
+
+class Command(BaseCommand):
+    help = "Deliver queued broadcast messages concurrently, rate-limited"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--rate', type=float, default=10, help='Messages per second')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--max-seconds', type=int, default=540, help='Stop claiming new work after this long')
+
+    def handle(self, *args, **options):
+        # One sender at a time, so overlapping cron runs don't double the send rate.
+        # In the shared cache rather than a Postgres advisory lock, which a
+        # transaction-pooling PgBouncer would not keep on one session; it expires
+        # on its own if a run dies.
+        if not cache.add(LOCK_KEY, os.getpid(), options['max_seconds'] + LOCK_MARGIN):
+            self.stdout.write("Another send_broadcasts run is in progress; exiting.")
+            return
+        try:
+            self.run(options)
+        finally:
+            cache.delete(LOCK_KEY)
+
+    def run(self, options):
+        started = time.monotonic()
+        bucket = TokenBucket(options['rate'])
+        totals = {'sent': 0, 'failed': 0, 'retry': 0, 'parked': 0}
+
+        # Items claimed by a worker that died mid-run go back to the queue
+        OutboundMessage.objects.filter(
+            status='sending', claimed_at__lt=timezone.now() - STALE_CLAIM
+        ).update(status='queued')
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            while time.monotonic() - started < options['max_seconds']:
+                if guard('twilio').is_open():
+                    break  # Twilio is parked; leave the rest queued for the next run
+                batch = self.claim(options['batch_size'])
+                if not batch:
+                    break
+
+                def deliver(item):
+                    bucket.acquire()
+                    return self.send(item)
+
+                for item, error in zip(batch, pool.map(deliver, batch)):
+                    if error is PARKED:
+                        item.status = 'queued'
+                        totals['parked'] += 1
+                        continue
+                    item.attempts += 1
+                    if error is None:
+                        item.status, item.sent_at, item.error = 'sent', timezone.now(), ''
+                        totals['sent'] += 1
+                    elif item.attempts < MAX_ATTEMPTS:
+                        item.status, item.error = 'queued', error
+                        item.next_attempt_at = timezone.now() + RETRY_BACKOFF * 2 ** (item.attempts - 1)
+                        totals['retry'] += 1
+                    else:
+                        item.status, item.error = 'failed', error
+                        totals['failed'] += 1
+                OutboundMessage.objects.bulk_update(batch, ['status', 'sent_at', 'error', 'attempts', 'next_attempt_at'])
+
+        self.mark_completed()
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['sent']} sent, {totals['failed']} failed, {totals['retry']} queued for retry, "
+            f"{totals['parked']} left queued while Twilio was parked."
+        ))
+
+    def claim(self, size):
+        with transaction.atomic():
+            batch = list(
+                OutboundMessage.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('broadcast')
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()), status='queued')
+                .order_by('id')[:size]
+            )
+            OutboundMessage.objects.filter(pk__in=[item.pk for item in batch]).update(
+                status='sending', claimed_at=timezone.now()
+            )
+        return batch
+
+    def send(self, item):
+        """Returns None on success, PARKED if the provider was not called, else the error message."""
+        try:
+            providers.send_sms(item.to, item.broadcast.message, whatsapp=item.broadcast.channel == 'whatsapp')
+            return None
+        except ProviderUnavailable:
+            return PARKED
+        except Exception as e:
+            return str(e)[:500]
+
+    def mark_completed(self):
+        pending = OutboundMessage.objects.filter(broadcast=OuterRef('pk'), status__in=['queued', 'sending'])
+        MessageBroadcast.objects.filter(completed_at__isnull=True).exclude(Exists(pending)).update(
+            completed_at=timezone.now()
+        )
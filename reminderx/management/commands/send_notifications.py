@@ -1,114 +1,151 @@
-import os
-import firebase_admin
-from firebase_admin import messaging, credentials
-from twilio.rest import Client
-from django.core.mail import send_mail
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
-from reminderx.models import Notification, Profile
-import json
-import requests
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from reminderx import guards
+from reminderx.jobmetrics import JobMetrics
+from reminderx.models import Notification
+from reminderx.partitions import send_window_start
+from reminderx import providers
 
+# A claim older than this belongs to a run that died; its notifications are retried
+CLAIM_LEASE = timedelta(minutes=30)
 
-# Firebase init
-FIREBASE_CREDENTIALS_JSON = os.getenv("FIREBASE_CREDENTIALS_JSON")
 
-if FIREBASE_CREDENTIALS_JSON:
-    cred_dict = json.loads(FIREBASE_CREDENTIALS_JSON)
-    #cred_path = os.path.join(os.path.dirname(__file__), "C:\Users\D.F.O COMPUTERS\Documents\Project 2025\ReminderX\naikas-4b46c-firebase-adminsdk-fbsvc-70437c4696.json")
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
+class Command(BaseCommand):
+    help = "Send unsent notifications"
 
-# Twilio init
-TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
-TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Notifications claimed per round')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Notifications delivered in parallel (each provider also caps its own)')
+        parser.add_argument('--pushgateway', default='',
+                            help='Pushgateway base URL to push the run metrics to')
 
-MAILGUN_API = os.environ.get("MAILGUN_API")
+    def handle(self, *args, **options):
+        run = JobMetrics('send_notifications')
+        window_start = send_window_start()
+        batch_size = options['batch_size']
+        candidates, failed = 0, []
 
-class Command(BaseCommand):
-    help = "Send unsent notifications"
+        # Each round claims a batch before sending anything, so an overlapping run
+        # skips it, and marks every notification sent as soon as it is delivered.
+        # A crash re-sends at most the deliveries in flight, once their claim expires.
+        # A parked provider fails its calls instantly while the others keep sending.
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            while True:
+                with run.stage('claim'):
+                    batch = self.claim(window_start, batch_size)
+                if not batch:
+                    break
+                candidates += len(batch)
+                futures = {pool.submit(self.deliver, run, n): n for n in batch}
+                for future in as_completed(futures):
+                    n = futures[future]
+                    if future.result():
+                        # created_at bound keeps the update inside the send-window partitions
+                        with run.stage('mark_sent'):
+                            Notification.objects.filter(pk=n.pk, created_at__gte=window_start).update(
+                                is_sent=True, sent_at=timezone.now()
+                            )
+                    else:
+                        run.count('skipped.no_channel_succeeded')
+                        failed.append(n.pk)
+                if len(batch) < batch_size:
+                    break
+        run.count('candidates', candidates)
+        if failed:
+            # Back in the queue for the next run (not this one, or a down provider would loop it)
+            with run.stage('release'):
+                Notification.objects.filter(pk__in=failed, created_at__gte=window_start).update(claimed_at=None)
+
+        with run.stage('queue'):
+            unsent = Notification.objects.filter(is_sent=False, created_at__gte=window_start)
+            run.gauge('queue_depth', unsent.count())
+            oldest = unsent.order_by('created_at').values_list('created_at', flat=True).first()
+            run.gauge('oldest_unsent_age_seconds',
+                      round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0)
+            # Fell out of the send window unsent in the last day: these are never delivered
+            run.gauge('expired_unsent_last_day', Notification.objects.filter(
+                is_sent=False, created_at__gte=window_start - timedelta(days=1), created_at__lt=window_start
+            ).count())
+        for provider, state in guards.states().items():
+            run.gauge(f'{provider}_circuit_open', int(state['circuit'] != 'closed'))
+            run.gauge(f'{provider}_concurrency_limit', state['concurrency_limit'])
+            run.gauge(f'{provider}_rate', state['rate'])
+
+        run.emit(self.stdout)
+        if options['pushgateway']:
+            try:
+                run.push(options['pushgateway'])
+            except Exception as e:
+                self.stderr.write(f"Pushgateway push failed: {e}")
+
+        sent = run.counters['delivered']
+        self.stdout.write(self.style.SUCCESS(
+            f"{sent}/{candidates} notifications sent, {run.gauges['queue_depth']} still queued."
+        ))
+
+    def claim(self, window_start, batch_size):
+        """Take up to `batch_size` unsent, unclaimed notifications for this run."""
+        now = timezone.now()
+        # Bounded by created_at so the scan stays in the recent partitions;
+        # anything older than the send window is not worth delivering any more
+        unclaimed = Notification.objects.filter(
+            Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_LEASE),
+            is_sent=False, created_at__gte=window_start,
+        )
+        with transaction.atomic():
+            # Rows another run is claiming right now are skipped, not waited for
+            pks = list(unclaimed.order_by('id').select_for_update(skip_locked=True)
+                       .values_list('pk', flat=True)[:batch_size])
+            Notification.objects.filter(pk__in=pks, created_at__gte=window_start).update(claimed_at=now)
+        # Profiles come with the batch, so the workers only talk to providers
+        return list(Notification.objects.filter(pk__in=pks, created_at__gte=window_start)
+                    .select_related('user__profile').order_by('id'))
+
+    def deliver(self, run, n):
+        """Send `n` on every requested channel; True if at least one succeeded."""
+        user = n.user
+        profile = getattr(user, 'profile', None)
+        phone = profile.phone_number if profile else None
+        any_success = False
+
+        # Email
+        if n.send_email:
+            if user.email:
+                any_success |= run.call('email', lambda: providers.send_email(
+                    user.email, f"Reminder: {n.particular_title}", n.message))
+            else:
+                run.count('skipped.no_email')
+
+        # SMS
+        if n.send_sms:
+            if phone:
+                any_success |= run.call('sms', lambda: providers.send_sms(phone, n.message))
+            else:
+                run.count('skipped.no_phone')
+
+        # WhatsApp
+        if n.send_whatsapp:
+            if phone:
+                any_success |= run.call('whatsapp', lambda: providers.send_sms(phone, n.message, whatsapp=True))
+            else:
+                run.count('skipped.no_phone')
+
+        # Push Notification
+        if n.send_push:
+            tokens = [t for t in (profile.fcm_web_token, profile.fcm_android_token, profile.fcm_ios_token) if t] \
+                if profile else []
+            for token in tokens:
+                any_success |= run.call('push', lambda token=token: providers.send_push(token, "Naikas", n.message))
+            if not tokens:
+                run.count('skipped.no_push_token')
 
-    def handle(self, *args, **kwargs):
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-
-        notifications = Notification.objects.filter(is_sent=False)
-
-        for n in notifications:
-            profile = Profile.objects.get(user=n.user)
-            any_success = False
-
-            # Email
-            if n.send_email and n.user.email:
-                try:
-                    requests.post(
-                        "https://api.mailgun.net/v3/naikas.com/messages",
-                        auth=("api", MAILGUN_API),
-                        data={"from": "Naikas <postmaster@naikas.com>",
-                            "to": [n.user.email],
-                            "subject": f"Reminder: {n.particular_title}",
-                            "text": n.message}
-                    )
-                    self.stdout.write(f"✅ Email sent to {n.user.email}")
-                    any_success = True
-                except Exception as e:
-                    self.stdout.write(f"❌ Email failed: {e}")
-
-            # SMS
-            if n.send_sms and profile.phone_number:
-                try:
-                    client.messages.create(
-                        body=n.message,
-                        from_=TWILIO_PHONE_NUMBER,
-                        to=profile.phone_number
-                    )
-                    self.stdout.write(f"✅ SMS sent to {profile.phone_number}")
-                    any_success = True
-                except Exception as e:
-                    self.stdout.write(f"❌ SMS failed: {e}")
-
-            # WhatsApp
-            if n.send_whatsapp and profile.phone_number:
-                try:
-                    client.messages.create(
-                        body=n.message,
-                        from_='whatsapp:' + TWILIO_PHONE_NUMBER,
-                        to='whatsapp:' + profile.phone_number
-                    )
-                    self.stdout.write(f"✅ WhatsApp sent to {profile.phone_number}")
-                    any_success = True
-                except Exception as e:
-                    self.stdout.write(f"❌ WhatsApp failed: {e}")
-
-            # Push Notification
-            if n.send_push:
-                tokens = [
-                    profile.fcm_web_token,
-                    profile.fcm_android_token,
-                    profile.fcm_ios_token,
-                ]
-                sent_any = False
-                for token in tokens:
-                    if token:
-                        try:
-                            messaging.send(messaging.Message(
-                                token=token,
-                                notification=messaging.Notification(
-                                    title="Naikas",
-                                    body=n.message,
-                                )
-                            ))
-                            self.stdout.write(f"✅ Push notification sent to {n.user.username} (token: {token[:10]}...)")
-                            sent_any = True
-                            any_success = True
-                        except Exception as e:
-                            self.stdout.write(f"❌ Push failed for token {token[:10]}...: {e}")
-                if not sent_any:
-                    self.stdout.write(f"❌ No FCM tokens found for {n.user.username}")
-
-            # Mark as sent if any channel succeeded
-            if any_success:
-                n.is_sent = True
-                n.save()
+        if any_success:
+            run.count('delivered')
+        return any_success
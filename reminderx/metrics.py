@@ -0,0 +1,138 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms live in the worker's memory; `/metrics` renders
+them, so Prometheus should scrape every gunicorn worker (or run a single
+worker per container). `MetricsMiddleware` (middleware.py) records the
+per-request series; `provider_call()` times outbound HTTP calls and adds
+them to the current request's external time.
+"""
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_registry = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label key -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            series = self.series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', str(bound))])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter('reminderx_requests_total', 'HTTP requests', ['view', 'method', 'status'])
+REQUEST_SECONDS = Histogram('reminderx_request_seconds', 'Wall time per request', ['view', 'method'])
+REQUEST_QUERIES = Histogram('reminderx_request_queries', 'DB queries per request', ['view'], COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram('reminderx_request_db_seconds', 'DB time per request', ['view'])
+REQUEST_EXTERNAL_SECONDS = Histogram('reminderx_request_external_seconds', 'Outbound HTTP time per request', ['view'])
+RESPONSE_BYTES = Histogram('reminderx_response_bytes', 'Response body size', ['view'], SIZE_BUCKETS)
+PROVIDER_SECONDS = Histogram('reminderx_provider_seconds', 'Outbound provider call latency', ['provider', 'outcome'])
+
+# Stats for the request being handled, set by MetricsMiddleware
+current_request = ContextVar('current_request', default=None)
+
+
+@contextmanager
+def provider_call(provider):
+    """Time an outbound call to `provider` (mailgun, twilio, fcm, paystack)."""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - start
+        PROVIDER_SECONDS.observe(elapsed, provider=provider, outcome=outcome)
+        stats = current_request.get()
+        if stats is not None:
+            stats['external_seconds'] += elapsed
+            stats['external_calls'].append((provider, round(elapsed * 1000, 1), outcome))
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>`.
+    Without a token it is only open with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,15 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
 from django.utils.timezone import now
 from .models import SubscriptionPlan
+from . import metrics
+
+slow_log = logging.getLogger('reminderx.slow_requests')
 
 class SubscriptionMiddleware:
     def __init__(self, get_response):
@@ -20,3 +30,69 @@ class SubscriptionMiddleware:
                         pass
 
         return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Per-view wall time, DB query count/time, outbound provider time and
+    response size, exported on /metrics (see metrics.py). Requests slower
+    than SLOW_REQUEST_MS are logged with their SQL.
+    """
+    MAX_LOGGED_QUERIES = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = getattr(settings, 'SLOW_REQUEST_MS', None)
+        stats = {'queries': 0, 'db_seconds': 0.0, 'external_seconds': 0.0, 'external_calls': [], 'sql': []}
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats['queries'] += 1
+                stats['db_seconds'] += elapsed
+                if slow_ms is not None and len(stats['sql']) < self.MAX_LOGGED_QUERIES:
+                    stats['sql'].append((round(elapsed * 1000, 2), sql))
+
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        elapsed = time.perf_counter() - start
+
+        # The URL pattern, not the path, so ids don't explode the label set
+        match = getattr(request, 'resolver_match', None)
+        view = match.route if match else 'unmatched'
+        size = len(response.content) if not response.streaming else 0
+
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+        metrics.REQUEST_QUERIES.observe(stats['queries'], view=view)
+        metrics.REQUEST_DB_SECONDS.observe(stats['db_seconds'], view=view)
+        metrics.REQUEST_EXTERNAL_SECONDS.observe(stats['external_seconds'], view=view)
+        metrics.RESPONSE_BYTES.observe(size, view=view)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            slow_log.warning(json.dumps({
+                'view': view,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 1),
+                'queries': stats['queries'],
+                'db_ms': round(stats['db_seconds'] * 1000, 1),
+                'external': stats['external_calls'],
+                'sql': stats['sql'],
+            }))
+
+        return response
+
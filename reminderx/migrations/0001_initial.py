@@ -0,0 +1,230 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:49
+
+import django.contrib.auth.models
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.functions.text
+import reminderx.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organizational_id', models.CharField(max_length=6, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('icon', models.ImageField(blank=True, null=True, upload_to=reminderx.models.organization_icon_path)),
+                ('icon_thumbnails', models.JSONField(blank=True, default=dict)),
+                ('data_version', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SubscriptionPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('free', 'Free'), ('premium', 'Premium'), ('enterprise', 'Enterprise'), ('multiusers', 'Multiusers')], max_length=20, unique=True)),
+                ('max_particulars', models.IntegerField()),
+                ('max_reminders_per_particular', models.IntegerField()),
+                ('allows_multi_user', models.BooleanField(default=False)),
+                ('allow_recurring', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('auth.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmailVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('otp', models.CharField(max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['email', 'created_at'], name='emailverif_email_created')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MessageBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('sms', 'SMS'), ('whatsapp', 'WhatsApp')], max_length=10)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to='reminderx.organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('email_notifications', models.BooleanField(default=True)),
+                ('sms_notifications', models.BooleanField(default=False)),
+                ('push_notifications', models.BooleanField(default=True)),
+                ('whatsapp_notifications', models.BooleanField(default=False)),
+                ('reminder_time', models.IntegerField(default=3)),
+                ('profile_picture', models.ImageField(blank=True, null=True, upload_to=reminderx.models.user_directory_path)),
+                ('profile_picture_thumbnails', models.JSONField(blank=True, default=dict)),
+                ('particular_count', models.IntegerField(default=0)),
+                ('particulars_version', models.IntegerField(default=0)),
+                ('fcm_web_token', models.CharField(blank=True, max_length=255, null=True)),
+                ('fcm_android_token', models.CharField(blank=True, max_length=255, null=True)),
+                ('fcm_ios_token', models.CharField(blank=True, max_length=255, null=True)),
+                ('subscription_expiry', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('role', models.CharField(choices=[('admin', 'Admin'), ('staff', 'Staff'), ('unverified', 'Unverified'), ('manager', 'Manager')], default='admin', max_length=20)),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='reminderx.organization')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+                ('subscription_plan', models.ForeignKey(default=reminderx.models.get_free_plan, null=True, on_delete=django.db.models.deletion.SET_NULL, to='reminderx.subscriptionplan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Particular',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('document', models.FileField(blank=True, null=True, upload_to=reminderx.models.user_directory_path)),
+                ('document_sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('category', models.CharField(choices=[('vehicle', 'Vehicle'), ('travels', 'Travels'), ('personal', 'Personal'), ('work', 'Work'), ('professional', 'Professional'), ('household', 'Household'), ('finance', 'Finance'), ('health', 'Health'), ('social', 'Social'), ('education', 'Education'), ('other', 'Other')], default='other', max_length=50)),
+                ('expiry_date', models.DateField()),
+                ('notes', models.TextField(blank=True)),
+                ('completed', models.BooleanField(default=False)),
+                ('reminder_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='particulars', to=settings.AUTH_USER_MODEL)),
+                ('owners', models.ManyToManyField(blank=True, related_name='owned_particulars', to='reminderx.profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to', models.CharField(blank=True, max_length=32)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='reminderx.messagebroadcast')),
+                ('profile', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reminderx.profile')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='admin',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='managed_organization', to='reminderx.profile'),
+        ),
+        migrations.AddField(
+            model_name='messagebroadcast',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcasts', to='reminderx.profile'),
+        ),
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_date', models.DateTimeField()),
+                ('sent', models.BooleanField(default=False)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('reminder_methods', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('push', 'Push Notification'), ('whatsapp', 'WhatsApp')], max_length=10), default=list, size=None)),
+                ('reminder_message', models.TextField(blank=True, null=True)),
+                ('recurrence', models.CharField(choices=[('none', 'None'), ('daily', 'Daily'), ('every_2_days', 'Every 2 Days')], default='none', max_length=20)),
+                ('start_days_before', models.IntegerField(default=3)),
+                ('particular', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='reminderx.particular')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BlobUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staging_name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('blob_name', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blob_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'sha256'], name='blobupload_user_sha256')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('particular_title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('send_email', models.BooleanField(default=False)),
+                ('send_sms', models.BooleanField(default=False)),
+                ('send_push', models.BooleanField(default=False)),
+                ('send_whatsapp', models.BooleanField(default=False)),
+                ('is_sent', models.BooleanField(default=False)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at'], name='notification_user_recent'), models.Index(condition=models.Q(('is_sent', False)), fields=['created_at'], name='notification_unsent')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='particular',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='particular_title_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='particular',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', 'notes', 'category', config='english'), name='particular_search_vector'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='particular',
+            unique_together={('user', 'title')},
+        ),
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(fields=['status', 'id'], name='outbound_status_id'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 import os
-from django.db import models
+from django.db import models, DEFAULT_DB_ALIAS
+from django.db.models.functions import Upper
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from rest_framework.exceptions import AuthenticationFailed
 from django.utils import timezone
 from datetime import timedelta
 import random
@@ -56,9 +61,14 @@ class Organization(models.Model):
         related_name='managed_organization'
     )
     icon = models.ImageField(upload_to=organization_icon_path, null=True, blank=True)
+    icon_thumbnails = models.JSONField(default=dict, blank=True)  # filled by generate_thumbnails
+    data_version = models.IntegerField(default=0)  # bumped on member/particular writes, keys the overview cache
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # (file field, thumbnail map field) holding references to stored blobs
+    BLOB_FIELDS = [('icon', 'icon_thumbnails')]
+
     def __str__(self):
         return f"{self.name} ({self.organizational_id})"
 
@@ -72,6 +82,9 @@ class Profile(models.Model):
     reminder_time = models.IntegerField(default=3)
     subscription_plan = models.ForeignKey(SubscriptionPlan, on_delete=models.SET_NULL, null=True, default=get_free_plan)
     profile_picture = models.ImageField(upload_to=user_directory_path, null=True, blank=True)
+    profile_picture_thumbnails = models.JSONField(default=dict, blank=True)  # filled by generate_thumbnails
+    particular_count = models.IntegerField(default=0)  # maintained by signals, see reconcile_counters
+    particulars_version = models.IntegerField(default=0)  # bumped by caching.particulars_changed
     fcm_web_token = models.CharField(max_length=255, blank=True, null=True)
     fcm_android_token = models.CharField(max_length=255, blank=True, null=True)
     fcm_ios_token = models.CharField(max_length=255, blank=True, null=True)
@@ -93,6 +106,8 @@ class Profile(models.Model):
         default="admin"
     )
 
+    BLOB_FIELDS = [('profile_picture', 'profile_picture_thumbnails')]
+
     def save(self, *args, **kwargs):
         # 🔒 Restrict free plan to push notifications only
         if self.subscription_plan and self.subscription_plan.name == "free":
@@ -105,9 +120,57 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"Profile for {self.user.username}"
-    
 
 
+class TokenUser(User):
+    """
+    The authenticated user as rebuilt from access-token claims by
+    ProfileJWTAuthentication (authentication.py). Only `id` is loaded: the
+    first access to any other User field loads all of them in one query, and
+    the profile is fetched on demand, so requests that only need ids never
+    query auth_user or the profile.
+
+    If the account or its profile has been deleted since the token was
+    issued, those lookups raise AuthenticationFailed (a 401) instead of
+    DoesNotExist.
+    """
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, claims):
+        user = cls.from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
+        user._claims = claims
+        return user
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        deferred = self.get_deferred_fields()
+        if fields and deferred.issuperset(fields):
+            fields = deferred  # one query for every deferred column, not one per attribute
+        try:
+            super().refresh_from_db(using=using, fields=fields, **kwargs)
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User no longer exists", code="user_not_found")
+
+    @cached_property
+    def profile_id(self):
+        return self._claims.get('profile_id') or self.profile.id
+
+    @cached_property
+    def profile(self):
+        profiles = Profile.objects.select_related('user', 'subscription_plan', 'organization')
+        try:
+            if self._claims.get('profile_id'):
+                return profiles.get(pk=self._claims['profile_id'])
+            return profiles.get(user_id=self.id)
+        except Profile.DoesNotExist:
+            # e.g. a staff member removed by their admin while holding a valid token
+            raise AuthenticationFailed("Profile no longer exists", code="user_not_found")
+
+
+# Full-text search expression; queries must use this exact expression to hit the index
+PARTICULAR_SEARCH_VECTOR = SearchVector('title', 'notes', 'category', config='english')
+
 
 class Particular(models.Model):
     CATEGORY_CHOICES = [
@@ -127,16 +190,27 @@ class Particular(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='particulars')
     title = models.CharField(max_length=255)
     document = models.FileField(upload_to=user_directory_path, null=True, blank=True)
+    document_sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # set from the upload stream
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
     expiry_date = models.DateField(null=False)
     notes = models.TextField(blank=True)
     completed = models.BooleanField(default=False)
     #for multi-user plans
     owners = models.ManyToManyField("Profile", related_name="owned_particulars", blank=True)
+    reminder_count = models.IntegerField(default=0)  # maintained by signals, see reconcile_counters
     created_at = models.DateTimeField(auto_now_add=True)
 
+    BLOB_FIELDS = [('document', None)]
+
     class Meta:
         unique_together = ('user', 'title')  # Ensures no duplicate title for same user
+        indexes = [
+            # pg_trgm makes title__icontains / __istartswith indexable (extension created in
+            # signals.py). Django compiles those to UPPER("title"::text) LIKE UPPER(%s), so
+            # the index is on that expression; one on the bare column would never be used.
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='particular_title_trgm'),
+            GinIndex(PARTICULAR_SEARCH_VECTOR, name='particular_search_vector'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.expiry_date}"
@@ -185,21 +259,125 @@ class Notification(models.Model):
 
     is_sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Set by send_notifications before delivering, so no other run sends it too
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # On Postgres the table is range-partitioned by created_at month (reminderx/partitions.py);
+        # hot queries bound created_at so only recent partitions are scanned
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_recent'),
+            models.Index(fields=['created_at'], name='notification_unsent', condition=models.Q(is_sent=False)),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username} - {self.particular_title}"
     
 
+class MessageBroadcast(models.Model):
+    """An admin's SMS/WhatsApp message to many staff; one OutboundMessage per recipient."""
+    CHANNEL_CHOICES = [
+        ('sms', 'SMS'),
+        ('whatsapp', 'WhatsApp'),
+    ]
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='broadcasts')
+    created_by = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, related_name='broadcasts')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Broadcast {self.id} ({self.channel}) for {self.organization}"
+
+
+class OutboundMessage(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+
+    broadcast = models.ForeignKey(MessageBroadcast, on_delete=models.CASCADE, related_name='items')
+    profile = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, related_name='+')
+    to = models.CharField(max_length=32, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)  # retry backoff, see send_broadcasts
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'], name='outbound_status_id')]
+
+    def __str__(self):
+        return f"{self.to} - {self.status}"
+
+
+class StoredBlob(models.Model):
+    """A content-addressed file in storage and how many fields point at it."""
+    name = models.CharField(max_length=255, unique=True)  # blobs/<aa>/<bb>/<sha256>.<ext>
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # last write/reference; collect_blobs leaves fresh rows alone
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class BlobUpload(models.Model):
+    """
+    A direct upload from /api/uploads/presign/. The client PUTs to a private
+    staging key; the server hashes the bytes and only then moves them to their
+    content address (blobs.promote_upload). Also records which blobs a user
+    uploaded, the only ones they may attach by key.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blob_uploads')
+    staging_name = models.CharField(max_length=255, unique=True)  # uploads/<user id>/<uuid>.<ext>
+    sha256 = models.CharField(max_length=64)  # claimed by the client, checked on promotion
+    size = models.BigIntegerField(default=0)
+    blob_name = models.CharField(max_length=255, blank=True)  # set once verified and promoted
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'sha256'], name='blobupload_user_sha256')]
+
+    def __str__(self):
+        return f"{self.staging_name} -> {self.blob_name or '(pending)'}"
+
+
+OTP_LIFETIME = timedelta(minutes=10)
+
+
 class EmailVerification(models.Model):
     email = models.EmailField()
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Registration looks up the latest live OTP per email; purge_expired_tokens clears the rest
+        indexes = [models.Index(fields=['email', 'created_at'], name='emailverif_email_created')]
+
     def is_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=10)
+        return timezone.now() > self.created_at + OTP_LIFETIME
     
 
 
+def visible_particulars(user_id):
+    """
+    Particulars a user created or co-owns. Ownership is matched with an
+    IN (subquery) instead of an OR'd join, so no DISTINCT is needed.
+    """
+    owned = Particular.owners.through.objects.filter(profile__user_id=user_id).values('particular_id')
+    return Particular.objects.filter(models.Q(user_id=user_id) | models.Q(id__in=owned))
+
+
 def get_allowed_methods(profile: Profile):
     return [
         method for method, enabled in {
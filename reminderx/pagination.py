@@ -0,0 +1,25 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptionalPageNumberPagination(PageNumberPagination):
+    """
+    Paginates only when the client asks for it (?page= or ?page_size=), so
+    clients that expect a plain list keep working.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class IdCursorPagination(CursorPagination):
+    """Stable keyset pagination for large admin listings."""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,62 @@
+"""
+Streaming parsers for bulk imports. Both return a lazy iterator of document
+dicts so large uploads are never held in memory at once.
+"""
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _lines(stream, parser_context):
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    return codecs.iterdecode(stream, encoding)
+
+
+class NDJSONParser(BaseParser):
+    """One JSON document per line, same shape as an entry of `documents`."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        def documents():
+            for number, line in enumerate(_lines(stream, parser_context), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    raise ParseError(f"Line {number}: invalid JSON - {exc}")
+        return documents()
+
+
+class CSVParser(BaseParser):
+    """
+    Columns: title, category, expiry_date, notes and optionally one reminder
+    per row via scheduled_date, reminder_methods (separated by |),
+    recurrence and start_days_before.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        def documents():
+            for row in csv.DictReader(_lines(stream, parser_context)):
+                doc = {
+                    key: row[key]
+                    for key in ('title', 'category', 'expiry_date', 'notes')
+                    if row.get(key)
+                }
+                doc['reminders'] = []
+                if row.get('scheduled_date'):
+                    reminder = {
+                        'scheduled_date': row['scheduled_date'],
+                        'reminder_methods': [m for m in (row.get('reminder_methods') or '').split('|') if m],
+                    }
+                    for key in ('recurrence', 'start_days_before'):
+                        if row.get(key):
+                            reminder[key] = row[key]
+                    doc['reminders'].append(reminder)
+                yield doc
+        return documents()
@@ -0,0 +1,130 @@
+"""
+Monthly range partitioning of the Notification table (Postgres only).
+
+`manage.py partition_notifications --convert` turns the plain table into one
+partitioned by `created_at` month and `manage.py partition_notifications`
+(cron) keeps partitions created ahead of time; a DEFAULT partition takes any
+row no month covers, so inserts never fail. `prune_notifications` detaches
+and drops, or archives, the months past NOTIFICATION_RETENTION_MONTHS.
+
+Postgres requires the partition key in the primary key, so the table's key is
+(id, created_at); ids still come from one sequence and stay unique, which is
+all Django relies on.
+"""
+import datetime
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Notification
+
+TABLE = Notification._meta.db_table
+PARTITION_RE = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def send_window_start():
+    """Oldest notification `send_notifications` still tries to deliver."""
+    return timezone.now() - timedelta(days=getattr(settings, 'NOTIFICATION_SEND_WINDOW_DAYS', 7))
+
+
+def history_window_start():
+    """Oldest notification shown in a user's history."""
+    return timezone.now() - timedelta(days=getattr(settings, 'NOTIFICATION_HISTORY_DAYS', 90))
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def retention_horizon(months=None):
+    """First month that is kept; every partition before it may be pruned."""
+    if months is None:
+        months = getattr(settings, 'NOTIFICATION_RETENTION_MONTHS', 12)
+    return add_months(month_start(timezone.now()), -months)
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [TABLE],
+    )
+    return cursor.fetchone() is not None
+
+
+def existing_partitions(cursor):
+    """{month: partition table name} for the Notification partitions."""
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+        [TABLE],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions[datetime.date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_default_partition(cursor):
+    """Catches rows no monthly partition covers (e.g. if the cron job stopped), so inserts never fail."""
+    qn = connection.ops.quote_name
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT")
+
+
+def create_partition(cursor, month):
+    qn = connection.ops.quote_name
+    table, default = qn(TABLE), qn(DEFAULT_PARTITION)
+    bounds = [f"{month.isoformat()} 00:00:00+00", f"{add_months(month, 1).isoformat()} 00:00:00+00"]
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s)", bounds)
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} PARTITION OF {table} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+        return
+    # Postgres refuses a partition whose rows sit in the default one: detach it,
+    # create the month, move its rows over and put the default back
+    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+        f"INSERT INTO {table} SELECT * FROM moved",
+        bounds,
+    )
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+
+
+def ensure_partitions(cursor, first_month, months_ahead):
+    """Create every missing partition from `first_month` to `months_ahead` past this month."""
+    create_default_partition(cursor)
+    last = add_months(month_start(timezone.now()), months_ahead)
+    existing = existing_partitions(cursor)
+    created = []
+    month = first_month
+    while month <= last:
+        if month not in existing:
+            create_partition(cursor, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
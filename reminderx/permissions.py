@@ -3,27 +3,29 @@ from .models import Particular, Reminder
 from rest_framework.exceptions import PermissionDenied
 
 
-class CanCreateParticular(permissions.BasePermission):
-    def has_permission(self, request, view):
-        if request.method not in permissions.SAFE_METHODS:  # Only POST, PUT, etc.
-            user = request.user
-            profile = user.profile
-            max_allowed = profile.subscription_plan.max_particulars
+def check_particular_limit(profile, incoming=1):
+    """
+    Raise PermissionDenied if `incoming` more particulars would exceed the
+    plan limit. Reads the maintained Profile.particular_count, no COUNT query.
+    """
+    max_allowed = profile.subscription_plan.max_particulars if profile.subscription_plan else None
 
-            # No plan assigned
-            if max_allowed is None:
-                return True  # Unlimited
+    # No plan assigned / sentinel -1 both mean unlimited
+    if max_allowed is None or max_allowed == -1:
+        return
 
-            # Sentinel -1 also means unlimited
-            if max_allowed == -1:
-                return True
+    if profile.particular_count + incoming > max_allowed:
+        raise PermissionDenied(
+            f"You have reached your plan's limit of {max_allowed} reminders."
+        )
 
-            current_count = user.particulars.count()
-            if current_count >= max_allowed:
-                raise PermissionDenied(
-                    f"You have reached your plan's limit of {max_allowed} reminders."
-                )
-            return True
+
+class CanCreateParticular(permissions.BasePermission):
+    def has_permission(self, request, view):
+        # Only creating can change the count; edits go through untouched.
+        # perform_create re-checks under a row lock to stay race-safe.
+        if request.method == 'POST':
+            check_particular_limit(request.user.profile)
         return True  # Allow safe methods like GET
 
 """
@@ -42,24 +44,26 @@ class CanCreateParticular(permissions.BasePermission):
 
 class CanCreateReminder(permissions.BasePermission):
     def has_permission(self, request, view):
+        # Only check on POST; reads never need the profile
+        if request.method != 'POST':
+            return True
+
         user = request.user
         profile = user.profile
         data = request.data
 
-        # Only check on POST
-        if request.method != 'POST':
-            return True
-
         particular_id = data.get("particular")
         if not particular_id:
             return False
 
-        try:
-            particular = Particular.objects.get(id=particular_id, user=user)
-        except Particular.DoesNotExist:
+        existing_reminders = (
+            Particular.objects.filter(id=particular_id, user=user)
+            .values_list('reminder_count', flat=True)
+            .first()
+        )
+        if existing_reminders is None:
             return False
 
-        existing_reminders = particular.reminders.count()
         max_reminders = profile.subscription_plan.max_reminders_per_particular
 
         # Disallow if exceeding reminder limit
@@ -0,0 +1,192 @@
+"""
+Per-process registry of third-party clients (Twilio, Firebase, Mailgun, Pillow).
+
+Nothing is imported or constructed until first use, so gunicorn workers,
+`manage.py migrate` and the cron commands that never send a message don't
+pay for the SDK imports. Each client is built once per process and reused.
+
+Endpoints come from settings (MAILGUN_BASE_URL, TWILIO_BASE_URL, FCM_BASE_URL,
+PAYSTACK_BASE_URL) so every provider can be pointed at the local fake server
+(`manage.py fake_providers`). Sends go through the provider's shared
+guard (guards.py): rate limit, adaptive concurrency and circuit breaker.
+"""
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+from django.conf import settings
+
+from .guards import guard
+from .metrics import provider_call
+
+TWILIO_API_URL = "https://api.twilio.com"
+MAILGUN_FROM = "Naikas <postmaster@naikas.com>"
+
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def provider(name):
+    """Register a zero-argument factory for `name`."""
+    def register(factory):
+        _factories[name] = factory
+        return factory
+    return register
+
+
+def get(name):
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def override(name, instance):
+    """Swap in a client (fakes for benchmarks/tests)."""
+    with _lock:
+        _instances[name] = instance
+
+
+def reset():
+    with _lock:
+        _instances.clear()
+
+
+_twilio_response = threading.local()
+
+
+def twilio_response_headers():
+    """Headers of the last Twilio response received on this thread (read once)."""
+    response = getattr(_twilio_response, "value", None)
+    _twilio_response.value = None
+    return getattr(response, "headers", None)
+
+
+@provider("twilio")
+def _twilio():
+    from twilio.http.http_client import TwilioHttpClient
+    from twilio.rest import Client
+
+    base_url = settings.TWILIO_BASE_URL.rstrip("/")
+
+    class HttpClient(TwilioHttpClient):
+        def request(self, method, url, *args, **kwargs):
+            if base_url:
+                url = url.replace(TWILIO_API_URL, base_url, 1)
+            response = super().request(method, url, *args, **kwargs)
+            # the client is shared by threads, so keep this thread's response for the guard
+            _twilio_response.value = response
+            return response
+
+    return Client(
+        os.environ.get("TWILIO_ACCOUNT_SID"),
+        os.environ.get("TWILIO_AUTH_TOKEN"),
+        http_client=HttpClient(timeout=settings.PROVIDER_TIMEOUT),
+    )
+
+
+class FCMOverHTTP:
+    """
+    The part of firebase_admin.messaging that send_push uses, posting FCM v1
+    JSON to FCM_BASE_URL. Used instead of the SDK when that is set.
+    """
+    Message = Notification = SimpleNamespace
+
+    def __init__(self, base_url):
+        import requests
+        self.url = f"{base_url.rstrip('/')}/v1/projects/{os.environ.get('FCM_PROJECT_ID', 'naikas')}/messages:send"
+        self.session = requests.Session()
+
+    def send(self, message):
+        response = self.session.post(
+            self.url,
+            json={"message": {"token": message.token, "notification": vars(message.notification)}},
+            timeout=settings.PROVIDER_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json().get("name")
+
+
+@provider("firebase")
+def _firebase():
+    if settings.FCM_BASE_URL:
+        return FCMOverHTTP(settings.FCM_BASE_URL)
+
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+
+    credentials_json = os.getenv("FIREBASE_CREDENTIALS_JSON")
+    if credentials_json and not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(json.loads(credentials_json)))
+    return messaging
+
+
+@provider("mailgun")
+def _mailgun():
+    import requests
+    session = requests.Session()  # keeps the TLS connection to Mailgun alive between sends
+    session.auth = ("api", os.environ.get("MAILGUN_API"))
+    return session
+
+
+@provider("pillow")
+def _pillow():
+    import PIL.Image
+    import PIL.ImageOps
+    return PIL
+
+
+def twilio_phone_number():
+    return os.environ.get("TWILIO_PHONE_NUMBER")
+
+
+def send_email(to, subject, text):
+    recipients = to if isinstance(to, (list, tuple)) else [to]
+    session = get("mailgun")
+
+    def post():
+        with provider_call("mailgun"):
+            response = session.post(
+                f"{settings.MAILGUN_BASE_URL.rstrip('/')}/v3/{settings.MAILGUN_DOMAIN}/messages",
+                data={"from": MAILGUN_FROM, "to": recipients, "subject": subject, "text": text},
+                timeout=settings.PROVIDER_TIMEOUT,
+            )
+            response.raise_for_status()  # a rejected or throttled send is a failure, not a delivery
+            return response
+
+    return guard("mailgun").call(post)
+
+
+def send_sms(to, body, whatsapp=False):
+    prefix = "whatsapp:" if whatsapp else ""
+    client = get("twilio")
+
+    def create():
+        with provider_call("twilio"):
+            return client.messages.create(
+                body=body,
+                from_=prefix + twilio_phone_number(),
+                to=prefix + to,
+            )
+
+    return guard("twilio").call(create, response_headers=twilio_response_headers)
+
+
+def send_push(token, title, body):
+    messaging = get("firebase")
+    message = messaging.Message(
+        token=token,
+        notification=messaging.Notification(title=title, body=body),
+    )
+
+    def send():
+        with provider_call("fcm"):
+            return messaging.send(message)
+
+    return guard("fcm").call(send)
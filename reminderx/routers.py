@@ -0,0 +1,102 @@
+"""
+Read-replica routing.
+
+Reads go to one of `settings.REPLICA_DATABASES` only while the replica flag
+is set: by `ReplicaRoutingMiddleware` for GET/HEAD/OPTIONS API requests, or
+explicitly with `read_from_replica()` (e.g. the notification generator's
+candidate scans). Everything else, writes, and any query inside a
+transaction (including SELECT ... FOR UPDATE) stays on `default`.
+
+After a user's write, their reads stay on the primary for
+`REPLICA_STICKY_SECONDS` so they always see what they just saved.
+"""
+import random
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_replica = ContextVar('use_replica', default=False)
+
+STICKY_KEY = "replica-sticky:{}"
+
+
+def replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+class read_from_replica(ContextDecorator):
+    """Route reads in this block to a replica (no-op when none are configured)."""
+
+    def __enter__(self):
+        self._token = _use_replica.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _use_replica.reset(self._token)
+        return False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # The database cache backend's table must be read where it is written
+        if not _use_replica.get() or not replicas() or model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its writes and take its locks
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def request_identity(request):
+    """User id from the bearer token (JWT auth runs later, in the view), else the client IP."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        from rest_framework_simplejwt.exceptions import TokenError
+        try:
+            return f"user:{AccessToken(header[len('Bearer '):])[api_settings.USER_ID_CLAIM]}"
+        except (TokenError, KeyError):
+            pass
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class ReplicaRoutingMiddleware:
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+
+        identity = request_identity(request)
+        sticky_key = STICKY_KEY.format(identity)
+
+        if (request.method in self.SAFE_METHODS and request.path.startswith('/api/')
+                and not cache.get(sticky_key)):
+            with read_from_replica():
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            cache.set(sticky_key, 1, sticky_seconds())
+        return response
@@ -1,13 +1,21 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Particular, Reminder, Profile, Notification, Organization, SubscriptionPlan
+from .models import Particular, Reminder, Profile, Notification, Organization, SubscriptionPlan, BlobUpload, visible_particulars
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.contrib.auth.models import update_last_login
+from django.db import transaction
+from django.db.models import Q, Case, When
+from .images import thumbnail_urls
+from .storage import signed_url
+from .blobs import is_blob, is_staging, promote_upload
+from .bulk import BulkImporter
+from .authentication import ProfileRefreshToken
 from django.core.signing import TimestampSigner
-import requests
-import os
+from . import providers
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -18,10 +26,11 @@ class UserSerializer(serializers.ModelSerializer):
 class OrganizationSerializer(serializers.ModelSerializer):
     admin = serializers.SerializerMethodField()
     icon_url = serializers.SerializerMethodField()
+    icon_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Organization
-        fields = ['id', 'organizational_id', 'name', 'admin', 'icon_url']
+        fields = ['id', 'organizational_id', 'name', 'admin', 'icon_url', 'icon_thumbnails']
 
     def get_admin(self, obj):
         if obj.admin:
@@ -35,52 +44,39 @@ class OrganizationSerializer(serializers.ModelSerializer):
     def get_icon_url(self, obj):
         request = self.context.get('request')
         if obj.icon and request:
-            return request.build_absolute_uri(obj.icon.url)
+            return signed_url(obj.icon.name, request=request)
         return None
 
+    def get_icon_thumbnails(self, obj):
+        return thumbnail_urls(self.context.get('request'), obj.icon_thumbnails)
+
 
 class ProfileSerializer(serializers.ModelSerializer):
     organization = OrganizationSerializer(read_only=True)
     user = UserSerializer(read_only=True)
     profile_picture = serializers.ImageField(required=False, allow_null=True)
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = [ 'user', 'phone_number', 'whatsapp_notifications', 'push_notifications', 'email_notifications', 'sms_notifications', 'reminder_time', 'subscription_plan', 'subscription_expiry', 'profile_picture', 'profile_picture_url',  'organization', 'role']
+        fields = [ 'user', 'phone_number', 'whatsapp_notifications', 'push_notifications', 'email_notifications', 'sms_notifications', 'reminder_time', 'subscription_plan', 'subscription_expiry', 'profile_picture', 'profile_picture_url', 'profile_picture_thumbnails', 'organization', 'role']
 
     def get_profile_picture_url(self, obj):
         request = self.context.get('request')
         if obj.profile_picture and request:
-            return request.build_absolute_uri(obj.profile_picture.url)
+            return signed_url(obj.profile_picture.name, request=request)
         return None
 
-    def resize_image(self, image_field):
-        image = Image.open(image_field)
-        if image.width > 3000:
-            ratio = 3000 / float(image.width)
-            height = int((float(image.height) * float(ratio)))
-            image = image.resize((3000, height), Image.Resampling.LANCZOS)
-            buffer = BytesIO()
-            image_format = image_field.name.split('.')[-1].upper()
-            if image_format == 'JPG':
-                image_format = 'JPEG'
-            image.save(buffer, format=image_format)
-            return ContentFile(buffer.getvalue(), name=image_field.name)
-        return image_field
+    def get_profile_picture_thumbnails(self, obj):
+        return thumbnail_urls(self.context.get('request'), obj.profile_picture_thumbnails)
 
     def update(self, instance, validated_data):
-        profile_picture = validated_data.get('profile_picture', None)
-        if profile_picture:
-            validated_data['profile_picture'] = self.resize_image(profile_picture)
+        # Stored as uploaded; generate_thumbnails renders the sizes in the background
+        if 'profile_picture' in validated_data:
+            validated_data['profile_picture_thumbnails'] = {}
         return super().update(instance, validated_data)
 
-    def create(self, validated_data):
-        profile_picture = validated_data.get('profile_picture', None)
-        if profile_picture:
-            validated_data['profile_picture'] = self.resize_image(profile_picture)
-        return super().create(validated_data)
-
 
 class ReminderSerializer(serializers.ModelSerializer):
     class Meta:
@@ -95,19 +91,70 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 class ParticularSerializer(serializers.ModelSerializer):
     document_url = serializers.SerializerMethodField()
+    # Key returned by /api/uploads/presign/ once the client has PUT the file
+    document_key = serializers.CharField(write_only=True, required=False)
     reminders = ReminderSerializer(many=True, read_only=True)
 
     class Meta:
         model = Particular
         fields = '__all__'
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = ['user', 'created_at', 'document_sha256']
 
     def get_document_url(self, obj):
         request = self.context.get('request')
         if obj.document and request:
-            return request.build_absolute_uri(obj.document.url)
+            return signed_url(obj.document.name, request=request)
         return None
 
+    def _own_upload(self, key):
+        return BlobUpload.objects.filter(user_id=self.context['request'].user.id).filter(
+            Q(staging_name=key) | Q(blob_name=key)
+        ).first()
+
+    def validate_document_key(self, value):
+        """
+        Accepts only the caller's own uploads (a staging key from presign, or
+        a blob they uploaded) and documents already on their particulars.
+        Staged uploads are promoted when the particular is saved.
+        """
+        user_id = self.context['request'].user.id
+        if (is_blob(value) or is_staging(value)) and '..' not in value:
+            if self._own_upload(value) is not None:
+                return value
+            if is_blob(value) and visible_particulars(user_id).filter(document=value).exists():
+                return value
+        raise serializers.ValidationError("Invalid document key.")
+
+    def _attach_document(self, validated_data):
+        """
+        Files are stored content-addressed, so identical documents attached to
+        several particulars share one blob; keep the digest for hash lookups.
+        Staged bytes are verified against their digest here, in the save's
+        transaction (see blobs.promote_upload).
+        """
+        if 'document_key' in validated_data:
+            key = validated_data.pop('document_key')
+            upload = self._own_upload(key)
+            if upload is not None:
+                try:
+                    key = promote_upload(upload)
+                except ValueError as e:
+                    raise serializers.ValidationError({'document_key': [str(e)]})
+            validated_data['document'] = key
+            validated_data['document_sha256'] = key.rsplit('/', 1)[-1].split('.', 1)[0]
+        elif 'document' in validated_data:
+            validated_data['document_sha256'] = getattr(validated_data['document'], 'sha256', '') or ''
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            self._attach_document(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self._attach_document(validated_data)
+            return super().update(instance, validated_data)
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={"input_type": "password"})
     email = serializers.EmailField(required=True)
@@ -123,7 +170,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         }
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if User.objects.filter(email__iexact=value).exists():
             raise serializers.ValidationError("Email already in use.")
         return value
 
@@ -157,35 +204,51 @@ class RegisterSerializer(serializers.ModelSerializer):
             token = signer.sign(profile.id)
             #verification_link = f"http://localhost:3000/verify-staff/{token}/"
             verification_link = f"https://naikas.com/verify-staff/{token}/"
-            # Send email to admin for verification
-            requests.post(
-                "https://api.mailgun.net/v3/naikas.com/messages",
-                auth=("api", os.environ.get('MAILGUN_API')),
-                data={"from": "Naikas <postmaster@naikas.com>",
-                    "to": [admin_email],
-                    "subject": "Staff Verification Request",
-                    "text": f"{user.username} wants to join your organization. Click to verify: {verification_link}"}
-            )
+            # Send email to admin for verification. The account already exists at this
+            # point, so a failed send is logged, not turned into a failed registration.
+            try:
+                providers.send_email(
+                    admin_email,
+                    "Staff Verification Request",
+                    f"{user.username} wants to join your organization. Click to verify: {verification_link}",
+                )
+            except Exception:
+                logger.exception("Staff verification email for profile %s failed", profile.id)
         return user
 
 
 #adding this for login with both username and email
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ProfileRefreshToken  # access tokens carry profile claims, see authentication.py
+
     def validate(self, attrs):
         login = attrs.get("username")
         password = attrs.get("password")
 
-        user = User.objects.filter(username=login).first()
+        # One query: username, or email case-insensitively (served by the unique
+        # UPPER(email) index created in signals.py). An exact username match wins.
+        user = (
+            User.objects.filter(Q(username=login) | (Q(email__iexact=login) & ~Q(email="")))
+            .order_by(Case(When(username=login, then=0), default=1))
+            .first()
+        )
+
         if user is None:
-            user = User.objects.filter(email=login).first()
+            # Hash anyway so response time doesn't reveal which logins exist
+            User().set_password(password)
+            raise serializers.ValidationError("Invalid credentials")
 
-        if user is None or not user.check_password(password):
+        # The only password hash of the request; tokens are issued directly
+        # rather than through super().validate(), which would authenticate again
+        if not user.check_password(password) or not jwt_settings.USER_AUTHENTICATION_RULE(user):
             raise serializers.ValidationError("Invalid credentials")
 
-        attrs['username'] = user.username  # Ensure correct username is passed
-        data = super().validate(attrs)
+        self.user = user
+        refresh = self.get_token(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
 
-        return data
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
     
 
 class BulkReminderSerializer(serializers.ModelSerializer):
@@ -221,16 +284,9 @@ class BulkParticularListSerializer(serializers.Serializer):
     documents = BulkParticularSerializer(many=True)
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        created = []
-        for doc_data in validated_data["documents"]:
-            reminders_data = doc_data.pop("reminders", [])
-            particular = Particular.objects.create(user=user, **doc_data)
-            Reminder.objects.bulk_create([
-                Reminder(particular=particular, **r) for r in reminders_data
-            ])
-            created.append(particular)
-        return created
+        documents = validated_data["documents"]
+        importer = BulkImporter(self.context["request"].user)
+        return importer.run(documents, total=len(documents))
 
 
 class OrganizationCreateSerializer(serializers.ModelSerializer):
@@ -1,14 +1,21 @@
-from django.db.models.signals import post_save, post_migrate
+from django.db.models.signals import post_save, pre_migrate, post_migrate, post_init, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Particular, Profile, SubscriptionPlan, Organization
-from django.db.utils import OperationalError, ProgrammingError
-from django.db import connection
+from .models import Particular, Profile, SubscriptionPlan, Organization, Reminder
+from django.db.models import F
+from django.db.models.query import QuerySet
+from .blobs import tracked_blob_names, retain_blobs, release_blobs
+from .caching import particulars_changed, organization_changed
+from django.db.utils import OperationalError, ProgrammingError, IntegrityError
+from django.db import connection, connections, transaction
+from django.db.migrations.operations import AddField
 from django_rest_passwordreset.signals import reset_password_token_created
 from django.core.mail import send_mail
 from django.conf import settings
-import os
-import requests
+from . import providers
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=User)
@@ -25,6 +32,33 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         if hasattr(instance, "profile"):
             instance.profile.save()
 
+@receiver(pre_migrate)
+def create_postgres_extensions(sender, using="default", **kwargs):
+    # Needed before the gin_trgm_ops index on Particular.title is created
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+@receiver(post_migrate)
+def create_email_login_index(sender, using="default", **kwargs):
+    # Case-insensitive unique emails; login matches UPPER(email) = UPPER(%s) AND email <> ''
+    # (Django's iexact), which this partial expression index serves.
+    if sender.label != "reminderx":
+        return
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    try:
+        with transaction.atomic(using=using), conn.cursor() as cursor:
+            cursor.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS auth_user_email_upper_uniq '
+                'ON auth_user (UPPER("email"::text)) WHERE "email" <> \'\''
+            )
+    except IntegrityError:
+        logger.warning("auth_user has emails differing only by case; unique email index not created.")
+
 @receiver(post_migrate)
 def create_subscription_plans(sender, **kwargs):
     # Check if the table exists
@@ -56,16 +90,49 @@ def create_subscription_plans(sender, **kwargs):
             pass
 
 
+@receiver(post_migrate)
+def create_cache_table(sender, using="default", verbosity=1, **kwargs):
+    # Without REDIS_URL, CACHES is the database cache; its table isn't a model,
+    # so migrate doesn't create it. No-op when it exists or for other backends.
+    if sender.label != "reminderx":
+        return
+    from django.core.management import call_command
+    call_command("createcachetable", database=using, verbosity=verbosity)
+
+
+COUNTER_FIELDS = {("profile", "particular_count"), ("particular", "reminder_count")}
+
+
+@receiver(post_migrate)
+def backfill_counters(sender, using="default", verbosity=1, plan=None, **kwargs):
+    # particular_count / reminder_count start at 0 when their columns are added to
+    # existing tables, so fill them in once, in the migrate that adds them. Later
+    # drift is repaired by the nightly reconcile_counters cron, not on every migrate.
+    if sender.label != "reminderx":
+        return
+    added = any(
+        isinstance(operation, AddField) and (operation.model_name, operation.name) in COUNTER_FIELDS
+        for migration, backwards in plan or []
+        if migration.app_label == "reminderx" and not backwards
+        for operation in migration.operations
+    )
+    if added:
+        from django.core.management import call_command
+        call_command("reconcile_counters", verbosity=verbosity)
+
+
 @receiver(reset_password_token_created)
 def password_reset_token_created(sender, instance, reset_password_token, *args, **kwargs):
-    requests.post(
-  		"https://api.mailgun.net/v3/naikas.com/messages",
-        auth=("api", os.environ.get('MAILGUN_API')),
-        data={"from": "Naikas <postmaster@naikas.com>",
-			"to": [reset_password_token.user.email],
-  			"subject": "Password Reset for Naikas",
-  			"text": f"Use this token to reset your password: {reset_password_token.key}"}
-    )
+    # The reset endpoint answers the same whether or not the account exists, so a
+    # failed send is logged rather than surfaced; the user can request another token
+    try:
+        providers.send_email(
+            reset_password_token.user.email,
+            "Password Reset for Naikas",
+            f"Use this token to reset your password: {reset_password_token.key}",
+        )
+    except Exception:
+        logger.exception("Password reset email for user %s failed", reset_password_token.user_id)
     """
     send_mail(
         subject="Password Reset for Naikas",
@@ -85,6 +152,142 @@ def add_admin_as_owner(sender, instance, created, **kwargs):
                 instance.owners.add(org.admin)
 
 
+# --- denormalized counters (Profile.particular_count, Particular.reminder_count) ---
+
+def _deleted_directly(origin, model):
+    # Skip counter updates when the parent row is being deleted in the same cascade
+    return isinstance(origin, model) or (isinstance(origin, QuerySet) and origin.model is model)
+
+
+@receiver(post_save, sender=Particular)
+def increment_particular_count(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.filter(user_id=instance.user_id).update(particular_count=F("particular_count") + 1)
+
+
+@receiver(post_delete, sender=Particular)
+def decrement_particular_count(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Particular):
+        Profile.objects.filter(user_id=instance.user_id).update(particular_count=F("particular_count") - 1)
+
+
+@receiver(post_save, sender=Reminder)
+def increment_reminder_count(sender, instance, created, **kwargs):
+    if created:
+        Particular.objects.filter(pk=instance.particular_id).update(reminder_count=F("reminder_count") + 1)
+
+
+@receiver(post_delete, sender=Reminder)
+def decrement_reminder_count(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Reminder):
+        Particular.objects.filter(pk=instance.particular_id).update(reminder_count=F("reminder_count") - 1)
+
+
+# --- cached aggregates (particular summary) ---
+
+def _affected_user_ids(particular):
+    owner_user_ids = Particular.owners.through.objects.filter(
+        particular_id=particular.pk
+    ).values_list("profile__user_id", flat=True)
+    return [particular.user_id, *owner_user_ids]
+
+
+@receiver(post_save, sender=Particular)
+@receiver(pre_delete, sender=Particular)
+def invalidate_summary_on_particular_write(sender, instance, **kwargs):
+    # pre_delete so the owner rows can still be read
+    particulars_changed(_affected_user_ids(instance))
+
+
+@receiver(m2m_changed, sender=Particular.owners.through)
+def invalidate_summary_on_owner_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Only the owners gaining/losing visibility are affected
+    if action == "pre_clear":
+        if reverse:
+            particulars_changed([instance.user_id])
+        else:
+            particulars_changed(_affected_user_ids(instance))
+    elif action in ("post_add", "post_remove"):
+        if reverse:
+            particulars_changed([instance.user_id])  # instance is the Profile
+        else:
+            particulars_changed(
+                Profile.objects.filter(pk__in=pk_set).values_list("user_id", flat=True)
+            )
+
+
+def _membership(profile):
+    return (profile.organization_id, profile.role)
+
+
+@receiver(post_init, sender=Profile)
+def remember_membership(sender, instance, **kwargs):
+    if not {"organization", "role"} & instance.get_deferred_fields():
+        instance._membership = _membership(instance)
+
+
+@receiver(post_save, sender=Profile)
+def bump_organization_on_membership_change(sender, instance, created, **kwargs):
+    # Profiles are re-saved on every login, only real membership changes count
+    old = getattr(instance, "_membership", (None, None))
+    new = _membership(instance)
+    if created or old != new:
+        organization_changed(old[0])
+        if new[0] != old[0]:
+            organization_changed(new[0])
+    instance._membership = new
+
+
+@receiver(post_delete, sender=Profile)
+def bump_organization_on_member_delete(sender, instance, **kwargs):
+    organization_changed(instance.organization_id)
+
+
+# --- content-addressed file references ---
+
+def _stored_blob_names(instance):
+    names = tracked_blob_names(instance)
+    if names is None:
+        # Some fields were deferred when the instance was loaded
+        fresh = type(instance).objects.filter(pk=instance.pk).first()
+        names = tracked_blob_names(fresh) if fresh else set()
+    return names
+
+
+def remember_blob_names(sender, instance, **kwargs):
+    if instance.pk:
+        instance._blob_names = tracked_blob_names(instance)
+
+
+def update_blob_references(sender, instance, created, **kwargs):
+    old = getattr(instance, "_blob_names", None)
+    if old is None:
+        old = set() if created else _stored_blob_names(instance)
+    new = tracked_blob_names(instance)
+    if new is None:
+        new = _stored_blob_names(instance)
+    retain_blobs(new - old)
+    release_blobs(old - new)
+    instance._blob_names = new
+
+
+def load_blob_references(sender, instance, **kwargs):
+    # The row is gone by post_delete, so resolve deferred fields now
+    if getattr(instance, "_blob_names", None) is None:
+        instance._blob_names = _stored_blob_names(instance)
+
+
+def drop_blob_references(sender, instance, **kwargs):
+    release_blobs(instance._blob_names or set())
+
+
+for model in (Particular, Profile, Organization):
+    post_init.connect(remember_blob_names, sender=model)
+    post_save.connect(update_blob_references, sender=model)
+    pre_delete.connect(load_blob_references, sender=model)
+    post_delete.connect(drop_blob_references, sender=model)
+
+
 def send_simple_message():
   	return 
 
@@ -0,0 +1,125 @@
+"""
+Media storage: the content-addressed default storage backend and short-lived
+signed URLs for documents, profile pictures and icons.
+
+File bytes are served and received by a separate static tier, not by the
+app workers. The signature follows nginx's secure_link module so nginx can
+verify links on its own:
+
+    location /media/ {
+        secure_link $arg_md5,$arg_expires;
+        secure_link_md5 "$secure_link_expires$uri$request_method <MEDIA_SIGNING_KEY>";
+        if ($secure_link = "")  { return 403; }
+        if ($secure_link = "0") { return 410; }
+        alias /projects/reminderx/media/;
+    }
+    location /media/uploads/ {    # presigned PUTs land here only, never under blobs/
+        secure_link $arg_md5,$arg_expires;
+        secure_link_md5 "$secure_link_expires$uri$request_method <MEDIA_SIGNING_KEY>";
+        if ($secure_link = "")  { return 403; }
+        if ($secure_link = "0") { return 410; }
+        dav_methods PUT;
+        client_max_body_size 20m;
+        alias /projects/reminderx/media/uploads/;
+    }
+
+With DEBUG on, `signed_media_view` stands in for that tier locally.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+
+def _signing_key():
+    return getattr(settings, "MEDIA_SIGNING_KEY", None) or settings.SECRET_KEY
+
+
+def _signature(expires, path, method):
+    # md5 because that is all nginx secure_link understands
+    raw = f"{expires}{path}{method} {_signing_key()}".encode()
+    return base64.urlsafe_b64encode(hashlib.md5(raw).digest()).decode().rstrip("=")
+
+
+def signed_url(name, method="GET", request=None, expires_in=None):
+    """Signed URL for `name` in default storage, valid for MEDIA_URL_EXPIRY seconds."""
+    if not name:
+        return None
+    expires = int(time.time()) + (expires_in or getattr(settings, "MEDIA_URL_EXPIRY", 300))
+    # nginx compares against the decoded $uri, so sign the unquoted path
+    signature = _signature(expires, settings.MEDIA_URL + name, method)
+    url = f"{settings.MEDIA_URL}{quote(name)}?md5={signature}&expires={expires}"
+
+    base = getattr(settings, "MEDIA_SIGNED_URL_BASE", "")
+    if base:
+        return base.rstrip("/") + url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def verify_signature(path, method, signature, expires):
+    """Checks a signed media request the same way the static tier does."""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(expires, path, method), signature or "")
+
+
+def blob_name(digest, ext=""):
+    name = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+    return f"{name}.{ext}" if ext else name
+
+
+def blob_extension(name):
+    """The extension a file saved as `name` keeps in its blob name."""
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    return ext if ext.isalnum() else ""
+
+
+def content_digest(content):
+    digest = getattr(content, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct file once under blobs/<aa>/<bb>/<sha256>.<ext>,
+    whatever name `upload_to` asked for (only its extension is kept).
+    Uploads that went through HashingTemporaryFileUploadHandler already carry
+    their digest, so they are not read twice. Staging keys (uploads/) are
+    stored as named; see blobs.promote_upload.
+    """
+
+    def _save(self, name, content):
+        from .blobs import is_staging
+        from .models import StoredBlob
+
+        if is_staging(name):
+            return super()._save(name, content)
+        digest = content_digest(content)
+        name = blob_name(digest, blob_extension(name))
+        # The row lock orders this against collect_blobs deleting the same file
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={"sha256": digest, "size": content.size}
+            )
+            if not created:
+                blob.save(update_fields=["updated_at"])  # fresh again: not collectable for a while
+            if not self.exists(name):
+                super()._save(name, content)
+        return name
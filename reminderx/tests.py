@@ -1,3 +1,620 @@
-from django.test import TestCase
+import json
+import tempfile
+import hashlib
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.signing import TimestampSigner
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, models
+from django.db.migrations import AddField, Migration
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers as drf_serializers
+from rest_framework.test import APIClient
+
+from reminderx import throttling
+from reminderx.authentication import ProfileRefreshToken
+from reminderx.guards import ProviderGuard, ProviderUnavailable
+from reminderx.management.commands import profile_startup
+from reminderx.blobs import promoted_name, staging_name
+from reminderx.models import BlobUpload, Organization, Particular, Profile, StoredBlob
+from reminderx.routers import ReplicaRouter, ReplicaRoutingMiddleware, read_from_replica
+from reminderx.serializers import ParticularSerializer
+from reminderx.signals import backfill_counters
 
 # Create your tests here.
+
+IMPORTTIME_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |      42000 | django.db.models
+import time:       800 |       9000 |   rest_framework.views
+not an importtime line
+import time:       bad |        row | ignored
+"""
+
+PHASES = {"settings_ms": 10.0, "apps_populate_ms": 100.0, "url_resolver_ms": 30.0, "total_ms": 140.0,
+          "rss_kb": 50000}
+MODULE = {"import_ms": 20.0, "rss_delta_kb": 1000}
+
+
+def fake_run_python(script, *args, importtime=False):
+    if script is profile_startup.PHASES_SCRIPT:
+        return dict(PHASES), IMPORTTIME_STDERR
+    return dict(MODULE), ""
+
+
+class ProfileStartupHelpersTests(SimpleTestCase):
+    def test_parse_importtime_sorts_by_cumulative_and_skips_noise(self):
+        modules = profile_startup.parse_importtime(IMPORTTIME_STDERR, top=2)
+        self.assertEqual([m["module"] for m in modules], ["django.db.models", "rest_framework.views"])
+        self.assertEqual(modules[0], {"module": "django.db.models", "self_ms": 1.5, "cumulative_ms": 42.0})
+
+    def test_median_of_samples(self):
+        samples = [{"a": 1, "b": 10}, {"a": 3, "b": 30}, {"a": 2, "b": 20}]
+        self.assertEqual(profile_startup.median_of(samples), {"a": 2, "b": 20})
+
+    def test_compare_needs_both_tolerance_and_slack_exceeded(self):
+        command = profile_startup.Command()
+        baseline = {"phases": {"total_ms": 100.0}, "modules": {"reminderx.views": {"import_ms": 10.0}}}
+        current = {"phases": {"total_ms": 130.0, "rss_kb": 1}, "modules": {"reminderx.views": {"import_ms": 40.0}}}
+
+        regressions = command.compare(baseline, current, tolerance=0.25, slack_ms=20)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("phases.total_ms", regressions[0])
+        self.assertIn("reminderx.views.import_ms", regressions[1])
+
+        # both are 30 ms over: within a 50 ms slack
+        self.assertEqual(len(command.compare(baseline, current, tolerance=0.25, slack_ms=50)), 0)
+
+
+@mock.patch.object(profile_startup, "run_python", side_effect=fake_run_python)
+class ProfileStartupCommandTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.baseline = Path(self.tmp.name) / "startup_baseline.json"
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("profile_startup", "--runs", "2", "--baseline", str(self.baseline), *args, stdout=out)
+        return out.getvalue()
+
+    def test_writes_report_and_baseline(self, run_python):
+        self.run_command("--write-baseline")
+        report = json.loads(self.baseline.read_text())
+        self.assertEqual(report["phases"]["total_ms"], 140.0)
+        self.assertEqual(set(report["modules"]), set(profile_startup.TARGET_MODULES))
+        self.assertEqual(report["slowest_imports"][0]["module"], "django.db.models")
+        # one phases process per run, plus one per run for every tracked module
+        self.assertEqual(run_python.call_count, 2 + 2 * len(profile_startup.TARGET_MODULES))
+
+    def test_within_baseline(self, run_python):
+        self.run_command("--write-baseline")
+        self.assertIn("Startup within baseline tolerance.", self.run_command())
+
+    def test_regression_fails(self, run_python):
+        self.run_command("--write-baseline")
+        report = json.loads(self.baseline.read_text())
+        report["phases"]["apps_populate_ms"] = 10.0
+        self.baseline.write_text(json.dumps(report))
+        with self.assertRaisesMessage(CommandError, "phases.apps_populate_ms"):
+            self.run_command()
+
+    def test_missing_baseline_only_warns(self, run_python):
+        self.assertIn("No baseline at", self.run_command())
+
+
+class ParticularSearchIndexTests(TestCase):
+    """The search modes must be able to use particular_title_trgm (EXPLAIN, seq scans disabled)."""
+
+    def plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_contains_uses_trigram_index(self):
+        self.assertIn("particular_title_trgm", self.plan(Particular.objects.filter(title__icontains="licen")))
+
+    def test_prefix_uses_trigram_index(self):
+        self.assertIn("particular_title_trgm", self.plan(Particular.objects.filter(title__istartswith="driv")))
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(REPLICA_DATABASES=['replica'], CACHES=LOCMEM_CACHE)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_stay_on_default_without_the_flag(self):
+        self.assertEqual(self.router.db_for_read(Particular), DEFAULT_DB_ALIAS)
+
+    def test_flagged_reads_go_to_a_replica(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Particular), 'replica')
+        self.assertEqual(self.router.db_for_read(Particular), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_flag_is_a_noop_without_replicas(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Particular), DEFAULT_DB_ALIAS)
+
+    def test_reads_inside_a_transaction_stay_on_default(self):
+        with read_from_replica(), mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Particular), DEFAULT_DB_ALIAS)
+
+    def test_writes_and_migrations_only_on_default(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Particular), DEFAULT_DB_ALIAS)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'reminderx'))
+        self.assertFalse(self.router.allow_migrate('replica', 'reminderx'))
+
+
+@override_settings(REPLICA_DATABASES=['replica'], CACHES=LOCMEM_CACHE)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Each request records where its reads would be routed."""
+
+    def setUp(self):
+        cache.clear()
+        self.routed = []
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+        self.factory = RequestFactory()
+
+    def view(self, request):
+        self.routed.append(ReplicaRouter().db_for_read(Particular))
+        return HttpResponse()
+
+    def request(self, method, ip='10.0.0.1', path='/api/particulars/'):
+        self.middleware(getattr(self.factory, method)(path, REMOTE_ADDR=ip))
+        return self.routed[-1]
+
+    def test_safe_api_reads_use_the_replica(self):
+        self.assertEqual(self.request('get'), 'replica')
+
+    def test_writes_and_non_api_reads_use_default(self):
+        self.assertEqual(self.request('post'), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request('get', ip='10.0.0.2', path='/admin/'), DEFAULT_DB_ALIAS)
+
+    def test_reads_after_a_write_are_pinned_to_default(self):
+        self.request('post')
+        self.assertEqual(self.request('get'), DEFAULT_DB_ALIAS)
+        # other clients are unaffected
+        self.assertEqual(self.request('get', ip='10.0.0.2'), 'replica')
+
+    def test_pin_expires(self):
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.request('post')
+        self.assertEqual(self.request('get'), 'replica')
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ada", "ada@example.com", "pw-123456")
+        Particular.objects.create(user=self.user, title="Passport", expiry_date=date(2030, 1, 1))
+        self.client = APIClient()
+        self.refresh = ProfileRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_list_does_not_load_the_user_or_profile(self):
+        Particular.objects.create(user=self.user, title="Licence", expiry_date=date(2030, 1, 1))
+        # particulars, then the reminders and owners prefetches
+        with self.assertNumQueries(3), CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/particulars/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+        for query in queries:
+            self.assertNotIn('FROM "auth_user"', query["sql"])
+            self.assertNotIn('FROM "reminderx_profile" WHERE', query["sql"])
+
+    def test_deleted_profile_is_rejected(self):
+        Profile.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get("/api/me/").status_code, 401)
+
+    def test_refresh_fails_for_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = APIClient().post("/api/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_works_for_active_user(self):
+        response = APIClient().post("/api/token/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+
+class OrganizationAdminPermissionTests(TestCase):
+    """Only the admin of the staff member's own organization may manage them."""
+
+    def setUp(self):
+        self.admin = self.member("admin_a", "admin")
+        self.org = Organization.objects.create(organizational_id="100001", name="A", admin=self.admin)
+        self.other_admin = self.member("admin_b", "admin")
+        other_org = Organization.objects.create(organizational_id="100002", name="B", admin=self.other_admin)
+        Profile.objects.filter(pk=self.admin.pk).update(organization=self.org)
+        Profile.objects.filter(pk=self.other_admin.pk).update(organization=other_org)
+        self.staff = self.member("staff_a", "unverified", self.org)
+        self.colleague = self.member("colleague_a", "staff", self.org)
+        self.particular = Particular.objects.create(user=self.admin.user, title="Licence", expiry_date=date(2030, 1, 1))
+
+    def member(self, username, role, org=None):
+        user = User.objects.create_user(username, f"{username}@example.com", "pw-123456")
+        Profile.objects.filter(user=user).update(role=role, organization=org)
+        return Profile.objects.get(user=user)
+
+    def client_for(self, profile):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {ProfileRefreshToken.for_user(profile.user).access_token}")
+        return client
+
+    def verify_staff(self, profile):
+        token = TimestampSigner().sign(self.staff.id)
+        return self.client_for(profile).post("/api/verify-staff/", {"token": token}, format="json")
+
+    def manage_owner(self, profile):
+        return self.client_for(profile).post(
+            f"/api/particulars/{self.particular.id}/owners/", {"profile_id": self.staff.id}, format="json")
+
+    def delete_staff(self, profile):
+        return self.client_for(profile).delete(f"/api/staff/{self.staff.id}/delete/")
+
+    def test_refused_for_non_admin_and_other_org_admin(self):
+        for action in (self.verify_staff, self.manage_owner, self.delete_staff):
+            for caller in (self.colleague, self.other_admin):
+                with self.subTest(action=action.__name__, caller=caller.user.username):
+                    self.assertEqual(action(caller).status_code, 403)
+        self.staff.refresh_from_db()
+        self.assertEqual(self.staff.role, "unverified")
+        self.assertFalse(self.particular.owners.exists())
+
+    def test_allowed_for_own_admin(self):
+        self.assertEqual(self.verify_staff(self.admin).status_code, 200)
+        self.assertEqual(self.manage_owner(self.admin).status_code, 200)
+        self.assertEqual(self.delete_staff(self.admin).status_code, 200)
+        self.assertFalse(Profile.objects.filter(pk=self.staff.pk).exists())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000 + self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ProviderError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(status)
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class ProviderGuardTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("monotonic", "time", "sleep"):
+            patcher = mock.patch(f"time.{name}", getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.guard = ProviderGuard("test", rate=10, max_concurrency=8, min_concurrency=1, failure_threshold=3,
+                                   cool_off=30, max_cool_off=100, max_wait=10)
+        self.send = mock.Mock(return_value=SimpleNamespace(headers={}))
+
+    def fail(self, status=500, headers=None):
+        with self.assertRaises(ProviderError):
+            self.guard.call(mock.Mock(side_effect=ProviderError(status, headers)))
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        for _ in range(3):
+            self.fail()
+        self.assertEqual(self.guard.state()["circuit"], "open")
+        with self.assertRaises(ProviderUnavailable) as cm:
+            self.guard.call(self.send)
+        self.assertEqual(cm.exception.reason, "circuit_open")
+        self.send.assert_not_called()
+
+    def test_half_open_probe_closes_the_circuit(self):
+        for _ in range(3):
+            self.fail()
+        self.clock.sleep(30)
+
+        def probe():
+            self.assertEqual(self.guard.state()["circuit"], "half_open")
+            # only the probe gets through while it runs
+            with self.assertRaises(ProviderUnavailable):
+                self.guard.call(self.send)
+            return SimpleNamespace(headers={})
+
+        self.guard.call(probe)
+        self.assertEqual(self.guard.state()["circuit"], "closed")
+        self.guard.call(self.send)
+        self.send.assert_called_once()
+
+    def test_failed_probe_doubles_the_cool_off(self):
+        for _ in range(3):
+            self.fail()
+        self.clock.sleep(30)
+        self.fail()
+        self.assertEqual(self.guard.cool_off, 60)
+        self.clock.sleep(59)
+        self.assertTrue(self.guard.is_open())
+        self.clock.sleep(1)
+        self.fail()
+        self.assertEqual(self.guard.cool_off, 100)  # capped at max_cool_off
+        self.clock.sleep(100)
+        self.guard.call(self.send)
+        self.assertEqual(self.guard.cool_off, 30)
+
+    def test_aimd_concurrency(self):
+        self.assertEqual(self.guard.limit, 4)
+        for _ in range(4):
+            self.guard.call(self.send)
+        self.assertEqual(self.guard.state()["concurrency_limit"], 4)
+        self.assertGreater(self.guard.limit, 4.9)
+        self.fail(status=503)
+        self.assertLess(self.guard.limit, 2.5)
+        self.fail(status=503)
+        self.fail(status=503)
+        self.assertEqual(self.guard.limit, 1)  # never below min_concurrency
+
+    def test_transport_errors_count_as_failures(self):
+        for _ in range(3):
+            with self.assertRaises(TimeoutError):
+                self.guard.call(mock.Mock(side_effect=TimeoutError()))
+        self.assertTrue(self.guard.is_open())
+
+    def test_retry_after_pauses_calls(self):
+        self.fail(status=429, headers={"Retry-After": "5"})
+        start = self.clock.now
+        self.guard.call(self.send)
+        self.assertEqual(self.clock.now - start, 5)
+
+        self.fail(status=429, headers={"Retry-After": "60"})
+        with self.assertRaises(ProviderUnavailable) as cm:
+            self.guard.call(self.send)
+        self.assertEqual(cm.exception.reason, "retry_after")
+
+    def test_rate_follows_ratelimit_headers(self):
+        self.send.return_value = SimpleNamespace(headers={"X-RateLimit-Remaining": "20", "X-RateLimit-Reset": "40"})
+        self.guard.call(self.send)
+        self.assertEqual(self.guard.bucket.rate, 0.5)
+
+        # headers without a rate limit let the rate recover, doubling up to the configured one
+        self.send.return_value = SimpleNamespace(headers={"Content-Type": "application/json"})
+        self.guard.call(self.send)
+        self.assertEqual(self.guard.bucket.rate, 1.0)
+        for _ in range(4):
+            self.guard.call(self.send)
+        self.assertEqual(self.guard.bucket.rate, 10)
+
+    def test_client_errors_are_neutral(self):
+        self.fail()
+        self.fail()
+        for _ in range(5):
+            self.fail(status=400)
+        self.assertEqual(self.guard.state()["consecutive_failures"], 0)
+        self.assertFalse(self.guard.is_open())
+
+
+THROTTLE_SETTINGS = {
+    'NUM_PROXIES': 1,
+    'DEFAULT_THROTTLE_RATES': {'test_ip': '3/min', 'test_user': '2/min', 'login_ip': '100/min', 'login_username': '2/min'},
+}
+
+
+class TestThrottle(throttling.TokenBucketThrottle):
+    scope = 'test'
+
+
+def throttle_request(ip='10.0.0.1', user=None, **data):
+    # one proxy hop: the client is the last X-Forwarded-For entry, REMOTE_ADDR is nginx
+    return SimpleNamespace(META={'HTTP_X_FORWARDED_FOR': f'6.6.6.6, {ip}', 'REMOTE_ADDR': '127.0.0.1'},
+                           user=user or AnonymousUser(), data=data)
+
+
+@override_settings(REST_FRAMEWORK=THROTTLE_SETTINGS, THROTTLE_BACKEND='memory')
+class ThrottlingTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        throttling._memory.clear()
+        self.addCleanup(throttling._memory.clear)
+
+    def allowed(self, throttle_class, request, times=1):
+        return [throttle_class().allow_request(request, None) for _ in range(times)]
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('30/min'), (0.5, 30))
+        self.assertEqual(throttling.parse_rate('3/10min'), (3 / 600, 3))
+        self.assertEqual(throttling.parse_rate('10 / s'), (10, 10))
+        for rate in ('30', 'x/min', '5/fortnight', '5/0.5h'):
+            with self.subTest(rate=rate), self.assertRaises(ValueError):
+                throttling.parse_rate(rate)
+
+    def test_burst_then_refill(self):
+        self.assertEqual(self.allowed(TestThrottle, throttle_request(), 4), [True, True, True, False])
+        throttle = TestThrottle()
+        self.assertFalse(throttle.allow_request(throttle_request(), None))
+        self.assertEqual(throttle.wait(), 20)  # one token per 20 s
+        self.clock.sleep(20)
+        self.assertEqual(self.allowed(TestThrottle, throttle_request(), 2), [True, False])
+
+    def test_buckets_per_client_ip(self):
+        self.allowed(TestThrottle, throttle_request(), 3)
+        self.assertFalse(TestThrottle().allow_request(throttle_request(), None))
+        self.assertTrue(TestThrottle().allow_request(throttle_request(ip='10.0.0.2'), None))
+
+    def test_any_empty_bucket_rejects(self):
+        user = SimpleNamespace(pk=7, is_authenticated=True)
+        self.assertEqual(self.allowed(TestThrottle, throttle_request(user=user), 2), [True, True])
+        # the user's bucket is empty even though this IP still has tokens
+        self.assertFalse(TestThrottle().allow_request(throttle_request(ip='10.0.0.2', user=user), None))
+
+    def test_memory_buckets_evict_least_recently_used(self):
+        buckets = throttling.MemoryBuckets(max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            buckets.take(key, 1, 1)
+        self.assertEqual(list(buckets.buckets), ['a', 'c'])
+
+    def test_login_throttle_keys_username_per_ip(self):
+        self.assertEqual(self.allowed(throttling.LoginThrottle, throttle_request(username='Ada'), 3), [True, True, False])
+        self.assertFalse(throttling.LoginThrottle().allow_request(throttle_request(username=' ada '), None))
+        # failures from one address don't lock the account out everywhere
+        self.assertTrue(throttling.LoginThrottle().allow_request(throttle_request(ip='10.0.0.2', username='ada'), None))
+
+
+class LoadToolsSmokeTests(TestCase):
+    def test_seed_then_benchmark(self):
+        out = StringIO()
+        call_command("seed_load", "--users", "5", "--particulars", "20", "--reminders", "40", stdout=out)
+        self.assertTrue(User.objects.filter(username__startswith="load").exists())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / "benchmark_baseline.json"
+            call_command("run_benchmarks", "--repeat", "1", "--only", "particular_list,login",
+                         "--baseline", str(baseline), "--write-baseline", stdout=out)
+            self.assertEqual(set(json.loads(baseline.read_text())["results"]), {"particular_list", "login"})
+            call_command("run_benchmarks", "--repeat", "1", "--only", "particular_list,login",
+                         "--baseline", str(baseline), "--tolerance", "100", stdout=out)
+        self.assertIn("Benchmarks within baseline tolerance.", out.getvalue())
+
+
+class BackfillCountersTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("ada", "ada@example.com", "pw-123456")
+        Particular.objects.create(user=user, title="Passport", expiry_date=date(2030, 1, 1))
+        self.profile = user.profile
+        Profile.objects.filter(pk=self.profile.pk).update(particular_count=0)
+
+    def migrate(self, *operations):
+        migration = Migration("0002_test", "reminderx")
+        migration.operations = list(operations)
+        with mock.patch("sys.stdout", StringIO()):
+            backfill_counters(apps.get_app_config("reminderx"), verbosity=0, plan=[(migration, False)])
+        self.profile.refresh_from_db()
+        return self.profile.particular_count
+
+    def test_runs_when_a_counter_column_is_added(self):
+        self.assertEqual(self.migrate(AddField("profile", "particular_count", models.IntegerField(default=0))), 1)
+
+    def test_skipped_by_other_migrations(self):
+        self.assertEqual(self.migrate(AddField("profile", "nickname", models.CharField(max_length=20))), 0)
+        self.assertEqual(self.migrate(), 0)
+
+
+class BlobStorageTestCase(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.user = User.objects.create_user("ada", "ada@example.com", "pw-123456")
+
+    def stage(self, content=b"%PDF scanned licence"):
+        upload = BlobUpload.objects.create(
+            user=self.user, staging_name=staging_name(self.user.id, "pdf"), sha256=hashlib.sha256(content).hexdigest()
+        )
+        default_storage.save(upload.staging_name, ContentFile(content))
+        return upload
+
+    def make_old(self, *names):
+        StoredBlob.objects.filter(name__in=names).update(updated_at=timezone.now() - timedelta(days=1))
+
+    def collect(self):
+        call_command("collect_uploads", stdout=StringIO())
+
+
+class DocumentPromotionTests(BlobStorageTestCase):
+    def save(self, upload, title="Licence"):
+        serializer = ParticularSerializer(
+            data={"title": title, "expiry_date": "2030-01-01", "document_key": upload.staging_name},
+            context={"request": SimpleNamespace(user=self.user)},
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return serializer.save(user=self.user)
+
+    def test_validation_does_not_promote(self):
+        upload = self.stage()
+        serializer = ParticularSerializer(
+            data={"title": "Licence", "expiry_date": "2030-01-01", "document_key": upload.staging_name},
+            context={"request": SimpleNamespace(user=self.user)},
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        upload.refresh_from_db()
+        self.assertEqual(upload.blob_name, "")
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_failed_save_leaves_the_upload_reusable(self):
+        upload = self.stage()
+        with mock.patch.object(drf_serializers.ModelSerializer, "create", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.save(upload)
+        upload.refresh_from_db()
+        self.assertEqual(upload.blob_name, "")
+        self.assertTrue(default_storage.exists(upload.staging_name))
+        self.assertFalse(StoredBlob.objects.exists())
+
+        particular = self.save(upload)
+        self.assertEqual(particular.document.name, promoted_name(upload))
+        self.assertEqual(StoredBlob.objects.get(name=particular.document.name).ref_count, 1)
+        self.assertFalse(default_storage.exists(upload.staging_name))
+
+    def test_digest_mismatch_is_a_validation_error(self):
+        upload = self.stage()
+        BlobUpload.objects.filter(pk=upload.pk).update(sha256="0" * 64)
+        with self.assertRaises(drf_serializers.ValidationError):
+            self.save(upload)
+        self.assertFalse(Particular.objects.exists())
+
+
+class CollectUploadsTests(BlobStorageTestCase):
+    def blob(self, content):
+        name = default_storage.save("doc.pdf", ContentFile(content))
+        self.make_old(name)
+        return name
+
+    def test_references_written_past_the_signals_are_recounted(self):
+        document, thumbnail, orphan = self.blob(b"document"), self.blob(b"thumbnail"), self.blob(b"orphan")
+        particular = Particular.objects.create(user=self.user, title="Licence", expiry_date=date(2030, 1, 1))
+        Particular.objects.filter(pk=particular.pk).update(document=document)
+        Profile.objects.filter(user=self.user).update(profile_picture_thumbnails={"64": thumbnail})
+
+        self.collect()
+        self.assertEqual(StoredBlob.objects.get(name=document).ref_count, 1)
+        self.assertEqual(StoredBlob.objects.get(name=thumbnail).ref_count, 1)
+        self.assertTrue(default_storage.exists(document))
+        self.assertFalse(StoredBlob.objects.filter(name=orphan).exists())
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_blob_left_by_a_rolled_back_promotion_is_collected(self):
+        upload = self.stage(b"abandoned")
+        default_storage.save("upload.pdf", ContentFile(b"abandoned"))
+        name = promoted_name(upload)
+        StoredBlob.objects.filter(name=name).delete()  # as after the rollback
+        BlobUpload.objects.filter(pk=upload.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        self.collect()
+        self.assertFalse(BlobUpload.objects.exists())
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 0)
+        self.make_old(name)
+        self.collect()
+        self.assertFalse(default_storage.exists(name))
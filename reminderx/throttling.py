@@ -0,0 +1,165 @@
+"""
+Token-bucket throttles for DRF.
+
+Each throttle checks one bucket per identity it can extract from the request
+(client IP, user id, submitted email/username, target) and rejects the
+request with 429 if any of them is empty. Rates come from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] as "<scope>_<key>": "<n>/<period>",
+e.g. "login_ip": "30/min" or "otp_email": "3/10min"; n is also the burst.
+
+Buckets live in process memory by default (no I/O at all) or in the Django
+cache with THROTTLE_BACKEND = 'cache', so limits are shared between gunicorn
+workers. Neither touches the database.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .ratelimit import TokenBucket
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+RATE_RE = re.compile(r'^(\d+)/(\d*)([a-z]+)$')
+
+
+def parse_rate(rate):
+    """'3/10min' -> (tokens per second, burst capacity)."""
+    match = RATE_RE.match(rate.replace(' ', ''))
+    if not match or match[3] not in PERIODS:
+        raise ValueError(f"Invalid throttle rate {rate!r}")
+    count, multiplier, unit = int(match[1]), int(match[2] or 1), match[3]
+    return count / (multiplier * PERIODS[unit]), count
+
+
+class MemoryBuckets:
+    """Per-process buckets; the least recently used are dropped past `max_keys`."""
+
+    def __init__(self, max_keys=50000):
+        self.buckets = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(rate, capacity)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+        if bucket.try_acquire():
+            return 0
+        return (1 - bucket.tokens) / rate
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBuckets:
+    """
+    Buckets stored as (tokens, timestamp) in the Django cache, shared by all
+    workers. Read-modify-write isn't atomic, so a burst racing across workers
+    can slip a request or two past the limit; that's fine for abuse control.
+    """
+
+    def take(self, key, rate, capacity):
+        now = time.time()
+        tokens, updated = cache.get(f"throttle:{key}", (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Once full again the entry carries no information, let it expire
+        cache.set(f"throttle:{key}", (tokens, now), timeout=int(capacity / rate) + 1)
+        return 0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        pass
+
+
+_memory = MemoryBuckets()
+
+
+def backend():
+    return CacheBuckets() if getattr(settings, 'THROTTLE_BACKEND', 'memory') == 'cache' else _memory
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+    # identities to bucket on; ones missing from the request are skipped
+    keys = ('ip', 'user')
+
+    def get_key_value(self, name, request, view):
+        if name == 'ip':
+            return self.get_ident(request)
+        if name == 'user':
+            user = getattr(request, 'user', None)
+            return user.pk if user is not None and user.is_authenticated else None
+        data = getattr(request, 'data', None)
+        value = data.get(name) if hasattr(data, 'get') else None
+        if value in (None, ''):
+            return None
+        return str(value).strip().lower()
+
+    def allow_request(self, request, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        buckets = backend()
+        self.wait_seconds = 0
+
+        for name in self.keys:
+            rate = rates.get(f"{self.scope}_{name}")
+            value = self.get_key_value(name, request, view)
+            if not rate or value is None:
+                continue
+            per_second, capacity = parse_rate(rate)
+            self.wait_seconds = max(self.wait_seconds, buckets.take(f"{self.scope}:{name}:{value}", per_second, capacity))
+
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class APIThrottle(TokenBucketThrottle):
+    """Generous default for every API view."""
+    scope = 'api'
+
+
+class OTPThrottle(TokenBucketThrottle):
+    scope = 'otp'
+    keys = ('ip', 'email')
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = 'login'
+    keys = ('ip', 'username')
+
+    def get_key_value(self, name, request, view):
+        value = super().get_key_value(name, request, view)
+        if name == 'username' and value is not None:
+            # Per username and IP, so guessing someone's password elsewhere can't lock them out
+            return f"{value}|{self.get_ident(request)}"
+        return value
+
+
+class PasswordResetThrottle(TokenBucketThrottle):
+    scope = 'password_reset'
+    keys = ('ip', 'email')
+
+
+class MessagingThrottle(TokenBucketThrottle):
+    scope = 'messaging'
+    keys = ('ip', 'user', 'profile_id')
+
+    def get_key_value(self, name, request, view):
+        if name == 'profile_id':
+            # The staff member being messaged (send_message_view URL kwarg)
+            return view.kwargs.get('profile_id')
+        return super().get_key_value(name, request, view)
@@ -0,0 +1,50 @@
+import hashlib
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Room for the multipart boundaries and the other form fields sent with a file
+MULTIPART_OVERHEAD = 1024 * 1024
+
+
+def max_upload_size():
+    return getattr(settings, "MAX_UPLOAD_SIZE", 20 * 1024 * 1024)
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Uploaded file is too large."
+    default_code = "upload_too_large"
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every uploaded file to a temporary file in fixed-size chunks,
+    computing its SHA-256 and enforcing MAX_UPLOAD_SIZE as bytes arrive.
+    The finished file carries the digest as `uploaded_file.sha256`.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Reject before reading the body when the declared size is already too big
+        if content_length and content_length > max_upload_size() + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_upload_size():
+            self.file.close()  # drops the temporary file
+            raise UploadTooLarge(f"Files may be at most {max_upload_size() // (1024 * 1024)} MB.")
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.hasher.hexdigest()
+        return uploaded_file
@@ -1,5 +1,5 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenObtainPairView
 from .views import *
 
 urlpatterns = [
@@ -12,17 +12,19 @@ urlpatterns = [
 
     # Auth
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
 
     # Core APIs
     path('api/me/', current_user_view, name='current-user'),
     path('api/particulars/', ParticularListCreateView.as_view(), name='particulars'),
     path('api/particulars/<int:pk>/', ParticularDetailUpdateView.as_view(), name='particular-detail'),
     path('api/particulars/search/', ParticularSearchView.as_view(), name='particular-search'),
+    path('api/particulars/summary/', ParticularSummaryView.as_view(), name='particular-summary'),
     path('api/reminders/', ReminderListCreateView.as_view(), name='reminders'),
     path('api/reminders/<int:pk>/', ReminderUpdateView.as_view(), name='update-reminder'),
     path('api/notifications/', NotificationListView.as_view(), name='notification-list'),
     path('api/bulk-create/', BulkParticularCreateView.as_view(), name='bulk-create'),
+    path('api/uploads/presign/', presign_upload_view, name='presign-upload'),
     path("api/manual-upgrade/", manual_upgrade, name="manual-upgrade"),
 
      # Organization & Staff Management
@@ -30,9 +32,14 @@ urlpatterns = [
     path("api/verify-organization/", VerifyOrganizationView.as_view(), name="verify-organization"),
     path("api/verify-staff/", VerifyStaffView.as_view(), name="verify-staff"),
     path("api/organizations/<str:organizational_id>/", OrganizationDetailView.as_view(), name="organization-detail"),
+    path("api/organizations/<str:org_id>/overview/", OrganizationOverviewView.as_view(), name="organization-overview"),
+    path("api/organizations/<str:org_id>/overview/<int:profile_id>/particulars/", OrganizationStaffParticularsView.as_view(), name="organization-staff-particulars"),
     path("api/particulars/<int:particular_id>/owners/", manage_particular_owner, name="manage_particular_owner"),
+    path("api/organizations/<str:org_id>/owners/bulk/", bulk_manage_owners, name="bulk-manage-owners"),
     path("api/staff/<int:profile_id>/particulars/", staff_particulars_view, name="staff_particulars"),
     path("api/staff/<int:profile_id>/send-message/", send_message_view, name="send_message"),
+    path("api/organizations/<str:org_id>/broadcasts/", create_broadcast_view, name="create-broadcast"),
+    path("api/broadcasts/<int:broadcast_id>/", BroadcastReportView.as_view(), name="broadcast-report"),
     path("api/staff/<int:profile_id>/delete/", delete_staff_view, name="delete-staff"),
     path("api/organizations/<str:org_id>/set-icon/", set_organization_icon, name="set-organization-icon"),
 
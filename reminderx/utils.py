@@ -1,5 +1,6 @@
 import requests
 from django.conf import settings
+from .metrics import provider_call
 
 def initialize_transaction(email, amount, callback_url, plan, user_id):
     url = f"{settings.PAYSTACK_BASE_URL}/transaction/initialize"
@@ -13,11 +14,13 @@ def initialize_transaction(email, amount, callback_url, plan, user_id):
             "user_id": user_id,
         },
     }
-    response = requests.post(url, headers=headers, json=data)  # use json not data
+    with provider_call("paystack"):
+        response = requests.post(url, headers=headers, json=data, timeout=settings.PROVIDER_TIMEOUT)  # use json not data
     return response.json()
 
 def verify_transaction(reference):
     url = f"{settings.PAYSTACK_BASE_URL}/transaction/verify/{reference}"
     headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-    response = requests.get(url, headers=headers)
+    with provider_call("paystack"):
+        response = requests.get(url, headers=headers, timeout=settings.PROVIDER_TIMEOUT)
     return response.json()
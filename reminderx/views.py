@@ -1,16 +1,19 @@
 from django.shortcuts import render
-import requests
 import random
+import tempfile
 from rest_framework import generics, permissions, status
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .authentication import ProfileTokenRefreshSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.generics import RetrieveUpdateAPIView
 from django.core.mail import send_mail
-from .permissions import CanCreateParticular, CanCreateReminder
-from .models import Organization, Particular, Reminder, Notification, get_allowed_methods, EmailVerification, SubscriptionPlan, Profile
+from .permissions import CanCreateParticular, CanCreateReminder, check_particular_limit
+from .models import Organization, Particular, Reminder, Notification, get_allowed_methods, EmailVerification, SubscriptionPlan, Profile, StoredBlob, BlobUpload, MessageBroadcast, OutboundMessage, visible_particulars, PARTICULAR_SEARCH_VECTOR, OTP_LIFETIME
+from .pagination import OptionalPageNumberPagination, IdCursorPagination
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
 from .serializers import (
     OrganizationDetailSerializer,
     ParticularSerializer,
@@ -20,29 +23,56 @@ from .serializers import (
     NotificationSerializer,
     CustomTokenObtainPairSerializer,
     BulkParticularListSerializer,
+    BulkParticularSerializer,
     OrganizationCreateSerializer
 )
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, PermissionDenied
 from django.conf import settings
 import os
 from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from twilio.rest import Client
+from django.db.models import Q, Count, F
+from django.core.cache import cache
+from .caching import particulars_changed, particular_summary_key, particulars_version, SUMMARY_TTL, organization_overview_key, OVERVIEW_TTL
+from django.db import connection, transaction
+from . import providers
 from .utils import initialize_transaction, verify_transaction
+from .partitions import history_window_start
+from .throttling import OTPThrottle, LoginThrottle, MessagingThrottle, PasswordResetThrottle
+from django_rest_passwordreset.views import ResetPasswordRequestToken, ResetPasswordConfirm, ResetPasswordValidateToken
+from .bulk import BulkImporter
+from .parsers import NDJSONParser, CSVParser
+from rest_framework.parsers import JSONParser
+from .storage import signed_url, verify_signature
+from .blobs import is_staging, staging_name
+from .uploads import max_upload_size
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, Http404
+from django.views.decorators.csrf import csrf_exempt
 from datetime import timedelta
 from django.utils.timezone import now
+import logging
 
+logger = logging.getLogger(__name__)
 
-TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
-TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+
+# Ranking only runs over rows already matched via PARTICULAR_SEARCH_VECTOR
+PARTICULAR_WEIGHTED_VECTOR = (
+    SearchVector('title', weight='A', config='english')
+    + SearchVector('category', weight='B', config='english')
+    + SearchVector('notes', weight='C', config='english')
+)
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginThrottle]
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = ProfileTokenRefreshSerializer
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
@@ -75,13 +105,15 @@ class ParticularListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         #return self.request.user.particulars.all()
-        user = self.request.user
-        return Particular.objects.filter(
-            Q(user=user) | Q(owners=user.profile)  # include owner-linked particulars
-        ).distinct()
+        # Created + owner-linked particulars, straight from the token's user id
+        return visible_particulars(self.request.user.id).prefetch_related('reminders', 'owners')
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Lock the profile row so concurrent creates can't both pass the limit
+        with transaction.atomic():
+            profile = Profile.objects.select_for_update(of=('self',)).select_related('subscription_plan').get(pk=self.request.user.profile_id)
+            check_particular_limit(profile)
+            serializer.save(user=self.request.user)
 
 
 # GET (retrieve) and PUT/PATCH (update) particular
@@ -90,10 +122,7 @@ class ParticularDetailUpdateView(RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Particular.objects.filter(
-            Q(user=user) | Q(owners=user.profile)
-        ).distinct()
+        return visible_particulars(self.request.user.id)
 
     def delete(self, request, *args, **kwargs):
         particular = self.get_object()
@@ -104,26 +133,79 @@ class ParticularDetailUpdateView(RetrieveUpdateAPIView):
 
 # Search user's particulars by title
 class ParticularSearchView(generics.ListAPIView):
+    """
+    ?q=        search term
+    ?mode=     contains (default, trigram-indexed ILIKE), prefix (autocomplete)
+               or fulltext (ranked search over title, notes and category)
+    ?page= / ?page_size=  optional pagination
+    """
     serializer_class = ParticularSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalPageNumberPagination
 
     def get_queryset(self):
-        """
-        user_particulars = self.request.user.particulars.all()
-        search_query = self.request.query_params.get('q', None)
-        if search_query:
-            return user_particulars.filter(title__icontains=search_query)
-        return user_particulars
-        """
-        user = self.request.user
-        queryset = Particular.objects.filter(
-            Q(user=user) | Q(owners=user.profile)
-        ).distinct()
+        queryset = visible_particulars(self.request.user.id).prefetch_related('reminders', 'owners')
 
         search_query = self.request.query_params.get('q')
-        if search_query:
-            queryset = queryset.filter(title__icontains=search_query)
-        return queryset
+        if not search_query:
+            return queryset.order_by('id')
+
+        mode = self.request.query_params.get('mode', 'contains')
+        if mode == 'prefix':
+            return queryset.filter(title__istartswith=search_query).order_by('title', 'id')
+        if mode == 'fulltext':
+            query = SearchQuery(search_query, config='english', search_type='websearch')
+            return (
+                queryset
+                .annotate(search=PARTICULAR_SEARCH_VECTOR)
+                .filter(search=query)
+                .annotate(rank=SearchRank(PARTICULAR_WEIGHTED_VECTOR, query))
+                .order_by('-rank', 'id')
+            )
+        return queryset.filter(title__icontains=search_query).order_by('id')
+
+
+class ParticularSummaryView(APIView):
+    """
+    Dashboard counts over everything the user can see, by category and by
+    expiry horizon, from a single GROUP BY query. Cached per user for the
+    day, keyed on their particulars_version so any change to a particular
+    they can see takes effect on every worker (see caching.py / signals.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    HORIZONS = (7, 30, 90)
+
+    def get(self, request):
+        key = particular_summary_key(request.user.id, particulars_version(request.user.id))
+        data = cache.get(key)
+        if data is None:
+            data = self.build_summary(request.user)
+            cache.set(key, data, SUMMARY_TTL)
+        return Response(data)
+
+    def build_summary(self, user):
+        today = now().date()
+        buckets = {
+            "total": Count("id"),
+            "completed": Count("id", filter=Q(completed=True)),
+            "expired": Count("id", filter=Q(expiry_date__lt=today)),
+        }
+        for days in self.HORIZONS:
+            buckets[f"expiring_{days}d"] = Count(
+                "id", filter=Q(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=days))
+            )
+
+        rows = visible_particulars(user.id).values("category").annotate(**buckets).order_by("category")
+
+        by_category = {}
+        totals = dict.fromkeys(buckets, 0)
+        for row in rows:
+            category = row.pop("category")
+            by_category[category] = row
+            for name, value in row.items():
+                totals[name] += value
+
+        return {"as_of": today.isoformat(), "totals": totals, "by_category": by_category}
 
 
 # Create or list reminders
@@ -133,16 +215,13 @@ class ReminderListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         #return Reminder.objects.filter(particular__user=self.request.user)
-        user = self.request.user
-        return Reminder.objects.filter(
-            Q(particular__user=user) | Q(particular__owners=user.profile)
-        ).distinct()
+        return Reminder.objects.filter(particular__in=visible_particulars(self.request.user.id))
 
     def perform_create(self, serializer):
         particular = serializer.validated_data['particular']
         user = self.request.user
 
-        if not (particular.user == user or user.profile in particular.owners.all()):
+        if not (particular.user_id == user.id or particular.owners.filter(pk=user.profile_id).exists()):
             raise ValidationError("Unauthorized")
 
         profile = self.request.user.profile
@@ -153,7 +232,13 @@ class ReminderListCreateView(generics.ListCreateAPIView):
         if invalid:
             raise ValidationError(f"Invalid reminder methods for your plan: {invalid}")
 
-        serializer.save()
+        # Re-check the reminder limit under a row lock (CanCreateReminder ran unlocked)
+        with transaction.atomic():
+            locked = Particular.objects.select_for_update().only('reminder_count').get(pk=particular.pk)
+            max_reminders = profile.subscription_plan.max_reminders_per_particular
+            if locked.reminder_count >= max_reminders:
+                raise PermissionDenied("You have reached your plan's reminder limit for this document.")
+            serializer.save()
 
 
 
@@ -163,17 +248,16 @@ class ReminderUpdateView(RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Reminder.objects.filter(
-            Q(particular__user=user) | Q(particular__owners=user.profile)
-        ).distinct()
+        return Reminder.objects.filter(particular__in=visible_particulars(self.request.user.id))
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(
+            user=self.request.user, created_at__gte=history_window_start()
+        ).order_by('-created_at')
 
 # Register new user and return JWT tokens
 class RegisterView(APIView):
@@ -183,7 +267,9 @@ class RegisterView(APIView):
         # Require OTP for registration
         if not otp or not email:
             return Response({"error": "OTP and email are required for registration."}, status=400)
-        record = EmailVerification.objects.filter(email=email, otp=otp).last()
+        record = EmailVerification.objects.filter(
+            email=email, otp=otp, created_at__gte=now() - OTP_LIFETIME
+        ).order_by('-created_at').first()
         if not record or record.is_expired():
             return Response({"error": "Invalid or expired OTP. Please verify your email first."}, status=400)
         serializer = RegisterSerializer(data=request.data)
@@ -207,7 +293,23 @@ class RegisterView(APIView):
             "details": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+# django_rest_passwordreset disables throttling on its views; these are routed
+# ahead of its include in reminderx_backend/urls.py
+class ThrottledResetPasswordRequestToken(ResetPasswordRequestToken):
+    throttle_classes = [PasswordResetThrottle]
+
+
+class ThrottledResetPasswordConfirm(ResetPasswordConfirm):
+    throttle_classes = [PasswordResetThrottle]
+
+
+class ThrottledResetPasswordValidateToken(ResetPasswordValidateToken):
+    throttle_classes = [PasswordResetThrottle]
+
+
 class SendVerificationEmail(APIView):
+    throttle_classes = [OTPThrottle]
+
     def post(self, request):
         email = request.data.get("email")
         username = request.data.get("username")
@@ -216,13 +318,13 @@ class SendVerificationEmail(APIView):
         if not username:
             return Response({"error": "Username is required"}, status=400)
 
-        if User.objects.filter(email=email).exists():
+        if User.objects.filter(email__iexact=email).exists():
             return Response({"error": "Email already in use."}, status=400)
         if User.objects.filter(username=username).exists():
             return Response({"error": "Username already taken."}, status=400)
 
         otp = str(random.randint(100000, 999999))
-        EmailVerification.objects.create(email=email, otp=otp)
+        verification = EmailVerification.objects.create(email=email, otp=otp)
         """
         send_mail(
             subject="Naikas OTP Code",
@@ -232,15 +334,13 @@ class SendVerificationEmail(APIView):
             fail_silently=False,
         )
         """
-        requests.post(
-            "https://api.mailgun.net/v3/naikas.com/messages",
-            auth=("api", os.environ.get('MAILGUN_API')),
-            data={"from": "Naikas <postmaster@naikas.com>",
-                "to": [email],
-                "subject": "Naikas OTP Code",
-                "text": f"Your OTP code is {otp}"}
-        )
-        
+        try:
+            providers.send_email(email, "Naikas OTP Code", f"Your OTP code is {otp}")
+        except Exception:
+            # Mailgun rejected it, timed out or is parked by its guard
+            logger.exception("OTP email to %s failed", email)
+            verification.delete()
+            return Response({"error": "Could not send the verification email. Please try again shortly."}, status=503)
 
         return Response({"message": "OTP sent"}, status=200)
 
@@ -270,18 +370,36 @@ class RegisterFCMTokenView(APIView):
 
 
 class BulkParticularCreateView(APIView):
+    """
+    JSON: {"documents": [...]}. For large onboardings the same documents can be
+    streamed as NDJSON (one per line) or CSV and are imported in batches.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser, CSVParser]
+
     def post(self, request, *args, **kwargs):
-        serializer = BulkParticularListSerializer(data=request.data, context={"request": request})
-        if serializer.is_valid():
+        if isinstance(request.data, dict):
+            serializer = BulkParticularListSerializer(data=request.data, context={"request": request})
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             created_docs = serializer.save()
-            return Response(
-                {
-                    "message": f"{len(created_docs)} documents (with reminders) created successfully.",
-                    "particulars": [p.id for p in created_docs]
-                },
-                status=status.HTTP_201_CREATED
-            )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            created_docs = BulkImporter(request.user).run(self.validated_rows(request.data))
+
+        return Response(
+            {
+                "message": f"{len(created_docs)} documents (with reminders) created successfully.",
+                "particulars": [p.id for p in created_docs]
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    def validated_rows(self, rows):
+        for number, row in enumerate(rows, start=1):
+            serializer = BulkParticularSerializer(data=row)
+            if not serializer.is_valid():
+                raise ValidationError({"row": number, "errors": serializer.errors})
+            yield serializer.validated_data
 
     
 @api_view(["POST"])
@@ -366,12 +484,8 @@ class VerifyStaffView(APIView):
         if not staff_profile.organization:
             return Response({"error": "This staff is not linked to any organization."}, status=400)
 
-        # ✅ Ensure staff org matches admin org
-        if staff_profile.organization != request.user.profile.organization:
-            return Response({"error": "Staff does not belong to your organization."}, status=403)
-
-        # ✅ Ensure the logged-in user is the admin of that org
-        if staff_profile.organization.admin != request.user.profile:
+        # ✅ Ensure the logged-in user is the admin of the staff's org (which also means same org)
+        if staff_profile.organization.admin_id != request.user.profile_id:
             return Response({"error": "You are not authorized to verify this staff."}, status=403)
 
         # Approve staff
@@ -394,11 +508,11 @@ def manage_particular_owner(request, particular_id):
     POST   -> add owner
     DELETE -> remove owner
     """
-    profile = request.user.profile
     particular = get_object_or_404(Particular, id=particular_id)
 
     # ✅ Must belong to an organization + be admin
-    if not profile.organization or profile.organization.admin != profile:
+    org = _administered_organization(request)
+    if org is None:
         return Response({"error": "Only organization admin can manage owners."}, status=403)
 
     target_profile_id = request.data.get("profile_id")
@@ -408,7 +522,7 @@ def manage_particular_owner(request, particular_id):
     target_profile = get_object_or_404(Profile, id=target_profile_id)
 
     # ✅ Ensure target is in same organization
-    if target_profile.organization != profile.organization:
+    if target_profile.organization_id != org.id:
         return Response({"error": "Profile does not belong to your organization."}, status=403)
 
     if request.method == "POST":
@@ -421,7 +535,7 @@ def manage_particular_owner(request, particular_id):
         }, status=200)
 
     elif request.method == "DELETE":
-        if target_profile == particular.user.profile:
+        if target_profile.user_id == particular.user_id:
             return Response({"error": "Cannot remove the document creator."}, status=400)
 
         particular.owners.remove(target_profile)
@@ -433,24 +547,121 @@ def manage_particular_owner(request, particular_id):
         }, status=200)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_manage_owners(request, org_id):
+    """
+    Add and/or remove owners on many particulars at once.
+
+    {
+        "particular_ids": [1, 2, 3],           # or "filter" below
+        "filter": {"created_by": <profile_id>, "owned_by": <profile_id>, "category": "work"},
+        "add": [<profile_id>, ...],
+        "remove": [<profile_id>, ...]
+    }
+
+    Membership is validated set-wise and the through-table rows are written
+    with one bulk_create (of the pairs not already present) and one delete
+    inside a transaction.
+    """
+    org = _admin_organization(request, org_id)
+    if org is None:
+        return Response({"error": "Only organization admin can manage owners."}, status=403)
+
+    try:
+        add_ids = {int(pk) for pk in request.data.get("add") or []}
+        remove_ids = {int(pk) for pk in request.data.get("remove") or []}
+        particular_ids = [int(pk) for pk in request.data.get("particular_ids") or []]
+        doc_filter = dict(request.data.get("filter") or {})
+        for field in ("created_by", "owned_by"):
+            if doc_filter.get(field) is not None:
+                doc_filter[field] = int(doc_filter[field])
+    except (TypeError, ValueError):
+        return Response({"error": "Ids must be integers."}, status=400)
+
+    if not add_ids and not remove_ids:
+        return Response({"error": "add or remove is required."}, status=400)
+    if add_ids & remove_ids:
+        return Response({"error": "A profile cannot be both added and removed."}, status=400)
+    if not particular_ids and not doc_filter:
+        return Response({"error": "particular_ids or filter is required."}, status=400)
+
+    # ✅ One query: every target profile must be in this organization
+    members = dict(
+        Profile.objects.filter(organization=org, pk__in=add_ids | remove_ids).values_list("pk", "user_id")
+    )
+    outsiders = (add_ids | remove_ids) - set(members)
+    if outsiders:
+        return Response({"error": "Profiles do not belong to your organization.", "profile_ids": sorted(outsiders)}, status=403)
+
+    # ✅ One query: the particulars, restricted to documents created by organization members
+    particulars = Particular.objects.filter(user__profile__organization=org)
+    if particular_ids:
+        particulars = particulars.filter(pk__in=particular_ids)
+    if doc_filter.get("created_by"):
+        particulars = particulars.filter(user__profile__id=doc_filter["created_by"])
+    if doc_filter.get("owned_by"):
+        particulars = particulars.filter(
+            pk__in=Particular.owners.through.objects.filter(profile_id=doc_filter["owned_by"]).values("particular_id")
+        )
+    if doc_filter.get("category"):
+        particulars = particulars.filter(category=doc_filter["category"])
+    creators = dict(particulars.values_list("pk", "user_id"))
+
+    if particular_ids:
+        missing = set(particular_ids) - set(creators)
+        if missing:
+            return Response({"error": "Particulars not found in your organization.", "particular_ids": sorted(missing)}, status=404)
+
+    Owner = Particular.owners.through
+    with transaction.atomic():
+        # ignore_conflicts returns every object it was given, so count the new pairs ourselves
+        existing = set(
+            Owner.objects.filter(particular_id__in=list(creators), profile_id__in=add_ids)
+            .values_list("particular_id", "profile_id")
+        ) if add_ids else set()
+        new_pairs = [(pid, profile_id) for pid in creators for profile_id in add_ids if (pid, profile_id) not in existing]
+        Owner.objects.bulk_create(
+            [Owner(particular_id=pid, profile_id=profile_id) for pid, profile_id in new_pairs],
+            batch_size=1000,
+            ignore_conflicts=True,  # a concurrent request may have added the same pair since
+        )
+        removed = 0
+        if remove_ids:
+            # The creator of a document always keeps it
+            removed, _ = (
+                Owner.objects.filter(particular_id__in=list(creators), profile_id__in=remove_ids)
+                .exclude(profile__user_id=F("particular__user_id"))
+                .delete()
+            )
+        # through-table writes don't send m2m_changed
+        particulars_changed([members[pk] for pk in add_ids | remove_ids] + list(creators.values()))
+
+    return Response({
+        "particulars": len(creators),
+        "assigned": len(new_pairs),
+        "removed": removed,
+    }, status=200)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def staff_particulars_view(request, profile_id):
     """
     Admin-only endpoint: fetch all particulars created by or owned by a staff member.
     """
-    admin_profile = request.user.profile
-    staff_profile = get_object_or_404(Profile, id=profile_id)
+    staff_profile = get_object_or_404(Profile.objects.select_related("user"), id=profile_id)
 
     # ✅ Must belong to an organization + be admin
-    if not admin_profile.organization or admin_profile.organization.admin != admin_profile:
+    org = _administered_organization(request)
+    if org is None:
         return Response({"error": "Only organization admin can view staff particulars."}, status=403)
 
-    if staff_profile.organization != admin_profile.organization:
+    if staff_profile.organization_id != org.id:
         return Response({"error": "Staff does not belong to your organization."}, status=403)
 
     # ✅ Fetch created + owned particulars
-    created = Particular.objects.filter(user=staff_profile.user)
+    created = Particular.objects.filter(user_id=staff_profile.user_id)
     owned = Particular.objects.filter(owners=staff_profile)
 
     data = {
@@ -471,18 +682,153 @@ def staff_particulars_view(request, profile_id):
     return Response(data, status=200)
 
 
+EXPIRING_WINDOW_DAYS = 30
+
+
+def _admin_organization(request, org_id):
+    """The organization if the caller is its admin, else None."""
+    org = get_object_or_404(Organization, organizational_id=org_id)
+    if org.admin_id is None or org.admin_id != request.user.profile_id:
+        return None
+    return org
+
+
+def _administered_organization(request):
+    """
+    The caller's own organization if they are its admin, else None. One
+    query on the organization row; the token's org claims aren't trusted here.
+    """
+    return Organization.objects.filter(
+        admin_id=request.user.profile_id, members__id=request.user.profile_id
+    ).first()
+
+
+def _expiry_filters(today):
+    return {
+        "expiring": Q(completed=False, expiry_date__gte=today, expiry_date__lte=today + timedelta(days=EXPIRING_WINDOW_DAYS)),
+        "overdue": Q(completed=False, expiry_date__lt=today),
+    }
+
+
+def _staff_counts(profile_ids, today):
+    """
+    {profile id: (owned, expiring, overdue)} in one GROUP BY over the
+    particulars each profile created or owns (a particular that is both
+    counts once). Expiry conditions match _expiry_filters.
+    """
+    if not profile_ids:
+        return {}
+    sql = f"""
+        SELECT v.profile_id,
+               COUNT(DISTINCT v.particular_id) FILTER (WHERE v.owned),
+               COUNT(DISTINCT v.particular_id) FILTER (
+                   WHERE NOT pa.completed AND pa.expiry_date >= %s AND pa.expiry_date <= %s),
+               COUNT(DISTINCT v.particular_id) FILTER (WHERE NOT pa.completed AND pa.expiry_date < %s)
+        FROM (
+            SELECT pr.id AS profile_id, pa.id AS particular_id, FALSE AS owned
+            FROM {Profile._meta.db_table} pr
+            JOIN {Particular._meta.db_table} pa ON pa.user_id = pr.user_id
+            WHERE pr.id = ANY(%s)
+            UNION ALL
+            SELECT o.profile_id, o.particular_id, TRUE
+            FROM {Particular.owners.through._meta.db_table} o
+            WHERE o.profile_id = ANY(%s)
+        ) v
+        JOIN {Particular._meta.db_table} pa ON pa.id = v.particular_id
+        GROUP BY v.profile_id
+    """
+    ids = list(profile_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [today, today + timedelta(days=EXPIRING_WINDOW_DAYS), today, ids, ids])
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+class OrganizationOverviewView(generics.GenericAPIView):
+    """
+    Admin console in one request: per-staff counts of created, owned, expiring
+    and overdue documents. The page of staff comes from one query and its
+    counts from one GROUP BY (_staff_counts).
+    Cursor-paginated and cached on the organization's data_version.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def get(self, request, org_id):
+        org = _admin_organization(request, org_id)
+        if org is None:
+            return Response({"error": "Only organization admin can view the overview."}, status=403)
+
+        key = organization_overview_key(org, request.query_params.get("cursor"))
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        page = self.paginate_queryset(Profile.objects.filter(organization=org).select_related("user"))
+        counts = _staff_counts([p.id for p in page], now().date())
+        results = []
+        for p in page:
+            owned, expiring, overdue = counts.get(p.id, (0, 0, 0))
+            results.append({
+                "id": p.id,
+                "username": p.user.username,
+                "email": p.user.email,
+                "role": p.role,
+                "created": p.particular_count,
+                "owned": owned,
+                "expiring": expiring,
+                "overdue": overdue,
+            })
+        data = self.get_paginated_response(results).data
+        data["organization"] = {"id": org.id, "organizational_id": org.organizational_id, "name": org.name}
+        cache.set(key, data, OVERVIEW_TTL)
+        return Response(data)
+
+
+class OrganizationStaffParticularsView(generics.GenericAPIView):
+    """
+    Drill-down for the overview: ?kind=created|owned|expiring|overdue,
+    cursor-paginated.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def get(self, request, org_id, profile_id):
+        org = _admin_organization(request, org_id)
+        if org is None:
+            return Response({"error": "Only organization admin can view staff particulars."}, status=403)
+        staff_profile = get_object_or_404(Profile.objects.only("id", "user_id"), id=profile_id, organization=org)
+
+        kind = request.query_params.get("kind", "created")
+        filters = _expiry_filters(now().date())
+        if kind == "created":
+            queryset = Particular.objects.filter(user_id=staff_profile.user_id)
+        elif kind == "owned":
+            queryset = Particular.objects.filter(owners=staff_profile)
+        elif kind in filters:
+            queryset = visible_particulars(staff_profile.user_id).filter(filters[kind])
+        else:
+            return Response({"error": "kind must be created, owned, expiring or overdue."}, status=400)
+
+        page = self.paginate_queryset(queryset.only("id", "title", "expiry_date", "completed"))
+        return self.get_paginated_response([
+            {"id": p.id, "title": p.title, "expiry_date": p.expiry_date, "completed": p.completed}
+            for p in page
+        ])
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([MessagingThrottle])
 def send_message_view(request, profile_id):
 
-    admin_profile = request.user.profile
     staff_profile = get_object_or_404(Profile, id=profile_id)
 
-    if not admin_profile.organization or admin_profile.organization.admin != admin_profile:
+    org = _administered_organization(request)
+    if org is None:
         return Response({"error": "Only organization admin can send messages."}, status=403)
 
     # ✅ ensure same organization
-    if staff_profile.organization != admin_profile.organization:
+    if staff_profile.organization_id != org.id:
         return Response({"error": "Staff not in your organization."}, status=403)
 
     channel = request.data.get("channel")  # "sms" or "whatsapp"
@@ -495,19 +841,11 @@ def send_message_view(request, profile_id):
 
     try:
         if channel == "sms":
-            client.messages.create(
-                body=message,
-                from_=TWILIO_PHONE_NUMBER,
-                to=staff_profile.phone_number
-            )
+            providers.send_sms(staff_profile.phone_number, message)
             return Response({"success": f"SMS sent to {staff_profile.phone_number}"})
 
         elif channel == "whatsapp":
-            client.messages.create(
-                body=message,
-                from_="whatsapp:" + TWILIO_PHONE_NUMBER,
-                to="whatsapp:" + staff_profile.phone_number
-            )
+            providers.send_sms(staff_profile.phone_number, message, whatsapp=True)
             return Response({"success": f"WhatsApp sent to {staff_profile.phone_number}"})
 
         else:
@@ -516,25 +854,119 @@ def send_message_view(request, profile_id):
     except Exception as e:
         return Response({"error": str(e)}, status=500)
     
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([MessagingThrottle])
+def create_broadcast_view(request, org_id):
+    """
+    Queue one SMS/WhatsApp per recipient and return immediately; the
+    `send_broadcasts` worker delivers them. Recipients are the ids in
+    `profile_ids`, else every member (optionally only those with `role`).
+    """
+    org = _admin_organization(request, org_id)
+    if org is None:
+        return Response({"error": "Only organization admin can send messages."}, status=403)
+
+    channel = request.data.get("channel")
+    message = request.data.get("message")
+    if channel not in ("sms", "whatsapp"):
+        return Response({"error": "Invalid channel. Use 'sms' or 'whatsapp'."}, status=400)
+    if not message:
+        return Response({"error": "Message is required"}, status=400)
+
+    profile_ids = request.data.get("profile_ids")
+    if profile_ids is not None:
+        try:
+            if not isinstance(profile_ids, list):
+                raise TypeError
+            profile_ids = [int(pk) for pk in profile_ids]
+        except (TypeError, ValueError):
+            return Response({"error": "profile_ids must be a list of integers."}, status=400)
+
+    recipients = Profile.objects.filter(organization=org).exclude(pk=org.admin_id)
+    if profile_ids:
+        recipients = recipients.filter(pk__in=profile_ids)
+    if request.data.get("role"):
+        recipients = recipients.filter(role=request.data["role"])
+
+    with transaction.atomic():
+        broadcast = MessageBroadcast.objects.create(
+            organization=org, created_by_id=org.admin_id, channel=channel, message=message
+        )
+        items = [
+            OutboundMessage(
+                broadcast=broadcast,
+                profile_id=profile_id,
+                to=phone or "",
+                status="queued" if phone else "skipped",
+                error="" if phone else "Staff has no phone number",
+            )
+            for profile_id, phone in recipients.values_list("pk", "phone_number")
+        ]
+        OutboundMessage.objects.bulk_create(items, batch_size=1000)
+
+    queued = sum(1 for item in items if item.status == "queued")
+    return Response({
+        "broadcast_id": broadcast.id,
+        "queued": queued,
+        "skipped": len(items) - queued,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+class BroadcastReportView(generics.GenericAPIView):
+    """Delivery report: status counts plus cursor-paginated per-recipient rows."""
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def get(self, request, broadcast_id):
+        broadcast = get_object_or_404(MessageBroadcast.objects.select_related("organization"), pk=broadcast_id)
+        if broadcast.organization.admin_id != request.user.profile_id:
+            return Response({"error": "Only organization admin can view this report."}, status=403)
+
+        counts = dict(
+            broadcast.items.order_by().values("status").annotate(n=Count("id")).values_list("status", "n")
+        )
+        page = self.paginate_queryset(broadcast.items.all())
+        response = self.get_paginated_response([
+            {
+                "profile_id": item.profile_id,
+                "to": item.to,
+                "status": item.status,
+                "error": item.error,
+                "attempts": item.attempts,
+                "sent_at": item.sent_at,
+            }
+            for item in page
+        ])
+        response.data["broadcast"] = {
+            "id": broadcast.id,
+            "channel": broadcast.channel,
+            "created_at": broadcast.created_at,
+            "completed_at": broadcast.completed_at,
+            "counts": counts,
+        }
+        return response
+
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def delete_staff_view(request, profile_id):
     """
     Admin-only endpoint: delete a staff user under the same organization.
     """
-    admin_profile = request.user.profile
-    staff_profile = get_object_or_404(Profile, id=profile_id)
+    staff_profile = get_object_or_404(Profile.objects.select_related("user"), id=profile_id)
 
     # ✅ Ensure caller is an organization admin
-    if not admin_profile.organization or admin_profile.organization.admin != admin_profile:
+    org = _administered_organization(request)
+    if org is None:
         return Response({"error": "Only organization admin can delete staff."}, status=403)
 
     # ✅ Ensure staff is in the same organization
-    if staff_profile.organization != admin_profile.organization:
+    if staff_profile.organization_id != org.id:
         return Response({"error": "Staff does not belong to your organization."}, status=403)
 
     # ✅ Prevent deleting the admin themselves
-    if staff_profile == admin_profile:
+    if staff_profile.id == request.user.profile_id:
         return Response({"error": "Admin cannot delete themselves."}, status=400)
 
     # ✅ Delete user (cascade deletes profile too)
@@ -548,11 +980,10 @@ def delete_staff_view(request, profile_id):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def set_organization_icon(request, org_id):
-    profile = request.user.profile
     org = get_object_or_404(Organization, organizational_id=org_id)
 
     # ✅ Only admin can update
-    if org.admin != profile:
+    if org.admin_id != request.user.profile_id:
         return Response({"error": "Only the admin can update organization icon."}, status=403)
 
     file = request.FILES.get("icon")
@@ -560,13 +991,92 @@ def set_organization_icon(request, org_id):
         return Response({"error": "Icon file is required."}, status=400)
 
     org.icon = file
+    org.icon_thumbnails = {}  # regenerated by generate_thumbnails
     org.save()
 
     return Response({
         "message": "Organization icon updated successfully.",
-        "icon_url": request.build_absolute_uri(org.icon.url)
+        "icon_url": signed_url(org.icon.name, request=request)
     })
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def presign_upload_view(request):
+    """
+    Hash pre-check + direct upload. The client sends the file's SHA-256:
+    if it uploaded those bytes before, that key can be used straight away,
+    otherwise it PUTs the file to the returned short-lived staging URL.
+    Either way the key is then sent as `document_key` when saving the
+    particular, which is when staged bytes are hashed and promoted.
+    """
+    filename = request.data.get("filename") or ""
+    digest = (request.data.get("sha256") or "").lower()
+    size = request.data.get("size")
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        return Response({"error": "sha256 must be a hex SHA-256 digest."}, status=400)
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return Response({"error": "size is required."}, status=400)
+    if size > max_upload_size():
+        return Response({"error": "File is too large."}, status=413)
+
+    # Only this user's own earlier uploads: knowing a digest must not grant someone else's file
+    previous = (
+        BlobUpload.objects.filter(user_id=request.user.id, sha256=digest)
+        .exclude(blob_name="")
+        .values_list("blob_name", flat=True)
+        .first()
+    )
+    if previous and StoredBlob.objects.filter(name=previous).exists():
+        return Response({"exists": True, "key": previous})
+
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    upload = BlobUpload.objects.create(
+        user_id=request.user.id,
+        staging_name=staging_name(request.user.id, ext if ext.isalnum() else ""),
+        sha256=digest,
+        size=size,
+    )
+    return Response({
+        "exists": False,
+        "key": upload.staging_name,
+        "upload_url": signed_url(upload.staging_name, method="PUT", request=request),
+        "method": "PUT",
+    })
+
+
+@csrf_exempt
+def signed_media_view(request, path):
+    """
+    Local stand-in for the static tier (nginx secure_link + dav) used when
+    DEBUG is on. Never routed in production.
+    """
+    signature = request.GET.get("md5")
+    expires = request.GET.get("expires")
+    if not verify_signature(settings.MEDIA_URL + path, request.method, signature, expires):
+        return HttpResponse(status=403)
+
+    if request.method == "GET":
+        if not default_storage.exists(path):
+            raise Http404
+        return FileResponse(default_storage.open(path, "rb"))
+
+    if request.method == "PUT":
+        # Like nginx: uploads go to staging keys only, the server promotes them
+        if not is_staging(path):
+            return HttpResponse(status=405)
+        if int(request.META.get("CONTENT_LENGTH") or 0) > max_upload_size():
+            return HttpResponse(status=413)
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in iter(lambda: request.read(64 * 1024), b""):
+                tmp.write(chunk)
+            default_storage.save(path, File(tmp))
+        return HttpResponse(status=201)
+
+    return HttpResponse(status=405)
+
+
 PLAN_AMOUNTS = {
     "premium": 150000,     # ₦1500.00 in kobo
     "enterprise": 5000000, # ₦50000.00 in kobo
@@ -14,6 +14,7 @@ from datetime import timedelta
 import os
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -51,12 +53,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reminderx.middleware.MetricsMiddleware',  # outermost, so it times everything below
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'reminderx.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'reminderx.middleware.SubscriptionMiddleware',
@@ -100,11 +104,68 @@ DATABASES = {
         'NAME': 'reminderx',
         'USER': 'reminderx_user',
         'PASSWORD': 'winston',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
     }
 }
 
+# Connection reuse (DB_POOL_MODE):
+#   persistent - each gunicorn worker / command keeps its connection for
+#                DB_CONN_MAX_AGE seconds, checked before reuse
+#   psycopg    - psycopg 3's built-in pool (pip install "psycopg[pool]");
+#                Django refuses to combine it with persistent connections
+#   pgbouncer  - DB_HOST/DB_PORT point at PgBouncer in transaction pooling
+#                mode, so server-side cursors (.iterator()) can't be used
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL_MODE == 'psycopg':
+    # requirements.txt installs psycopg2, which has no pool: fail at startup, not on the first query
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('DB_POOL_MODE=psycopg needs psycopg 3 and its pool: pip install "psycopg[binary,pool]"')
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': 10,
+        },
+    }
+elif DB_POOL_MODE == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds `replica_1`, `replica_2`, ...
+# with the primary's credentials. API GETs and the notification generator's
+# scans read from them (reminderx/routers.py). Stickiness after a write is
+# tracked in CACHES['default'], which every worker shares.
+REPLICA_DATABASES = []
+for i, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica_{i}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['reminderx.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
+# Shared by every worker: the replica stickiness marker above, THROTTLE_BACKEND =
+# 'cache' and the summary/overview caches. REDIS_URL selects Redis; otherwise the
+# database cache table is used, which `migrate` creates (reminderx/signals.py).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'reminderx_cache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -155,10 +216,44 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT without the per-request User query; claims carry the profile ids
+        'reminderx.authentication.ProfileJWTAuthentication',
     ),
+    # Proxies in front of gunicorn (nginx): the client IP throttles key on is taken
+    # from X-Forwarded-For this many hops back, so clients can't spoof it. 0 in
+    # development (runserver is hit directly); settingsprod.py assumes nginx.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Token buckets, see reminderx/throttling.py. "<scope>_<key>": "<burst>/<period>"
+    'DEFAULT_THROTTLE_CLASSES': ['reminderx.throttling.APIThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'api_ip': '600/min',
+        'api_user': '300/min',
+        'otp_ip': '10/hour',
+        'otp_email': '3/10min',
+        'login_ip': '30/min',
+        'login_username': '10/10min',
+        'password_reset_ip': '10/hour',
+        'password_reset_email': '3/hour',
+        'messaging_ip': '60/min',
+        'messaging_user': '30/min',
+        'messaging_profile_id': '5/min',
+    },
 }
 
+# Access tokens are accepted without a database lookup (reminderx/authentication.py),
+# so a deactivated or deleted account keeps working until its access token expires.
+# Keep the lifetime short; refreshing re-checks the account.
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('ACCESS_TOKEN_MINUTES', 5))),
+}
+
+# 'memory' (per worker, no I/O) or 'cache' (shared through CACHES['default'])
+THROTTLE_BACKEND = 'memory'
+
+# Per-view latency / query / provider metrics, scraped from /metrics (reminderx/metrics.py)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # scrapes need "Authorization: Bearer <token>"; unset: DEBUG only
+SLOW_REQUEST_MS = int(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None  # log slower requests with their SQL
+
 """
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),  # 1 hour
@@ -173,9 +268,43 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per distinct content under media/blobs/ and
+# reference-counted (reminderx/blobs.py)
+STORAGES = {
+    'default': {'BACKEND': 'reminderx.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Media bytes never go through the app: clients get short-lived signed URLs
+# served by nginx secure_link / an object store (see reminderx/storage.py)
+MEDIA_SIGNED_URL_BASE = os.environ.get('MEDIA_SIGNED_URL_BASE', '')
+MEDIA_SIGNING_KEY = os.environ.get('MEDIA_SIGNING_KEY', '')
+MEDIA_URL_EXPIRY = 300  # seconds
+UPLOAD_STAGING_HOURS = 24  # presigned uploads not attached by then are deleted by collect_uploads
+
 # Allow file uploads up to 20MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # 20 MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # 20 MB
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB, enforced while the upload streams in
+
+# Stream uploads to a temp file in chunks (hashed + size-checked as they arrive)
+# instead of buffering them in worker memory
+FILE_UPLOAD_HANDLERS = ['reminderx.uploads.HashingTemporaryFileUploadHandler']
+
+# Profile pictures / organization icons are stored as uploaded and resized
+# in the background by `manage.py generate_thumbnails` (run from cron)
+THUMBNAIL_SIZES = (64, 256, 1024)
+THUMBNAIL_FORMAT = 'WEBP'
+
+# Notifications are partitioned by month on Postgres (reminderx/partitions.py).
+# These bound what the jobs and the history endpoint scan, and they drop data:
+# - a notification still unsent after NOTIFICATION_SEND_WINDOW_DAYS (e.g. an outage
+#   that long) is never delivered; send_notifications reports them as
+#   expired_unsent_last_day
+# - the notification list shows NOTIFICATION_HISTORY_DAYS, however many months are kept
+# - partitions older than NOTIFICATION_RETENTION_MONTHS are dropped by prune_notifications
+NOTIFICATION_RETENTION_MONTHS = int(os.environ.get('NOTIFICATION_RETENTION_MONTHS', 12))
+NOTIFICATION_SEND_WINDOW_DAYS = int(os.environ.get('NOTIFICATION_SEND_WINDOW_DAYS', 7))
+NOTIFICATION_HISTORY_DAYS = int(os.environ.get('NOTIFICATION_HISTORY_DAYS', 90))
 
 # For development
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -188,7 +317,24 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 PAYSTACK_SECRET_KEY = "sk_test_0a2248d8978d26fecbf95c7b736bd0650f6d21e1"
 PAYSTACK_PUBLIC_KEY = "pk_test_6ed1ae486ba3fe00fbec9a673c396828d8e22e78"
-PAYSTACK_BASE_URL = "https://api.paystack.co"
+PAYSTACK_BASE_URL = os.environ.get('PAYSTACK_BASE_URL', "https://api.paystack.co")
+
+# Provider endpoints. Point them at `manage.py fake_providers` (e.g. http://127.0.0.1:8025)
+# to run delivery and payments offline; empty TWILIO/FCM values mean the real services.
+MAILGUN_BASE_URL = os.environ.get('MAILGUN_BASE_URL', "https://api.mailgun.net")
+MAILGUN_DOMAIN = os.environ.get('MAILGUN_DOMAIN', "naikas.com")
+TWILIO_BASE_URL = os.environ.get('TWILIO_BASE_URL', '')
+FCM_BASE_URL = os.environ.get('FCM_BASE_URL', '')
+PROVIDER_TIMEOUT = float(os.environ.get('PROVIDER_TIMEOUT', 10))  # seconds, per outbound call
+
+# Per-provider limits for outbound sends (reminderx/guards.py). `rate` is the starting
+# calls/second (lowered from X-RateLimit-* headers); a provider with `failure_threshold`
+# consecutive failures is parked for `cool_off` seconds.
+PROVIDER_GUARDS = {
+    'mailgun': {'rate': 50, 'max_concurrency': 16},
+    'twilio': {'rate': 10, 'max_concurrency': 8},
+    'fcm': {'rate': 100, 'max_concurrency': 32},
+}
 
 
 #projects/reminderx/
@@ -240,6 +386,13 @@ choose nano if prompted
 paste this line
 */10 * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py generate_notifications --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
 */10 * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py send_notifications --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+* * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py generate_thumbnails --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+* * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py send_broadcasts --max-seconds 50 --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+30 3 * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py reconcile_counters --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+0 4 * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py partition_notifications --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+15 * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py purge_expired_tokens --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+45 * * * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py collect_uploads --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
+30 4 1 * * /projects/reminderx/env/bin/python /projects/reminderx/reminderx_backend/manage.py prune_notifications --archive-dir /projects/reminderx/archive --settings=reminderx_backend.settingsprod >> /projects/reminderx/cron.log 2>&1
 to check
 tail -f /projects/reminderx/cron.log 
 more, less, tail, cat
@@ -15,12 +15,30 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from reminderx.metrics import metrics_view
+from reminderx.views import (
+    signed_media_view,
+    ThrottledResetPasswordRequestToken,
+    ThrottledResetPasswordConfirm,
+    ThrottledResetPasswordValidateToken,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('reminderx.urls')),
+    # Throttled versions of the password reset views, matched before the package's own
+    path('api/password_reset/', ThrottledResetPasswordRequestToken.as_view(), name='reset-password-request'),
+    path('api/password_reset/confirm/', ThrottledResetPasswordConfirm.as_view(), name='reset-password-confirm'),
+    path('api/password_reset/validate_token/', ThrottledResetPasswordValidateToken.as_view(), name='reset-password-validate'),
     path('api/password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# Media is served by the static tier via signed URLs (see reminderx/storage.py);
+# this only stands in for it during local development.
+if settings.DEBUG:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), signed_media_view),
+    ]